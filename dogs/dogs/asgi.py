@@ -3,6 +3,10 @@ ASGI config for dogs project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Поток событий бронирований (main.views_events, SSE) держит соединения
+открытыми, поэтому его нужно обслуживать через ASGI-сервер, например:
+uvicorn dogs.asgi:application --workers 4
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -12,5 +16,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dogs.settings')
+# Постоянные соединения с базой под ASGI не закрываются вовремя (см. settings)
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
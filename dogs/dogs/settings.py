@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
 from datetime import timedelta
 import sentry_sdk
@@ -49,13 +50,13 @@ INSTALLED_APPS = [
     'django_filters',
     'main',
     'users',
-    'silk', 
 ]
 
 
 
 MIDDLEWARE = [
-    'silk.middleware.SilkyMiddleware',
+    'main.profiling.SampledProfilingMiddleware',
+    'main.metrics.RouteMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -97,6 +98,70 @@ DATABASES = {
     }
 }
 
+# Время жизни соединений с базами (CONN_MAX_AGE основной базы и реплики).
+# Под ASGI постоянные соединения не используются: синхронный код выполняется
+# в потоках исполнителя, и соединения, открытые вне цикла запроса (например,
+# потоком SSE), не закрываются по CONN_MAX_AGE. dogs.asgi выставляет
+# DB_CONN_MAX_AGE=0 до загрузки настроек
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+
+# Продакшен-профиль SQLite (main.sqlite_profile): PRAGMA применяются к каждому
+# новому соединению основной базы, соединения переиспользуются между запросами.
+# Отключается переменной окружения SQLITE_PRODUCTION_PROFILE=0
+SQLITE_PRODUCTION_PROFILE = os.environ.get('SQLITE_PRODUCTION_PROFILE', '1') == '1'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,  # 256 МБ
+    'cache_size': -65536,  # 64 МБ (отрицательное значение - в килобайтах)
+    'busy_timeout': 5000,  # мс
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_PRODUCTION_PROFILE:
+    DATABASES['default'].update({
+        # Транзакции с BEGIN IMMEDIATE (main.sqlite_backend)
+        'ENGINE': 'main.sqlite_backend',
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    })
+
+# Реплика для аналитических запросов (main.db_router).
+# ANALYTICS_REPLICA=sqlite - локальная копия основной базы, обновляется
+# командой refresh_replica_snapshot; ANALYTICS_REPLICA=postgresql - потоковая
+# реплика PostgreSQL (параметры в REPLICA_DB_*). Без переменной аналитика
+# читается из основной базы.
+# REPLICA_MAX_LAG_SECONDS - допустимое отставание реплики. С реплики читаются
+# только отчёты и агрегаты (views_annotations, User.get_bookings_stats), для
+# которых данные пятнадцатиминутной давности приемлемы; статистика
+# догситтеров и querysets представлений читаются из основной базы. Снимок
+# SQLite - полная копия базы; при обновлении раз в 5 минут 15 минут
+# оставляют запас на два пропущенных запуска refresh_replica_snapshot
+ANALYTICS_DATABASE = 'replica'
+ANALYTICS_REPLICA = os.environ.get('ANALYTICS_REPLICA', '')
+REPLICA_MAX_LAG_SECONDS = int(os.environ.get('REPLICA_MAX_LAG_SECONDS', 900))
+REPLICA_LAG_CHECK_INTERVAL = 5
+
+if ANALYTICS_REPLICA == 'sqlite':
+    DATABASES[ANALYTICS_DATABASE] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+elif ANALYTICS_REPLICA == 'postgresql':
+    DATABASES[ANALYTICS_DATABASE] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('REPLICA_DB_NAME', 'dogs'),
+        'USER': os.environ.get('REPLICA_DB_USER', ''),
+        'PASSWORD': os.environ.get('REPLICA_DB_PASSWORD', ''),
+        'HOST': os.environ.get('REPLICA_DB_HOST', ''),
+        'PORT': os.environ.get('REPLICA_DB_PORT', ''),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['main.db_router.AnalyticsReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -150,14 +215,24 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
-    )
+    ),
+    # JSON через orjson, если он установлен (main.renderers)
+    'DEFAULT_RENDERER_CLASSES': (
+        'main.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'main.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 # Настройки JWT токенов
@@ -168,6 +243,14 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Кэш пользователей для JWT-аутентификации (users.authentication): снимки
+# живут в памяти процесса, а версии пользователей - в общем для процессов
+# кэше JWT_USER_VERSION_CACHE_ALIAS. Изменение пользователя меняет версию,
+# и снимки во всех процессах перестают совпадать с ключом
+JWT_USER_CACHE_TTL = 30  # секунд
+JWT_USER_CACHE_MAX_SIZE = 1024
+JWT_USER_VERSION_CACHE_ALIAS = 'jwt_users'
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://localhost:5174",
@@ -197,6 +280,148 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Выборочное профилирование (main.profiling)
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0.01'))
+PROFILING_SLOW_REQUEST_MS = 500
+PROFILING_RING_SIZE = 50
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_HEADER = 'X-Profile'
+PROFILING_TOKEN_MAX_AGE = 3600  # секунд
+
+# Метрики представлений (main.metrics)
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+METRICS_FLUSH_INTERVAL = 5  # секунд
+
+# Тесты пишут метрики и профили во временные каталоги (main.test_runner)
+TEST_RUNNER = 'main.test_runner.TempDirsTestRunner'
+
+# Архив бронирований (main.archive): завершённые и отменённые бронирования,
+# закончившиеся раньше горизонта, переносятся в архивные таблицы пачками
+BOOKING_ARCHIVE_AFTER_DAYS = 365
+BOOKING_ARCHIVE_BATCH_SIZE = 500
+
+# Ночной перевод закончившихся бронирований в completed (main.booking_status)
+BOOKING_COMPLETION_CHUNK_SIZE = 1000
+
+# Кэш статистики догситтеров (main.sitter_stats); сбрасывается сигналами,
+# TTL - страховка от изменений в обход сигналов. Нужен общий для процессов
+# кэш: тот же бэкенд, что у кэша ответов API, а если он выключен - файлы в
+# SITTER_STATS_CACHE_DIR (общие для процессов одного сервера)
+SITTER_STATS_CACHE_TTL = 600  # секунд
+SITTER_STATS_CACHE_ALIAS = 'sitter_stats'
+
+# Счётчики записей (main.counters): снимок в памяти процесса живёт
+# COUNTERS_CACHE_TTL секунд; сверка с таблицами - команда reconcile_counters
+COUNTERS_CACHE_TTL = 5  # секунд
+
+# Синхронизация изменений (main.sync): размер страницы, задержка перед
+# выдачей свежих записей и срок хранения отметок об удалении
+SYNC_PAGE_SIZE = 200
+SYNC_MAX_PAGE_SIZE = 1000
+SYNC_SETTLE_SECONDS = 2
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Поток событий бронирований по SSE (main.events, только под ASGI)
+SSE_POLL_INTERVAL = 1  # секунд между чтениями таблицы событий
+SSE_BATCH_SIZE = 500
+SSE_QUEUE_SIZE = 100  # событий в очереди одного клиента
+SSE_KEEPALIVE_SECONDS = 15
+SSE_RETRY_MS = 3000
+SSE_SETTLE_SECONDS = 10  # сколько ждать события с пропущенным id (фиксация позже)
+SSE_TOKEN_MAX_AGE = 60  # секунд жизни токена потока для ?token=
+
+# Потоковые выгрузки (main.streaming)
+STREAMING_CHUNK_SIZE = 500  # записей из базы за одну пачку .iterator()
+STREAMING_BUFFER_BYTES = 64 * 1024  # размер отправляемого куска ответа
+
+# Пакетные GET-запросы API (main.batch)
+BATCH_MAX_REQUESTS = 20
+# 1 - подзапросы по очереди на соединении запроса; больше - параллельно
+# в потоках со своими соединениями (для PostgreSQL)
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 1))
+
+# Массовое создание бронирований (main.bulk_bookings): не больше за запрос
+BULK_BOOKINGS_MAX = 500
+
+# Повторяющиеся бронирования (main.schedules, команда materialize_schedules)
+SCHEDULE_HORIZON_DAYS = 14  # на сколько дней вперёд создаются бронирования
+SCHEDULE_BATCH_SIZE = 100  # расписаний за одну транзакцию
+SCHEDULE_CALENDAR_MAX_DAYS = 366  # наибольший диапазон запроса календаря
+
+# Outbox событий предметной области (main.outbox, команда dispatch_outbox)
+OUTBOX_BATCH_SIZE = 200
+OUTBOX_MAX_ATTEMPTS = 10  # после стольких ошибок событие больше не доставляется
+OUTBOX_POLL_INTERVAL = 1  # секунд между опросами в режиме --loop
+OUTBOX_RETENTION_DAYS = 7  # доставленные события нужны потоку SSE для догрузки
+
+# Кэш ответов API (main.response_cache). Версии тегов должны быть общими
+# для всех процессов, поэтому кэш включается только на разделяемом
+# бэкенде. RESPONSE_CACHE_BACKEND: off (по умолчанию) - кэш выключен;
+# redis - сервер из REDIS_URL, memcached - MEMCACHED_LOCATION (нужны пакеты
+# redis / pymemcache, без них кэш выключен); database - таблица
+# RESPONSE_CACHE_TABLE (создаётся командой createcachetable); file - каталог
+# RESPONSE_CACHE_DIR, общий для процессов одного сервера
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = 300  # секунд
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'off')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    RESPONSE_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+if RESPONSE_CACHE_BACKEND == 'redis' and importlib.util.find_spec('redis'):
+    CACHES[RESPONSE_CACHE_ALIAS] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        'KEY_PREFIX': 'dogs',
+    }
+elif RESPONSE_CACHE_BACKEND == 'memcached' and importlib.util.find_spec('pymemcache'):
+    CACHES[RESPONSE_CACHE_ALIAS] = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.environ.get('MEMCACHED_LOCATION', '127.0.0.1:11211'),
+        'KEY_PREFIX': 'dogs',
+    }
+elif RESPONSE_CACHE_BACKEND == 'database':
+    CACHES[RESPONSE_CACHE_ALIAS] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.environ.get('RESPONSE_CACHE_TABLE', 'response_cache'),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+elif RESPONSE_CACHE_BACKEND == 'file':
+    CACHES[RESPONSE_CACHE_ALIAS] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('RESPONSE_CACHE_DIR', str(BASE_DIR / 'cache' / 'responses')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+
+if CACHES[RESPONSE_CACHE_ALIAS]['BACKEND'].endswith('DummyCache'):
+    CACHES[SITTER_STATS_CACHE_ALIAS] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SITTER_STATS_CACHE_DIR', str(BASE_DIR / 'cache' / 'sitter_stats')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+else:
+    CACHES[SITTER_STATS_CACHE_ALIAS] = dict(CACHES[RESPONSE_CACHE_ALIAS])
+
+if CACHES[RESPONSE_CACHE_ALIAS]['BACKEND'].endswith('DummyCache'):
+    CACHES[JWT_USER_VERSION_CACHE_ALIAS] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('JWT_USER_VERSION_CACHE_DIR', str(BASE_DIR / 'cache' / 'jwt_users')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+else:
+    CACHES[JWT_USER_VERSION_CACHE_ALIAS] = dict(CACHES[RESPONSE_CACHE_ALIAS])
+
+# Silk подключается только по требованию: SILK_ENABLED=1
+SILK_ENABLED = os.environ.get('SILK_ENABLED') == '1'
+if SILK_ENABLED:
+    INSTALLED_APPS.append('silk')
+    MIDDLEWARE.insert(0, 'silk.middleware.SilkyMiddleware')
+
 # Настройки Silk
 SILKY_PYTHON_PROFILER = True
 SILKY_PYTHON_PROFILER_BINARY = True
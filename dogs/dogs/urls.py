@@ -33,7 +33,7 @@ urlpatterns = [
     path('accounts/logout/', auth_views.LogoutView.as_view(next_page='/'), name='logout'),
 ]
 
-if settings.DEBUG:
+if settings.SILK_ENABLED:
     urlpatterns += [
         path('silk/', include('silk.urls', namespace='silk')),
     ]
@@ -1,10 +1,17 @@
 from django.contrib import admin
 from django.http import HttpResponse
+from django.db import transaction
 from django.utils import timezone
 from django.contrib import messages
 from django.utils.html import format_html
-from .models import User, DogSitter, Animal, Booking, Service, Review, BookingAnimal
+from .models import User, DogSitter, Animal, Booking, BookingSchedule, Service, Review, BookingAnimal, ArchivedBooking
 from .utils import generate_booking_pdf, generate_dogsitter_report_pdf
+from . import counters
+from .earnings import lifetime_earnings_subquery
+from .sitter_stats import get_statistics_bulk
+from .signals import bookings_changed, bookings_completed
+from .events import record_status_changes
+from users.authentication import invalidate_cached_user
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -15,7 +22,10 @@ class UserAdmin(admin.ModelAdmin):
     actions = ['deactivate_users', 'activate_users']
 
     def deactivate_users(self, request, queryset):
+        user_ids = list(queryset.values_list('id', flat=True))
         queryset.update(is_active=False)
+        for user_id in user_ids:
+            invalidate_cached_user(user_id)
         messages.success(request, f'Деактивировано пользователей: {queryset.count()}')
     deactivate_users.short_description = "Деактивировать выбранных пользователей"
 
@@ -42,8 +52,12 @@ class DogSitterAdmin(admin.ModelAdmin):
         return obj.bookings.count()
     total_bookings.short_description = "Всего бронирований"
 
+    def get_queryset(self, request):
+        # Заработок берётся из журнала одним подзапросом, а не по строке на догситтера
+        return super().get_queryset(request).annotate(ledger_earnings=lifetime_earnings_subquery())
+
     def total_earnings(self, obj):
-        return obj.calculate_total_earnings()
+        return obj.ledger_earnings or 0
     total_earnings.short_description = "Общий заработок"
 
     def is_active(self, obj):
@@ -70,11 +84,13 @@ class DogSitterAdmin(admin.ModelAdmin):
             import zipfile
             import io
             
+            # Статистика всех выбранных догситтеров считается за один проход
+            statistics = get_statistics_bulk(queryset)
             buffer = io.BytesIO()
             with zipfile.ZipFile(buffer, 'w') as zip_file:
                 for dogsitter in queryset:
                     pdf_buffer = io.BytesIO()
-                    p = generate_dogsitter_report_pdf(dogsitter)
+                    p = generate_dogsitter_report_pdf(dogsitter, stats=statistics[dogsitter.id])
                     pdf_buffer.write(p.content)
                     zip_file.writestr(f'dogsitter_report_{dogsitter.id}.pdf', pdf_buffer.getvalue())
             
@@ -173,18 +189,35 @@ class BookingAdmin(admin.ModelAdmin):
     generate_pdf_documents.short_description = "Сгенерировать PDF документы"
 
     def mark_as_completed(self, request, queryset):
-        updated = queryset.filter(status='confirmed').update(
-            status='completed',
-            updated_at=timezone.now()
+        with transaction.atomic():
+            rows = list(queryset.filter(status='confirmed').values_list('id', 'dog_sitter_id'))
+            updated = queryset.filter(status='confirmed').update(
+                status='completed',
+                updated_at=timezone.now()
+            )
+            counters.record_changed(Booking, Booking.STATUS_CONFIRMED, Booking.STATUS_COMPLETED, updated)
+            record_status_changes(
+                {booking_id: Booking.STATUS_CONFIRMED for booking_id, _ in rows}, Booking.STATUS_COMPLETED
+            )
+        bookings_completed.send(
+            sender=Booking,
+            booking_ids=[booking_id for booking_id, _ in rows],
+            dog_sitter_ids=sorted({sitter_id for _, sitter_id in rows}),
         )
         messages.success(request, f'Отмечено как завершенные: {updated} бронирований')
     mark_as_completed.short_description = "Отметить как завершенные"
 
     def mark_as_cancelled(self, request, queryset):
-        updated = queryset.exclude(status__in=['completed', 'cancelled']).update(
-            status='cancelled',
-            updated_at=timezone.now()
-        )
+        with transaction.atomic():
+            cancellable = queryset.exclude(status__in=['completed', 'cancelled'])
+            old_statuses = dict(cancellable.values_list('id', 'status'))
+            updated = cancellable.update(
+                status='cancelled',
+                updated_at=timezone.now()
+            )
+            record_status_changes(old_statuses, Booking.STATUS_CANCELLED)
+        counters.reconcile([Booking])
+        bookings_changed.send(sender=Booking, booking_ids=list(queryset.values_list('id', flat=True)))
         messages.success(request, f'Отмечено как отмененные: {updated} бронирований')
     mark_as_cancelled.short_description = "Отметить как отмененные"
 
@@ -244,4 +277,24 @@ class BookingAnimalAdmin(admin.ModelAdmin):
     list_display = ['booking', 'animal', 'added_at']
     list_filter = ['added_at']
     search_fields = ['booking__id', 'animal__name', 'special_notes']
-    readonly_fields = ['added_at']
\ No newline at end of file
+    readonly_fields = ['added_at']
+
+@admin.register(BookingSchedule)
+class BookingScheduleAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'dog_sitter', 'frequency', 'interval', 'start_date', 'until', 'is_active', 'materialized_until']
+    list_filter = ['frequency', 'is_active']
+    search_fields = ['user__email', 'dog_sitter__user__email']
+    filter_horizontal = ['animals', 'services']
+    readonly_fields = ['materialized_until', 'created_at', 'updated_at']
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'dog_sitter', 'start_date', 'end_date', 'status', 'total_price', 'archived_at']
+    list_filter = ['status', 'archived_at']
+    search_fields = ['user__email', 'dog_sitter__user__email']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,147 @@
+"""
+Архивирование старых бронирований.
+
+Завершённые и отменённые бронирования, закончившиеся раньше горизонта
+(settings.BOOKING_ARCHIVE_AFTER_DAYS), переносятся в ArchivedBooking
+вместе с животными (BookingAnimal), связями с услугами и отзывами.
+Каждая пачка переносится в отдельной транзакции: строки копируются
+через bulk_create и удаляются из основных таблиц, поэтому рабочая
+таблица Booking остаётся небольшой, а прерванный запуск можно повторить.
+
+Перенос в архив - не удаление: строки удаляются SQL-запросом
+DELETE ... WHERE id IN (...) без Booking.delete() и сигналов. Приёмники
+post_delete бронирований выписали бы обратные записи в журнал заработка
+(main.earnings учитывает и архивные бронирования), удалили бы файлы
+документов, доступные из архивной записи, и отправили бы события
+синхронизации. Счётчики, метки удаления для синхронизации и сброс
+статистики архив выполняет сам.
+
+Идентификаторы сохраняются, поэтому Booking.objects.with_history()
+объединяет живые и архивные записи без пересечений.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from . import counters, sitter_stats
+from .response_cache import invalidate_tags
+from .models import (
+    ArchivedBooking, ArchivedBookingAnimal, ArchivedReview,
+    Booking, BookingAnimal, Review, SyncTombstone,
+)
+
+ARCHIVABLE_STATUSES = (Booking.STATUS_COMPLETED, Booking.STATUS_CANCELLED)
+
+
+def archive_horizon(days=None):
+    if days is None:
+        days = settings.BOOKING_ARCHIVE_AFTER_DAYS
+    return timezone.now().date() - timedelta(days=days)
+
+
+def archivable_bookings(before):
+    return Booking.objects.filter(status__in=ARCHIVABLE_STATUSES, end_date__lt=before)
+
+
+def _copy_rows(model, archive_model, queryset, **overrides):
+    fields = [field.attname for field in model._meta.concrete_fields]
+    rows = [archive_model(**row, **overrides) for row in queryset.values(*fields)]
+    archive_model.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _delete_rows(model, column, ids):
+    """DELETE по списку значений столбца, без сигналов и каскадного удаления Django"""
+    connection = connections[router.db_for_write(model)]
+    table = connection.ops.quote_name(model._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {connection.ops.quote_name(column)} IN ({placeholders})', ids
+        )
+
+
+def archive_batch(booking_ids):
+    """Переносит в архив бронирования с указанными id. Возвращает число перенесённых"""
+    with transaction.atomic():
+        # Повторно проверяем статус под транзакцией: бронирование могли изменить после выборки id
+        rows = list(
+            Booking.objects.filter(id__in=booking_ids, status__in=ARCHIVABLE_STATUSES)
+            .order_by().values_list('id', 'dog_sitter_id', 'status', 'user_id', 'dog_sitter__user_id')
+        )
+        if not rows:
+            return 0
+        ids = [row[0] for row in rows]
+
+        archived_at = timezone.now()
+        _copy_rows(Booking, ArchivedBooking, Booking.objects.filter(id__in=ids).order_by(), archived_at=archived_at)
+
+        animals = BookingAnimal.objects.filter(booking_id__in=ids).order_by()
+        ArchivedBookingAnimal.objects.bulk_create([
+            ArchivedBookingAnimal(**row)
+            for row in animals.values('booking_id', 'animal_id', 'special_notes',
+                                      'special_diet', 'medications', 'added_at')
+        ])
+
+        services = Booking.services.through.objects.filter(booking_id__in=ids)
+        ArchivedBooking.services.through.objects.bulk_create([
+            ArchivedBooking.services.through(archivedbooking_id=booking_id, service_id=service_id)
+            for booking_id, service_id in services.values_list('booking_id', 'service_id')
+        ])
+
+        review_rows = list(Review.objects.filter(booking_id__in=ids).values_list('id', 'booking_id'))
+        reviews = _copy_rows(Review, ArchivedReview, Review.objects.filter(booking_id__in=ids).order_by())
+
+        # Удаляем без Booking.delete() и сигналов (см. описание модуля)
+        _delete_rows(Review, 'booking_id', ids)
+        _delete_rows(BookingAnimal, 'booking_id', ids)
+        _delete_rows(Booking.services.through, 'booking_id', ids)
+        _delete_rows(Booking, 'id', ids)
+
+        deltas = {'bookings': -len(ids), 'reviews': -reviews}
+        for _, _, status, _, _ in rows:
+            deltas[f'bookings.{status}'] = deltas.get(f'bookings.{status}', 0) - 1
+        counters.apply_deltas(deltas)
+
+        # Для синхронизации клиентов архивные записи - удалённые
+        audience = {row[0]: {'user_id': row[3], 'sitter_user_id': row[4]} for row in rows}
+        tombstones = [
+            SyncTombstone(resource='bookings', object_id=booking_id, **users)
+            for booking_id, users in audience.items()
+        ]
+        tombstones += [
+            SyncTombstone(resource='reviews', object_id=review_id, **audience[booking_id])
+            for review_id, booking_id in review_rows
+        ]
+        SyncTombstone.objects.bulk_create(tombstones)
+        # Статистика догситтера считается по живым бронированиям
+        transaction.on_commit(lambda: sitter_stats.invalidate(row[1] for row in rows))
+        invalidate_tags('dogsitters', 'statistics')
+    return len(ids)
+
+
+def archive_bookings(before=None, batch_size=None, limit=None, stdout=None):
+    """
+    Переносит в архив все подходящие бронирования пачками по batch_size.
+    limit ограничивает общее число перенесённых за запуск.
+    """
+    before = before or archive_horizon()
+    batch_size = batch_size or settings.BOOKING_ARCHIVE_BATCH_SIZE
+    total = 0
+    last_id = 0
+    while limit is None or total < limit:
+        size = batch_size if limit is None else min(batch_size, limit - total)
+        ids = list(
+            archivable_bookings(before).filter(id__gt=last_id)
+            .order_by('id').values_list('id', flat=True)[:size]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        moved = archive_batch(ids)
+        total += moved
+        if stdout:
+            stdout.write(f"  перенесено {moved} (всего {total})")
+    return total
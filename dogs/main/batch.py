@@ -0,0 +1,160 @@
+"""
+Пакетное выполнение GET-запросов API за один HTTP-запрос.
+
+Клиент присылает список подзапросов [{"id": ..., "path": "animals/?page=2"}]
+и получает [{"id": ..., "status": 200, "body": ...}] в том же порядке.
+Путь задаётся от корня API (или полным путём /api/...); разрешаются только
+маршруты API на представлениях DRF (см. batchable) и только GET.
+
+Подзапросы проходят обычные представления (разрешения, кэш ответов,
+ETag), но без повторной аутентификации: пользователь и токен пакетного
+запроса передаются им напрямую. Ответы DRF отдаются без рендеринга -
+их данные сериализуются один раз вместе со всем пакетом.
+
+Общее с пакетным запросом соединение с базой у подзапросов только при
+BATCH_MAX_WORKERS = 1: тогда они выполняются по очереди в потоке запроса.
+Подзапросы независимы (только GET), поэтому при большем значении они идут
+параллельно в пуле потоков, и каждый поток открывает своё соединение и
+закрывает его после подзапроса. Такие подзапросы не видят транзакцию
+пакетного запроса и читают данные каждый на момент своего выполнения.
+Параллельность имеет смысл для PostgreSQL, но не для SQLite.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connection
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve, reverse
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse_items(data):
+    """Проверяет тело пакета; возвращает список (id, путь)"""
+    items = data.get('requests') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        raise BatchError("Ожидается непустой список запросов")
+    if len(items) > settings.BATCH_MAX_REQUESTS:
+        raise BatchError(f"Не более {settings.BATCH_MAX_REQUESTS} запросов в пакете")
+    parsed = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {'path': item}
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise BatchError(f"Запрос {index}: нужен путь (path)")
+        if item.get('method', 'GET').upper() != 'GET':
+            raise BatchError(f"Запрос {index}: поддерживается только GET")
+        parsed.append((item.get('id', index), item['path']))
+    return parsed
+
+
+def _api_path(path):
+    root = reverse('index')
+    if not path.startswith(root):
+        path = root + path.lstrip('/')
+    return path
+
+
+def _sub_request(request, path, query):
+    """Копия пакетного запроса с другим путём и уже известным пользователем"""
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = path
+    sub.META = {
+        key: value for key, value in request.META.items()
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+    }
+    sub.META.update({'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query})
+    sub.GET = QueryDict(query)
+    sub.COOKIES = request.COOKIES
+    sub.user = request.user
+    if hasattr(request._request, 'session'):
+        sub.session = request._request.session
+    if request.user.is_authenticated:
+        # Подзапросы не аутентифицируются заново (см. rest_framework.request.Request)
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+    return sub
+
+
+def _body(response):
+    if isinstance(response, Response) and response.data is not None:
+        return response.data
+    if response.streaming:
+        return None
+    content = response.content.decode(response.charset or 'utf-8')
+    if 'json' in response.get('Content-Type', ''):
+        try:
+            return json.loads(content) if content else None
+        except ValueError:
+            pass
+    return content
+
+
+def batchable(view):
+    """
+    Только представления DRF: они проверяют метод и отвечают 405 на GET к
+    изменяющему маршруту. Обычные представления Django могут менять данные
+    по GET (удаление животного, отмена бронирования) и не выполняются.
+    Сам пакет и асинхронные потоки (SSE) тоже исключены
+    """
+    view_class = getattr(view, 'cls', None)
+    if not (isinstance(view_class, type) and issubclass(view_class, APIView)):
+        return False
+    return not getattr(view, 'batch_excluded', False) and not iscoroutinefunction(view)
+
+
+def execute_one(request, path):
+    """(статус, тело, заголовки) одного подзапроса"""
+    parts = urlsplit(_api_path(path))
+    try:
+        match = resolve(parts.path)
+    except Resolver404:
+        return 404, {'detail': "Маршрут не найден"}, {}
+    if not batchable(match.func):
+        return 400, {'detail': "Маршрут недоступен в пакете"}, {}
+
+    try:
+        response = match.func(_sub_request(request, parts.path, parts.query), *match.args, **match.kwargs)
+    except Http404:
+        return 404, {'detail': "Не найдено"}, {}
+    except PermissionDenied:
+        return 403, {'detail': "Доступ запрещён"}, {}
+    except Exception:
+        logger.exception("Ошибка подзапроса пакета: %s", path)
+        return 500, {'detail': "Внутренняя ошибка"}, {}
+
+    headers = {name: response[name] for name in ('ETag', 'Last-Modified', 'Location') if response.has_header(name)}
+    return response.status_code, _body(response), headers
+
+
+def _execute_in_thread(request, path):
+    try:
+        return execute_one(request, path)
+    finally:
+        connection.close()
+
+
+def execute(request, items):
+    """Выполняет подзапросы; результаты в порядке items"""
+    workers = min(settings.BATCH_MAX_WORKERS, len(items))
+    if workers <= 1:
+        results = [execute_one(request, path) for _, path in items]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda item: _execute_in_thread(request, item[1]), items))
+    return [
+        {'id': item_id, 'status': status, 'headers': headers, 'body': body}
+        for (item_id, _), (status, body, headers) in zip(items, results)
+    ]
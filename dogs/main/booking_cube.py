@@ -0,0 +1,214 @@
+"""
+Куб помесячной статистики бронирований.
+
+BookingMonthStats хранит готовые агрегаты по ячейкам
+(месяц, догситтер, владелец, статус). При записи бронирования
+пересчитываются только затронутые ячейки (месяц, догситтер, владелец):
+в них обычно единицы бронирований, поэтому пересчёт дешёвый и сам
+исправляет расхождения. Графики по месяцам (DogSitter.get_bookings_by_month,
+User.get_bookings_by_month_annotated, aggregation_annotation_examples)
+читают куб вместо группировки всех бронирований через TruncMonth.
+
+Сигналы, поддерживающие куб, подключены в main.signals. Они не
+пересчитывают ячейки сразу, а копят ключи в schedule_refresh: за
+транзакцию (Booking.save пишет строку дважды, затем животные и услуги)
+ячейки пересчитываются один раз, после фиксации. Пересчёт читает
+бронирования и записывает ячейки в одной транзакции под блокировкой
+строк догситтеров (на SQLite транзакцию сериализует BEGIN IMMEDIATE),
+поэтому более старый агрегат не может записаться поверх нового; запись
+идёт через INSERT ... ON CONFLICT DO UPDATE.
+"""
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import (
+    ArchivedBooking, ArchivedBookingAnimal, Booking, BookingAnimal, BookingMonthStats, DogSitter,
+)
+
+MEASURES = ('bookings_count', 'revenue', 'priced_count', 'animals_count', 'services_count')
+
+# Таблицы бронирований: (модель, модель животных в бронировании, модель связи с услугами)
+SOURCES = (
+    (Booking, BookingAnimal, Booking.services.through, 'booking'),
+    (ArchivedBooking, ArchivedBookingAnimal, ArchivedBooking.services.through, 'archivedbooking'),
+)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def booking_key(booking):
+    """Ключ ячейки (месяц, догситтер, владелец) для бронирования"""
+    return (month_start(booking.start_date), booking.dog_sitter_id, booking.user_id)
+
+
+def _count_subquery(model, fk_name):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{fk_name: OuterRef('pk')}).order_by()
+            .values(fk_name).annotate(n=Count('pk')).values('n')
+        ),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _booking_rows(condition):
+    """Строки (ключ ячейки, статус, цена, животных, услуг) из живых и архивных бронирований"""
+    for model, animals_model, services_model, services_fk in SOURCES:
+        rows = model.objects.filter(condition).order_by().annotate(
+            animals_n=_count_subquery(animals_model, 'booking'),
+            services_n=_count_subquery(services_model, services_fk),
+        ).values_list('start_date', 'dog_sitter_id', 'user_id', 'status', 'total_price', 'animals_n', 'services_n')
+        for start_date, sitter_id, user_id, status, price, animals, services in rows.iterator(chunk_size=2000):
+            yield (month_start(start_date), sitter_id, user_id), status, price, animals, services
+
+
+def _aggregate(rows):
+    cells = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+    for key, status, price, animals, services in rows:
+        cell = cells[key + (status,)]
+        cell['bookings_count'] += 1
+        if price is not None:
+            cell['revenue'] += price
+            cell['priced_count'] += 1
+        cell['animals_count'] += animals
+        cell['services_count'] += services
+    return cells
+
+
+def _stats_objects(cells):
+    return [
+        BookingMonthStats(month=month, dog_sitter_id=sitter_id, user_id=user_id, status=status, **measures)
+        for (month, sitter_id, user_id, status), measures in cells.items()
+    ]
+
+
+def refresh_cells(keys):
+    """Пересчитывает ячейки куба для ключей (месяц, догситтер, владелец)"""
+    keys = {key for key in keys if None not in key}
+    if not keys:
+        return
+    booking_condition = Q()
+    for month, sitter_id, user_id in keys:
+        booking_condition |= Q(
+            start_date__gte=month, start_date__lt=next_month(month),
+            dog_sitter_id=sitter_id, user_id=user_id,
+        )
+
+    with transaction.atomic():
+        # Пересчёты одного догситтера выполняются по очереди
+        list(
+            DogSitter.objects.select_for_update().filter(pk__in={key[1] for key in keys})
+            .order_by('pk').values_list('pk')
+        )
+        cells = _aggregate(_booking_rows(booking_condition))
+        statuses = defaultdict(list)
+        for month, sitter_id, user_id, status in cells:
+            statuses[(month, sitter_id, user_id)].append(status)
+        # Ячейки статусов, бронирований в которых не осталось
+        stale_condition = Q()
+        for month, sitter_id, user_id in keys:
+            stale_condition |= Q(month=month, dog_sitter_id=sitter_id, user_id=user_id) & ~Q(
+                status__in=statuses[(month, sitter_id, user_id)]
+            )
+
+        BookingMonthStats.objects.filter(stale_condition).delete()
+        BookingMonthStats.objects.bulk_create(
+            _stats_objects(cells),
+            update_conflicts=True,
+            unique_fields=['month', 'dog_sitter', 'user', 'status'],
+            update_fields=list(MEASURES),
+        )
+
+
+# Ключи, ожидающие пересчёта, по потокам (у каждого потока своё подключение)
+_pending = threading.local()
+
+
+def _flush_pending():
+    keys = getattr(_pending, 'keys', None)
+    _pending.keys = set()
+    if keys:
+        refresh_cells(keys)
+
+
+def schedule_refresh(keys):
+    """
+    Откладывает пересчёт ячеек до фиксации текущей транзакции. Ключи
+    копятся в общем множестве потока; первый обработчик после фиксации
+    пересчитывает их все, следующие находят множество пустым. Ключи
+    отменённой транзакции пересчитываются вместе со следующими - пересчёт
+    по текущим данным от этого не портится
+    """
+    keys = {key for key in keys if None not in key}
+    if not keys:
+        return
+    if getattr(_pending, 'keys', None) is None:
+        _pending.keys = set()
+    _pending.keys.update(keys)
+    transaction.on_commit(_flush_pending)
+
+
+def refresh_bookings(booking_ids):
+    """
+    Пересчитывает после фиксации транзакции ячейки, в которые попадают
+    указанные бронирования. Возвращает их ключи
+    """
+    rows = Booking.objects.filter(id__in=list(booking_ids)).order_by().values_list(
+        'start_date', 'dog_sitter_id', 'user_id'
+    )
+    keys = {(month_start(start_date), sitter_id, user_id) for start_date, sitter_id, user_id in rows}
+    schedule_refresh(keys)
+    return keys
+
+
+def rebuild():
+    """Полностью пересобирает куб. Возвращает число ячеек"""
+    cells = _aggregate(_booking_rows(Q()))
+    with transaction.atomic():
+        BookingMonthStats.objects.all().delete()
+        BookingMonthStats.objects.bulk_create(_stats_objects(cells), batch_size=1000)
+    return len(cells)
+
+
+def monthly_series(**filters):
+    """
+    Помесячные итоги по ячейкам куба, отфильтрованным по filters
+    (dog_sitter, user, status...). Список словарей, от новых месяцев к старым.
+    """
+    rows = BookingMonthStats.objects.filter(**filters).values('month', 'status').annotate(
+        **{measure: Sum(measure) for measure in MEASURES}
+    ).order_by()
+
+    months = defaultdict(lambda: dict(
+        dict.fromkeys(MEASURES, 0), completed_count=0, cancelled_count=0
+    ))
+    for row in rows:
+        month = months[row['month']]
+        for measure in MEASURES:
+            month[measure] += row[measure] or 0
+        if row['status'] == Booking.STATUS_COMPLETED:
+            month['completed_count'] += row['bookings_count']
+        elif row['status'] == Booking.STATUS_CANCELLED:
+            month['cancelled_count'] += row['bookings_count']
+
+    series = []
+    for month in sorted(months, reverse=True):
+        totals = months[month]
+        priced = totals.pop('priced_count')
+        totals['revenue'] = Decimal(totals['revenue'])
+        totals['avg_price'] = totals['revenue'] / priced if priced else None
+        series.append(dict(month=month, **totals))
+    return series
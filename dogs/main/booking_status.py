@@ -0,0 +1,80 @@
+"""
+Массовый перевод закончившихся бронирований в статус completed.
+
+complete_finished_bookings обрабатывает подтверждённые бронирования с
+end_date в прошлом пачками по chunk_size: каждая пачка - одна транзакция
+с одним UPDATE по списку id. Условие status='confirmed' повторяется в
+UPDATE, а на PostgreSQL строки отбираются с SELECT ... FOR UPDATE SKIP
+LOCKED, поэтому параллельные запуски не переводят одно бронирование
+дважды и не ждут друг друга. События смены статуса, счётчики и сигнал
+bookings_completed (после фиксации пачки, для пересчёта агрегатов)
+получают только бронирования, которые перевёл этот UPDATE: их id
+перечитываются по статусу и выставленному им времени updated_at.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters
+from .events import record_status_changes
+from .models import Booking
+from .signals import bookings_completed
+
+
+def finished_bookings(today=None):
+    today = today or timezone.now().date()
+    return Booking.objects.filter(status=Booking.STATUS_CONFIRMED, end_date__lt=today)
+
+
+def complete_batch(today, chunk_size):
+    """
+    Переводит одну пачку в completed.
+    Возвращает (число выбранных, число переведённых).
+    """
+    with transaction.atomic():
+        rows = list(
+            finished_bookings(today)
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', 'dog_sitter_id')[:chunk_size]
+        )
+        if not rows:
+            return 0, 0
+
+        selected_ids = [booking_id for booking_id, _ in rows]
+        now = timezone.now()
+        updated = Booking.objects.filter(
+            id__in=selected_ids, status=Booking.STATUS_CONFIRMED
+        ).update(status=Booking.STATUS_COMPLETED, updated_at=now)
+
+        if updated:
+            completed_rows = rows
+            # Без блокировок (SQLite) часть выбранных строк могли изменить до UPDATE
+            if updated < len(rows):
+                completed = set(Booking.objects.filter(
+                    id__in=selected_ids, status=Booking.STATUS_COMPLETED, updated_at=now
+                ).values_list('id', flat=True))
+                completed_rows = [row for row in rows if row[0] in completed]
+            booking_ids = [booking_id for booking_id, _ in completed_rows]
+            counters.record_changed(Booking, Booking.STATUS_CONFIRMED, Booking.STATUS_COMPLETED, len(booking_ids))
+            record_status_changes(dict.fromkeys(booking_ids, Booking.STATUS_CONFIRMED), Booking.STATUS_COMPLETED)
+            dog_sitter_ids = sorted({sitter_id for _, sitter_id in completed_rows})
+            transaction.on_commit(lambda: bookings_completed.send(
+                sender=Booking, booking_ids=booking_ids, dog_sitter_ids=dog_sitter_ids
+            ))
+    return len(rows), updated
+
+
+def complete_finished_bookings(today=None, chunk_size=None, stdout=None):
+    """Переводит все закончившиеся подтверждённые бронирования в completed"""
+    today = today or timezone.now().date()
+    chunk_size = chunk_size or settings.BOOKING_COMPLETION_CHUNK_SIZE
+    total = 0
+    while True:
+        selected, updated = complete_batch(today, chunk_size)
+        if not selected:
+            break
+        total += updated
+        if stdout:
+            stdout.write(f"  завершено {updated} (всего {total})")
+    return total
@@ -0,0 +1,168 @@
+"""
+Массовое создание бронирований (POST /api/bookings/bulk/).
+
+Бронирования по одному (BookingViewSet.create) проходят через
+Booking.save: две записи строки, запрос услуг и животных на каждое
+бронирование и сигналы на каждую запись. Здесь пачка из сотен
+бронирований (например, прогулки на весь сезон) создаётся постоянным
+числом запросов:
+
+- ссылки (догситтеры, животные владельца, услуги) проверяются одним
+  запросом на таблицу;
+- пересечения с активными бронированиями тех же животных и внутри пачки
+  проверяются за один проход по отсортированным интервалам после одного
+  запроса к базе;
+- стоимость считается по тем же правилам, что в Booking.save, по
+  таблицам цен услуг и размеров животных, загруженным один раз;
+- бронирования, BookingAnimal и связи с услугами вставляются bulk_create
+  в одной транзакции.
+
+Сигналы post_save при bulk_create не отправляются, поэтому их работа
+выполняется здесь же пачкой: счётчики (main.counters), события смены
+статуса (main.events) и bookings_changed - куб статистики, статистика
+догситтеров и кэш ответов. Ошибка любого элемента отклоняет всю пачку;
+ошибки возвращаются списком по элементам, как у ListSerializer.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from rest_framework import serializers
+
+from . import counters
+from .events import record_status_changes
+from .models import Animal, Booking, BookingAnimal, DogSitter, Service
+from .signals import bookings_changed
+
+ACTIVE_STATUSES = (Booking.STATUS_PENDING, Booking.STATUS_CONFIRMED)
+
+
+def _unique(ids):
+    return list(dict.fromkeys(ids))
+
+
+def _resolve(user, items, errors):
+    """(размеры животных, цены услуг); недоступные ссылки записываются в errors"""
+    sitter_ids = {item['dog_sitter'] for item in items}
+    animal_ids = {animal_id for item in items for animal_id in item['animals']}
+    service_ids = {service_id for item in items for service_id in item['services']}
+
+    sitters = set(DogSitter.objects.filter(pk__in=sitter_ids).values_list('pk', flat=True))
+    # Блокировка животных упорядочивает параллельные пачки с теми же животными
+    sizes = dict(
+        Animal.objects.select_for_update().filter(pk__in=animal_ids, user=user).values_list('pk', 'size')
+    )
+    prices = dict(Service.objects.filter(pk__in=service_ids).values_list('pk', 'price'))
+
+    for index, item in enumerate(items):
+        if item['dog_sitter'] not in sitters:
+            errors[index].setdefault('dog_sitter', []).append("Догситтер не найден")
+        for animal_id in item['animals']:
+            if animal_id not in sizes:
+                errors[index].setdefault('animals', []).append(f"Животное {animal_id} не найдено")
+        for service_id in item['services']:
+            if service_id not in prices:
+                errors[index].setdefault('services', []).append(f"Услуга {service_id} не найдена")
+    return sizes, prices
+
+
+def find_overlaps(items):
+    """
+    Пересечения по животным за один запрос к базе и один проход.
+    {индекс элемента: id животного} для элементов, пересекающихся с
+    активным бронированием того же животного или с другим элементом пачки
+    """
+    animal_ids = {animal_id for item in items for animal_id in item['animals']}
+    spans = defaultdict(list)  # животное -> [(начало, конец, индекс элемента или None)]
+    existing = BookingAnimal.objects.filter(
+        animal_id__in=animal_ids,
+        booking__status__in=ACTIVE_STATUSES,
+        booking__start_date__lt=max(item['end_date'] for item in items),
+        booking__end_date__gt=min(item['start_date'] for item in items),
+    ).values_list('animal_id', 'booking__start_date', 'booking__end_date')
+    for animal_id, start, end in existing:
+        spans[animal_id].append((start, end, None))
+    for index, item in enumerate(items):
+        for animal_id in item['animals']:
+            spans[animal_id].append((item['start_date'], item['end_date'], index))
+
+    overlaps = {}
+    for animal_id, intervals in spans.items():
+        intervals.sort(key=lambda span: (span[0], span[1]))
+        open_spans = []
+        for start, end, index in intervals:
+            # Интервалы полуоткрытые: окончание одного в день начала другого - не пересечение
+            open_spans = [span for span in open_spans if span[1] > start]
+            for _, _, other in open_spans:
+                culprit = index if index is not None else other
+                if culprit is not None:
+                    overlaps.setdefault(culprit, animal_id)
+            open_spans.append((start, end, index))
+    return overlaps
+
+
+def price(item, sizes, prices):
+    """Стоимость элемента по правилам Booking.save"""
+    days = (item['end_date'] - item['start_date']).days
+    service_cost = sum(prices[service_id] for service_id in item['services'])
+    animal_cost = sum(Booking.SIZE_COST_MAP.get(sizes[animal_id], 500) for animal_id in item['animals'])
+    return (service_cost + animal_cost) * days
+
+
+@transaction.atomic
+def create_bookings(user, items):
+    """
+    Создаёт бронирования user по элементам, прошедшим BulkBookingItemSerializer.
+    Возвращает id созданных бронирований в порядке элементов; при ошибке
+    любого элемента ничего не создаётся (ValidationError со списком ошибок)
+    """
+    items = [
+        {**item, 'animals': _unique(item['animals']), 'services': _unique(item.get('services', []))}
+        for item in items
+    ]
+    errors = [{} for _ in items]
+    sizes, prices = _resolve(user, items, errors)
+    for index, animal_id in find_overlaps(items).items():
+        errors[index].setdefault('animals', []).append(
+            f"У животного {animal_id} есть пересекающееся бронирование на эти даты"
+        )
+    if any(errors):
+        raise serializers.ValidationError(errors)
+
+    return insert_bookings([{**item, 'user_id': user.pk} for item in items], sizes, prices)
+
+
+def insert_bookings(items, sizes, prices):
+    """
+    Вставляет проверенные элементы (с user_id, у вхождений расписаний - schedule_id)
+    и выполняет за них работу сигналов. Возвращает id бронирований в порядке элементов
+    """
+    bookings = Booking.objects.bulk_create([
+        Booking(
+            user_id=item['user_id'],
+            schedule_id=item.get('schedule_id'),
+            dog_sitter_id=item['dog_sitter'],
+            start_date=item['start_date'],
+            end_date=item['end_date'],
+            total_price=price(item, sizes, prices),
+        )
+        for item in items
+    ])
+    BookingAnimal.objects.bulk_create([
+        BookingAnimal(booking_id=booking.pk, animal_id=animal_id)
+        for booking, item in zip(bookings, items)
+        for animal_id in item['animals']
+    ])
+    Booking.services.through.objects.bulk_create([
+        Booking.services.through(booking_id=booking.pk, service_id=service_id)
+        for booking, item in zip(bookings, items)
+        for service_id in item['services']
+    ])
+
+    booking_ids = [booking.pk for booking in bookings]
+    if booking_ids:
+        counters.apply_deltas({
+            name: len(booking_ids) for name in counters.counter_names(Booking, Booking.STATUS_PENDING)
+        })
+        record_status_changes(dict.fromkeys(booking_ids), Booking.STATUS_PENDING)
+        bookings_changed.send(sender=Booking, booking_ids=booking_ids)
+    return booking_ids
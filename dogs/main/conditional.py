@@ -0,0 +1,101 @@
+"""
+ETag и Last-Modified для читающих API.
+
+Декоратор conditional_get до вызова представления считает отпечаток
+данных одним агрегирующим запросом: число записей и для каждого поля
+updated_at из fields - максимум и число значений (оно меняется при
+добавлении и удалении связанных записей). Если отпечаток совпадает с
+If-None-Match клиента (или данные не менялись после If-Modified-Since),
+сразу возвращается 304 без выборки и сериализации; иначе ответ
+представления дополняется заголовками ETag и Last-Modified.
+
+В отпечаток входят пользователь (ответы зависят от прав) и текущая дата
+(часть полей, например доступность животного, считается от сегодняшнего
+дня). Last-Modified отдаётся только для одной записи: удаление записи из
+списка не меняет максимум updated_at, поэтому списки проверяются по ETag.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.http import HttpRequest
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.request import Request
+
+
+def fingerprint(queryset, fields, request=None):
+    """(etag, last_modified) для queryset; None, если записей нет"""
+    aggregates = {'records': Count('pk', distinct=True)}
+    for index, field in enumerate(fields):
+        aggregates[f'max_{index}'] = Max(field)
+        aggregates[f'count_{index}'] = Count(field)
+    values = queryset.order_by().aggregate(**aggregates)
+    if not values['records']:
+        return None
+
+    stamps = [values[f'max_{index}'] for index in range(len(fields))]
+    user_id = getattr(getattr(request, 'user', None), 'pk', None)
+    parts = [values['records'], user_id, timezone.localdate()]
+    parts += [values[f'count_{index}'] for index in range(len(fields))]
+    parts += [str(stamp) for stamp in stamps]
+    etag = quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+    last_modified = max((stamp for stamp in stamps if isinstance(stamp, datetime)), default=None)
+    return etag, last_modified
+
+
+def _view_queryset(view, kwargs):
+    """(queryset, detail) для метода ViewSet'а"""
+    queryset = view.filter_queryset(view.get_queryset())
+    lookup = view.lookup_url_kwarg or view.lookup_field
+    if lookup in kwargs:
+        return queryset.filter(**{view.lookup_field: kwargs[lookup]}), True
+    return queryset, False
+
+
+def conditional_get(*fields, queryset=None):
+    """
+    Условный GET для функций-представлений и методов ViewSet'ов.
+
+    fields - поля updated_at записи и её связей ('updated_at', 'user__updated_at');
+    для связей без updated_at подходит id - учитывается число связанных записей.
+    queryset - функция (request, *args, **kwargs) -> QuerySet одной записи; для
+    методов ViewSet'а по умолчанию берётся queryset представления (для
+    detail - отфильтрованный по lookup).
+    """
+    fields = fields or ('updated_at',)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            if isinstance(args[0], (HttpRequest, Request)):
+                view, request, view_args = None, args[0], args[1:]
+            else:
+                view, request, view_args = args[0], args[1], args[2:]
+            if request.method != 'GET':
+                return view_func(*args, **kwargs)
+
+            if queryset is not None:
+                records, detail = queryset(request, *view_args, **kwargs), True
+            else:
+                records, detail = _view_queryset(view, kwargs)
+            validators = fingerprint(records, fields, request)
+            if validators is None:
+                return view_func(*args, **kwargs)
+
+            etag, last_modified = validators
+            last_modified = int(last_modified.timestamp()) if detail and last_modified else None
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            response = view_func(*args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                if last_modified:
+                    response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,134 @@
+"""
+Счётчики записей для главной страницы и общей статистики.
+
+SystemCounter хранит по строке на счётчик: общее число записей модели
+('bookings') и разбивку по полю ('bookings.completed', 'animals.dog').
+Сигналы (main.signals) прибавляют и вычитают единицы при создании,
+удалении и смене статуса или типа; массовые операции в обход save()
+применяют разницу через apply_deltas или вызывают reconcile.
+reconcile пересчитывает счётчики по таблицам одним запросом на модель -
+после миграции, генерации данных и периодически командой
+reconcile_counters.
+
+Чтение идёт через снимок всех счётчиков в памяти процесса с коротким
+временем жизни (COUNTERS_CACHE_TTL), поэтому главная страница не делает
+COUNT(*) по таблицам.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count, F
+
+from .models import Animal, Booking, DogSitter, Review, SystemCounter, User
+
+# Модель: (префикс счётчика, поле для разбивки или None)
+TRACKED = {
+    User: ('users', None),
+    Animal: ('animals', 'type'),
+    DogSitter: ('dogsitters', None),
+    Booking: ('bookings', 'status'),
+    Review: ('reviews', None),
+}
+
+
+def counter_names(model, value=None):
+    """Счётчики, в которые входит запись модели со значением поля разбивки value"""
+    prefix, field = TRACKED[model]
+    if field is None or value is None:
+        return [prefix]
+    return [prefix, f'{prefix}.{value}']
+
+
+def _all_names(model):
+    prefix, field = TRACKED[model]
+    names = [prefix]
+    if field:
+        names += [f'{prefix}.{value}' for value, _ in model._meta.get_field(field).choices]
+    return names
+
+
+class CountersSnapshot:
+    """Снимок всех счётчиков в памяти процесса с коротким временем жизни"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._values = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._values is not None and self._expires_at > time.monotonic():
+                return self._values
+        values = dict(SystemCounter.objects.values_list('name', 'value'))
+        with self._lock:
+            self._values = values
+            self._expires_at = time.monotonic() + self.ttl
+        return values
+
+    def clear(self):
+        with self._lock:
+            self._values = None
+
+
+snapshot = CountersSnapshot(ttl=getattr(settings, 'COUNTERS_CACHE_TTL', 5))
+
+
+def apply_deltas(deltas):
+    """Прибавляет к счётчикам значения из {имя: разница}"""
+    for name, delta in deltas.items():
+        if delta:
+            SystemCounter.objects.filter(name=name).update(value=F('value') + delta)
+    snapshot.clear()
+
+
+def record_created(model, value=None):
+    apply_deltas({name: 1 for name in counter_names(model, value)})
+
+
+def record_deleted(model, value=None):
+    apply_deltas({name: -1 for name in counter_names(model, value)})
+
+
+def record_changed(model, old_value, new_value, count=1):
+    """Учитывает смену значения поля разбивки у count записей"""
+    if old_value == new_value:
+        return
+    prefix, _ = TRACKED[model]
+    apply_deltas({f'{prefix}.{old_value}': -count, f'{prefix}.{new_value}': count})
+
+
+def reconcile(models=None):
+    """Пересчитывает счётчики указанных моделей (по умолчанию всех) по таблицам"""
+    values = {}
+    for model in models or TRACKED:
+        prefix, field = TRACKED[model]
+        counts = Counter(dict.fromkeys(_all_names(model), 0))
+        if field is None:
+            counts[prefix] = model.objects.count()
+        else:
+            for row in model.objects.order_by().values(field).annotate(n=Count('pk')):
+                counts[prefix] += row['n']
+                counts[f'{prefix}.{row[field]}'] += row['n']
+        values.update(counts)
+
+    SystemCounter.objects.bulk_create(
+        [SystemCounter(name=name, value=value) for name, value in values.items()],
+        update_conflicts=True,
+        unique_fields=['name'],
+        update_fields=['value', 'updated_at'],
+    )
+    snapshot.clear()
+    return values
+
+
+def get_counts():
+    """Все счётчики {имя: значение}; отсутствующие пересчитываются"""
+    values = snapshot.get()
+    missing = [model for model in TRACKED if any(name not in values for name in _all_names(model))]
+    if missing:
+        reconcile(missing)
+        values = snapshot.get()
+    return values
@@ -0,0 +1,214 @@
+"""
+Генератор синтетических данных для нагрузочного тестирования.
+
+Все объекты создаются через bulk_create, поэтому Booking.save и Review.save
+не вызываются: стоимость бронирований, рейтинги догситтеров, журнал
+заработка, куб помесячной статистики и счётчики вычисляются здесь же. При одинаковом seed генерируется одинаковый набор данных.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import booking_cube, counters
+from .earnings import rebuild_ledger
+from .models import User, Animal, DogSitter, Service, Booking, BookingAnimal, Review
+from .signals import recalculate_sitter_ratings
+
+DEFAULT_PASSWORD = 'benchmark-pass-123'
+
+FIRST_NAMES = ['Иван', 'Пётр', 'Анна', 'Мария', 'Сергей', 'Ольга', 'Дмитрий', 'Елена', 'Алексей', 'Наталья']
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов', 'Морозов', 'Волков']
+ANIMAL_NAMES = ['Рекс', 'Барсик', 'Шарик', 'Мурка', 'Бобик', 'Пушок', 'Тузик', 'Снежок', 'Лайка', 'Граф']
+BREEDS = ['Лабрадор', 'Овчарка', 'Такса', 'Мопс', 'Сиамская', 'Британская', 'Корги', 'Хаски', '']
+SERVICES = [
+    ('Выгул собаки', 300), ('Кормление', 200), ('Передержка', 1000), ('Груминг', 800),
+    ('Дрессировка', 1200), ('Визит на дом', 500), ('Прогулка с кошкой', 250), ('Такси для животных', 700),
+]
+
+
+class DatasetGenerator:
+    """
+    Создаёт пользователей, догситтеров, животных, услуги, бронирования
+    (с животными и услугами) и отзывы. Количество пользователей и
+    догситтеров выводится из количества бронирований, если не задано явно.
+    """
+
+    def __init__(self, seed=42, batch_size=5000, prefix='bench', stdout=None):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.stdout = stdout
+        self.password = make_password(DEFAULT_PASSWORD)
+        self.today = timezone.now().date()
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def generate(self, bookings, users=None, sitters=None, animals_per_user=1.5, review_ratio=0.5):
+        users = users if users is not None else max(bookings // 10, 10)
+        sitters = sitters if sitters is not None else max(bookings // 100, 5)
+
+        with transaction.atomic():
+            services = self.create_services()
+            owners = self.create_users(users, role='user')
+            sitter_users = self.create_users(sitters, role='sitter')
+            dog_sitters = self.create_dogsitters(sitter_users)
+            animals_by_user = self.create_animals(owners, animals_per_user)
+            booking_ids = self.create_bookings(bookings, animals_by_user, dog_sitters, services)
+            self.create_reviews(booking_ids, review_ratio)
+            self.update_ratings()
+            rebuild_ledger(chunk_size=self.batch_size)
+            booking_cube.rebuild()
+            counters.reconcile()
+
+        return {
+            'users': len(owners),
+            'dogsitters': len(dog_sitters),
+            'animals': sum(len(items) for items in animals_by_user.values()),
+            'bookings': len(booking_ids),
+        }
+
+    def create_services(self):
+        existing = list(Service.objects.all())
+        if existing:
+            return existing
+        Service.objects.bulk_create([
+            Service(name=name, description=f'{name} (тестовые данные)', price=Decimal(price))
+            for name, price in SERVICES
+        ])
+        return list(Service.objects.all())
+
+    def create_users(self, count, role):
+        offset = User.objects.filter(username__startswith=f'{self.prefix}_{role}_').count()
+        objs = []
+        for i in range(offset, offset + count):
+            username = f'{self.prefix}_{role}_{i}'
+            objs.append(User(
+                username=username,
+                email=f'{username}@example.com',
+                first_name=self.random.choice(FIRST_NAMES),
+                last_name=self.random.choice(LAST_NAMES),
+                password=self.password,
+            ))
+        created = User.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.log(f'Пользователи ({role}): {len(created)}')
+        return created
+
+    def create_dogsitters(self, sitter_users):
+        objs = [
+            DogSitter(
+                user=user,
+                experience_years=self.random.randint(0, 15),
+                description='Тестовый догситтер',
+            )
+            for user in sitter_users
+        ]
+        created = DogSitter.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.log(f'Догситтеры: {len(created)}')
+        return created
+
+    def create_animals(self, owners, animals_per_user):
+        objs = []
+        for owner in owners:
+            count = max(1, int(self.random.gauss(animals_per_user, 0.7)))
+            for _ in range(count):
+                objs.append(Animal(
+                    name=self.random.choice(ANIMAL_NAMES),
+                    type=self.random.choices(
+                        [Animal.DOG, Animal.CAT, Animal.OTHER], weights=[6, 3, 1]
+                    )[0],
+                    breed=self.random.choice(BREEDS),
+                    age=self.random.randint(1, 15),
+                    size=self.random.choice([Animal.SIZE_SMALL, Animal.SIZE_MEDIUM, Animal.SIZE_LARGE]),
+                    user=owner,
+                ))
+        created = Animal.objects.bulk_create(objs, batch_size=self.batch_size)
+        animals_by_user = {}
+        for animal in created:
+            animals_by_user.setdefault(animal.user_id, []).append(animal)
+        self.log(f'Животные: {len(created)}')
+        return animals_by_user
+
+    def pick_status(self, start_date, end_date):
+        if end_date < self.today:
+            return self.random.choices(
+                [Booking.STATUS_COMPLETED, Booking.STATUS_CANCELLED], weights=[8, 2]
+            )[0]
+        if start_date <= self.today:
+            return Booking.STATUS_CONFIRMED
+        return self.random.choice([Booking.STATUS_PENDING, Booking.STATUS_CONFIRMED])
+
+    def create_bookings(self, count, animals_by_user, dog_sitters, services):
+        owner_ids = list(animals_by_user)
+        booking_ids = []
+        created_total = 0
+
+        for batch_start in range(0, count, self.batch_size):
+            batch_size = min(self.batch_size, count - batch_start)
+            bookings, links = [], []
+            for _ in range(batch_size):
+                owner_id = self.random.choice(owner_ids)
+                owner_animals = animals_by_user[owner_id]
+                animals = self.random.sample(owner_animals, k=min(len(owner_animals), self.random.randint(1, 2)))
+                booking_services = self.random.sample(services, k=self.random.randint(0, 2))
+
+                start_date = self.today + timedelta(days=self.random.randint(-730, 60))
+                end_date = start_date + timedelta(days=self.random.randint(1, 14))
+                days = (end_date - start_date).days
+                service_cost = sum(service.price for service in booking_services)
+                animal_cost = sum(Booking.SIZE_COST_MAP.get(animal.size, 500) for animal in animals)
+
+                bookings.append(Booking(
+                    user_id=owner_id,
+                    dog_sitter=self.random.choice(dog_sitters),
+                    start_date=start_date,
+                    end_date=end_date,
+                    status=self.pick_status(start_date, end_date),
+                    total_price=(service_cost + animal_cost) * days,
+                    created_at=timezone.now() - timedelta(days=self.random.randint(0, 30)),
+                ))
+                links.append((animals, booking_services))
+
+            created = Booking.objects.bulk_create(bookings, batch_size=self.batch_size)
+            booking_animals, booking_services_rows = [], []
+            for booking, (animals, booking_services) in zip(created, links):
+                booking_ids.append((booking.id, booking.status, booking.end_date))
+                booking_animals.extend(BookingAnimal(booking=booking, animal=animal) for animal in animals)
+                booking_services_rows.extend(
+                    Booking.services.through(booking_id=booking.id, service_id=service.id)
+                    for service in booking_services
+                )
+            BookingAnimal.objects.bulk_create(booking_animals, batch_size=self.batch_size)
+            Booking.services.through.objects.bulk_create(booking_services_rows, batch_size=self.batch_size)
+
+            created_total += len(created)
+            self.log(f'Бронирования: {created_total}/{count}')
+
+        return booking_ids
+
+    def create_reviews(self, booking_ids, review_ratio):
+        reviews = []
+        for booking_id, status, end_date in booking_ids:
+            if status != Booking.STATUS_COMPLETED or self.random.random() > review_ratio:
+                continue
+            review_date = timezone.now() - timedelta(days=max((self.today - end_date).days - 1, 0))
+            reviews.append(Review(
+                booking_id=booking_id,
+                rating=self.random.choices([1, 2, 3, 4, 5], weights=[1, 1, 2, 4, 6])[0],
+                comment=self.random.choice(['Отлично', 'Всё хорошо', 'Нормально', '']),
+                date=review_date,
+                is_verified=self.random.random() < 0.7,
+            ))
+        Review.objects.bulk_create(reviews, batch_size=self.batch_size)
+        self.log(f'Отзывы: {len(reviews)}')
+
+    def update_ratings(self):
+        """Пересчитывает рейтинг догситтеров по той же формуле, что и сигналы (вместо Review.save)"""
+        sitter_ids = list(DogSitter.objects.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(sitter_ids), self.batch_size):
+            recalculate_sitter_ratings(sitter_ids[start:start + self.batch_size])
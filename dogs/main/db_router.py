@@ -0,0 +1,178 @@
+"""
+Маршрутизация аналитических запросов на реплику.
+
+Тяжёлые агрегаты (views_annotations, User.get_bookings_stats,
+aggregation_annotation_examples) выполняются
+внутри контекста using_replica(): пока он активен, AnalyticsReplicaRouter
+направляет чтения на алиас settings.ANALYTICS_DATABASE. Запись всегда
+идёт в основную базу. Querysets представлений (get_dogsitter_with_ratings,
+get_bookings_with_ratings) читаются из основной базы: через get_object()
+по ним же изменяют и удаляют записи, а реплика может отставать.
+
+Реплика может быть локальной копией SQLite (обновляется командой
+refresh_replica_snapshot) или потоковой репликой PostgreSQL. Если
+реплика не настроена, недоступна или отстаёт больше, чем на
+REPLICA_MAX_LAG_SECONDS, запросы остаются на основной базе.
+"""
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, DatabaseError
+from django.db.models import QuerySet
+
+SNAPSHOT_TABLE = 'replica_snapshot'
+
+_read_alias = contextvars.ContextVar('analytics_read_alias', default=None)
+
+_lag_lock = threading.Lock()
+_lag_cache = {}
+
+
+def replica_alias():
+    """Алиас реплики, если она описана в DATABASES"""
+    alias = getattr(settings, 'ANALYTICS_DATABASE', 'replica')
+    if alias in settings.DATABASES and alias != DEFAULT_DB_ALIAS:
+        return alias
+    return None
+
+
+def _measure_lag(alias):
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT CASE WHEN pg_is_in_recovery() "
+                "THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+                "ELSE 0 END"
+            )
+            lag = cursor.fetchone()[0]
+            return float(lag) if lag is not None else None
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'SELECT MAX(refreshed_at) FROM {SNAPSHOT_TABLE}')
+            refreshed_at = cursor.fetchone()[0]
+            return time.time() - refreshed_at if refreshed_at is not None else None
+    return 0.0
+
+
+def get_replica_lag(alias):
+    """
+    Отставание реплики в секундах (None - неизвестно или реплика недоступна).
+    Значение кэшируется на REPLICA_LAG_CHECK_INTERVAL секунд.
+    """
+    interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+    with _lag_lock:
+        cached = _lag_cache.get(alias)
+        if cached and now - cached[0] < interval:
+            return cached[1]
+
+    try:
+        lag = _measure_lag(alias)
+    except (DatabaseError, sqlite3.Error):
+        lag = None
+
+    with _lag_lock:
+        _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def choose_read_alias():
+    """Возвращает алиас реплики, если ей можно доверять, иначе None (основная база)"""
+    alias = replica_alias()
+    if alias is None:
+        return None
+    lag = get_replica_lag(alias)
+    if lag is None or lag > settings.REPLICA_MAX_LAG_SECONDS:
+        return None
+    return alias
+
+
+@contextmanager
+def using_replica():
+    """
+    Контекст, в котором чтения через ORM уходят на реплику.
+    Возвращает выбранный алиас базы.
+    """
+    alias = choose_read_alias()
+    token = _read_alias.set(alias)
+    try:
+        yield alias or DEFAULT_DB_ALIAS
+    finally:
+        _read_alias.reset(token)
+
+
+def current_read_alias():
+    return _read_alias.get()
+
+
+def replica_reads(func):
+    """
+    Декоратор для аналитических функций: тело выполняется внутри
+    using_replica(), а возвращённый ленивый QuerySet привязывается к
+    выбранному алиасу, чтобы и при позднем вычислении он читал с реплики.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with using_replica():
+            alias = current_read_alias()
+            result = func(*args, **kwargs)
+        if isinstance(result, QuerySet) and result._db is None:
+            result = result.using(alias)
+        return result
+    return wrapper
+
+
+def refresh_sqlite_snapshot(alias=None):
+    """
+    Копирует основную базу SQLite в файл реплики через backup API.
+    Копия собирается во временном файле и атомарно подменяет старую,
+    поэтому читатели реплики не видят половину снимка.
+    """
+    alias = alias or replica_alias()
+    if alias is None:
+        raise ValueError("Реплика не настроена (settings.ANALYTICS_DATABASE)")
+    source_path = str(settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'])
+    target_path = str(settings.DATABASES[alias]['NAME'])
+    tmp_path = f'{target_path}.tmp'
+
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(tmp_path)
+    try:
+        source.backup(target)
+        # Снимок только для чтения: WAL не нужен, файл остаётся самодостаточным
+        target.execute('PRAGMA journal_mode = DELETE')
+        target.execute(f'CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (refreshed_at REAL NOT NULL)')
+        target.execute(f'DELETE FROM {SNAPSHOT_TABLE}')
+        target.execute(f'INSERT INTO {SNAPSHOT_TABLE} (refreshed_at) VALUES (?)', (time.time(),))
+        target.commit()
+    finally:
+        target.close()
+        source.close()
+
+    os.replace(tmp_path, target_path)
+    connections[alias].close()
+    with _lag_lock:
+        _lag_cache.pop(alias, None)
+    return target_path
+
+
+class AnalyticsReplicaRouter:
+    """Роутер: чтение внутри using_replica() - с реплики, всё остальное - в основную базу"""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,233 @@
+"""
+Журнал заработка догситтеров.
+
+EarningsEntry - журнал, который только дополняется: при завершении
+бронирования в него пишется стоимость, при отмене завершённого или
+изменении цены - разница. MonthlyEarnings хранит сумму за месяц и
+нарастающий итог по каждому догситтеру, поэтому заработок за всё время,
+за период и по месяцам читается из O(месяцев) строк, а не из всех
+бронирований.
+
+sync_bookings идемпотентна: она сравнивает ожидаемый заработок по
+бронированию с уже учтённым и дописывает только разницу. Её вызывают
+сигналы (main.signals) при сохранении бронирования, после массового
+завершения и из действий админки. При удалении бронирования
+reverse_bookings дописывает обратные записи на всё учтённое по нему.
+
+Изменения по догситтеру выполняются под блокировкой его строки
+(SELECT ... FOR UPDATE): создание строки месяца с нарастающим итогом
+предыдущего и сдвиг итогов следующих месяцев - несколько запросов, и без
+блокировки параллельные транзакции по одному догситтеру расходятся.
+rebuild_ledger после досинхронизации пересчитывает MonthlyEarnings
+заново из журнала, так что сверка исправляет и сами итоги.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+
+from .models import Booking, DogSitter, EarningsEntry, MonthlyEarnings
+
+ZERO = Decimal('0')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _sitter_id(dog_sitter):
+    return getattr(dog_sitter, 'pk', dog_sitter)
+
+
+def _expected_earnings(bookings):
+    """{(booking_id, dog_sitter_id, месяц): сумма} для завершённых бронирований"""
+    expected = {}
+    for booking_id, sitter_id, status, end_date, price in bookings:
+        if status == Booking.STATUS_COMPLETED and price:
+            expected[(booking_id, sitter_id, month_start(end_date))] = price
+    return expected
+
+
+def _recorded_earnings(booking_ids):
+    rows = EarningsEntry.objects.filter(booking_id__in=booking_ids).values(
+        'booking_id', 'dog_sitter_id', 'month'
+    ).annotate(total=Sum('amount')).order_by()
+    return {(row['booking_id'], row['dog_sitter_id'], row['month']): row['total'] for row in rows}
+
+
+def _previous_running_total(sitter_id, month):
+    previous = MonthlyEarnings.objects.filter(
+        dog_sitter_id=sitter_id, month__lt=month
+    ).order_by('-month').values_list('running_total', flat=True).first()
+    return previous or ZERO
+
+
+def _apply_monthly_change(sitter_id, month, amount, bookings_count):
+    row, _ = MonthlyEarnings.objects.get_or_create(
+        dog_sitter_id=sitter_id,
+        month=month,
+        defaults={'running_total': _previous_running_total(sitter_id, month)},
+    )
+    MonthlyEarnings.objects.filter(pk=row.pk).update(
+        amount=F('amount') + amount,
+        bookings_count=F('bookings_count') + bookings_count,
+    )
+    MonthlyEarnings.objects.filter(dog_sitter_id=sitter_id, month__gte=month).update(
+        running_total=F('running_total') + amount
+    )
+
+
+def _lock_sitters(sitter_ids):
+    """Блокирует строки догситтеров в порядке id до конца транзакции"""
+    list(DogSitter.objects.select_for_update().filter(pk__in=set(sitter_ids)).order_by('pk').values_list('pk'))
+
+
+def _append_entries(expected, recorded):
+    """Дописывает в журнал разницу между ожидаемым и учтённым заработком"""
+    _lock_sitters(key[1] for key in expected.keys() | recorded.keys())
+    entries = []
+    changes = defaultdict(lambda: [ZERO, 0])
+    for key in expected.keys() | recorded.keys():
+        old, new = recorded.get(key, ZERO), expected.get(key, ZERO)
+        if old == new:
+            continue
+        booking_id, sitter_id, month = key
+        entries.append(EarningsEntry(
+            dog_sitter_id=sitter_id, booking_id=booking_id, month=month, amount=new - old
+        ))
+        change = changes[(sitter_id, month)]
+        change[0] += new - old
+        change[1] += (new > 0) - (old > 0)
+
+    EarningsEntry.objects.bulk_create(entries)
+    for (sitter_id, month), (amount, count) in sorted(changes.items()):
+        _apply_monthly_change(sitter_id, month, amount, count)
+    return len(entries)
+
+
+def sync_bookings(booking_ids):
+    """
+    Приводит журнал в соответствие с текущим статусом и ценой бронирований.
+    Возвращает число добавленных записей.
+    """
+    booking_ids = list(booking_ids)
+    if not booking_ids:
+        return 0
+
+    with transaction.atomic():
+        bookings = list(
+            Booking.objects.select_for_update().filter(id__in=booking_ids).order_by()
+            .values_list('id', 'dog_sitter_id', 'status', 'end_date', 'total_price')
+        )
+        # Бронирования, которых нет в основной таблице (например, архивные), не трогаем
+        present = {booking[0] for booking in bookings}
+        recorded = {
+            key: total for key, total in _recorded_earnings(list(present)).items()
+            if key[0] in present
+        }
+        return _append_entries(_expected_earnings(bookings), recorded)
+
+
+def reverse_bookings(booking_ids):
+    """
+    Обратные записи на весь учтённый заработок удалённых бронирований.
+    Архивация удаляет бронирования в обход сигналов и сюда не попадает
+    """
+    booking_ids = list(booking_ids)
+    if not booking_ids:
+        return 0
+    with transaction.atomic():
+        return _append_entries({}, _recorded_earnings(booking_ids))
+
+
+def recompute_monthly(sitter_ids=None):
+    """
+    Пересобирает MonthlyEarnings из журнала: суммы, число бронирований
+    и нарастающие итоги. sitter_ids=None - по всем догситтерам
+    """
+    with transaction.atomic():
+        entries = EarningsEntry.objects.all()
+        monthly = MonthlyEarnings.objects.all()
+        if sitter_ids is not None:
+            sitter_ids = set(sitter_ids)
+            entries = entries.filter(dog_sitter_id__in=sitter_ids)
+            monthly = monthly.filter(dog_sitter_id__in=sitter_ids)
+            _lock_sitters(sitter_ids)
+        else:
+            _lock_sitters(DogSitter.objects.values_list('pk', flat=True))
+
+        months = defaultdict(lambda: [ZERO, 0])
+        rows = entries.values('dog_sitter_id', 'month', 'booking_id').annotate(
+            total=Sum('amount')
+        ).order_by('dog_sitter_id', 'month')
+        for row in rows:
+            month = months[(row['dog_sitter_id'], row['month'])]
+            month[0] += row['total']
+            month[1] += row['total'] > 0
+
+        rebuilt = []
+        running = {}
+        for (sitter_id, month), (amount, count) in sorted(months.items()):
+            running[sitter_id] = running.get(sitter_id, ZERO) + amount
+            rebuilt.append(MonthlyEarnings(
+                dog_sitter_id=sitter_id, month=month, amount=amount,
+                bookings_count=count, running_total=running[sitter_id],
+            ))
+        monthly.delete()
+        MonthlyEarnings.objects.bulk_create(rebuilt)
+    return len(rebuilt)
+
+
+def rebuild_ledger(chunk_size=1000):
+    """
+    Досинхронизирует журнал по всем бронированиям и пересобирает из него
+    помесячные итоги (для заполнения и сверки)
+    """
+    total = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Booking.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        total += sync_bookings(ids)
+    recompute_monthly()
+    return total
+
+
+def lifetime_earnings(dog_sitter):
+    """Заработок за всё время - нарастающий итог последнего месяца"""
+    total = MonthlyEarnings.objects.filter(
+        dog_sitter_id=_sitter_id(dog_sitter)
+    ).order_by('-month').values_list('running_total', flat=True).first()
+    return total or ZERO
+
+
+def earnings_between(dog_sitter, start, end):
+    """Заработок за месяцы с start по end включительно (читает две строки)"""
+    sitter_id = _sitter_id(dog_sitter)
+    rows = MonthlyEarnings.objects.filter(dog_sitter_id=sitter_id).order_by('-month')
+    until_end = rows.filter(month__lte=month_start(end)).values_list('running_total', flat=True).first()
+    before_start = rows.filter(month__lt=month_start(start)).values_list('running_total', flat=True).first()
+    return (until_end or ZERO) - (before_start or ZERO)
+
+
+def monthly_earnings(dog_sitter, start=None, end=None):
+    """Помесячный заработок: queryset словарей month, amount, bookings_count, running_total"""
+    rows = MonthlyEarnings.objects.filter(dog_sitter_id=_sitter_id(dog_sitter))
+    if start:
+        rows = rows.filter(month__gte=month_start(start))
+    if end:
+        rows = rows.filter(month__lte=month_start(end))
+    return rows.order_by('month').values('month', 'amount', 'bookings_count', 'running_total')
+
+
+def lifetime_earnings_subquery(outer_ref='pk'):
+    """Подзапрос для аннотации queryset'а догситтеров заработком за всё время"""
+    return Subquery(
+        MonthlyEarnings.objects.filter(dog_sitter_id=OuterRef(outer_ref))
+        .order_by('-month').values('running_total')[:1]
+    )
@@ -0,0 +1,190 @@
+"""
+События смены статуса бронирований и их доставка по SSE.
+
+Смена статуса записывает событие (main.outbox) в той же транзакции: для save()
+это делают сигналы (main.signals), массовые переходы (ночное завершение,
+действия админки) вызывают record_status_changes сами.
+
+В каждом рабочем процессе один EventBroker читает новые события из
+таблицы по возрастанию id (раз в SSE_POLL_INTERVAL секунд или сразу
+после фиксации записи в этом же процессе) и раскладывает их по очередям
+подключённых клиентов - владельца бронирования и догситтера. Поскольку
+источник один - таблица, клиенты всех процессов получают одни и те же
+события; после переподключения клиент догружает пропущенное по
+Last-Event-ID.
+
+На PostgreSQL id выдаётся при вставке, а не при фиксации: транзакция с
+меньшим id может зафиксироваться после того, как брокер уже прочитал
+больший. Поэтому пропуски в прочитанных id брокер запоминает и ещё
+SSE_SETTLE_SECONDS секунд перечитывает их по первичному ключу; пропуски
+откаченных транзакций просто истекают.
+
+EventSource в браузере не умеет задавать заголовки, поэтому браузер
+получает короткоживущий токен потока (make_stream_token, POST
+/api/events/bookings/token/) и передаёт его в ?token=. Токен подписан
+отдельной солью и годится только для потока, так что в журналах прокси
+не остаётся токенов доступа к API.
+"""
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Max, Q
+
+from . import outbox
+from .models import Booking, OutboxEvent
+
+BOOKING_STATUS_CHANGED = 'booking.status_changed'
+BOOKING_REFUND_REQUESTED = 'booking.refund_requested'
+REVIEW_SAVED = 'review.saved'
+REVIEW_DELETED = 'review.deleted'
+
+STREAM_TOKEN_SALT = 'main.events.stream'
+
+
+def make_stream_token(user):
+    """Подписанный токен для подключения к потоку событий"""
+    return signing.dumps({'user_id': user.pk}, salt=STREAM_TOKEN_SALT)
+
+
+def read_stream_token(value):
+    """id пользователя из токена потока или None, если токен неверен или истёк"""
+    try:
+        return signing.loads(value, salt=STREAM_TOKEN_SALT, max_age=settings.SSE_TOKEN_MAX_AGE)['user_id']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+def record_status_changes(old_statuses, new_status):
+    """Записывает события смены статуса: old_statuses - {id бронирования: прежний статус}"""
+    if not old_statuses:
+        return
+    rows = Booking.objects.filter(id__in=list(old_statuses)).values_list('id', 'user_id', 'dog_sitter__user_id')
+    outbox.publish_many(BOOKING_STATUS_CHANGED, [
+        {
+            'booking_id': booking_id,
+            'old_status': old_statuses[booking_id],
+            'status': new_status,
+            'user_id': user_id,
+            'sitter_user_id': sitter_user_id,
+        }
+        for booking_id, user_id, sitter_user_id in rows
+    ])
+    transaction.on_commit(broker.wake)
+
+
+def audience(event):
+    return {event.payload.get('user_id'), event.payload.get('sitter_user_id')} - {None}
+
+
+def latest_event_id():
+    return OutboxEvent.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def events_after(last_id, gap_ids, limit):
+    """События всех тем с id больше last_id и из пропусков gap_ids"""
+    return list(
+        OutboxEvent.objects.filter(Q(id__gt=last_id) | Q(id__in=list(gap_ids))).order_by('id')[:limit]
+    )
+
+
+def user_events_after(topic, user_id, last_id, limit):
+    """События пользователя после last_id - для догрузки после переподключения"""
+    return list(
+        OutboxEvent.objects.filter(topic=topic, id__gt=last_id)
+        .filter(Q(payload__user_id=user_id) | Q(payload__sitter_user_id=user_id))
+        .order_by('id')[:limit]
+    )
+
+
+def format_sse(event, event_id=None):
+    """event_id - id для Last-Event-ID, если он отличается от id события"""
+    event_id = event.pk if event_id is None else event_id
+    return f"id: {event_id}\nevent: {event.topic}\ndata: {json.dumps(event.payload)}\n\n"
+
+
+class EventBroker:
+    """Рассылка событий темы подписчикам процесса: {id пользователя: очереди}"""
+
+    def __init__(self, topic):
+        self.topic = topic
+        self._subscribers = defaultdict(set)
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+        self._last_id = None
+        # Пропущенные id: {id: момент, после которого его больше не ждём}
+        self._gaps = {}
+
+    def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._last_id = None
+            self._gaps = {}
+            self._task = loop.create_task(self._run())
+        queue = asyncio.Queue(maxsize=settings.SSE_QUEUE_SIZE)
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def wake(self):
+        """Будит чтение таблицы; можно вызывать из любого потока"""
+        if self._loop is None or self._wakeup is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # Цикл событий уже закрыт
+            pass
+
+    def publish(self, events):
+        for event in events:
+            for user_id in audience(event):
+                for queue in list(self._subscribers.get(user_id, ())):
+                    try:
+                        queue.put_nowait(event)
+                    except asyncio.QueueFull:
+                        # Медленный клиент догрузит пропущенное по Last-Event-ID
+                        pass
+
+    def poll(self):
+        """Читает новые события и события из пропусков; возвращает (события темы, есть ещё)"""
+        now = time.monotonic()
+        self._gaps = {event_id: deadline for event_id, deadline in self._gaps.items() if deadline > now}
+        rows = events_after(self._last_id, self._gaps, settings.SSE_BATCH_SIZE)
+        deadline = now + settings.SSE_SETTLE_SECONDS
+        for row in rows:
+            if self._gaps.pop(row.pk, None) is None and row.pk > self._last_id:
+                self._gaps.update((event_id, deadline) for event_id in range(self._last_id + 1, row.pk))
+                self._last_id = row.pk
+        return [row for row in rows if row.topic == self.topic], len(rows) == settings.SSE_BATCH_SIZE
+
+    async def _run(self):
+        if self._last_id is None:
+            self._last_id = await sync_to_async(latest_event_id)()
+        while self._subscribers:
+            events, more = await sync_to_async(self.poll)()
+            self.publish(events)
+            if more:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.SSE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+broker = EventBroker(BOOKING_STATUS_CHANGED)
@@ -0,0 +1,88 @@
+"""
+Выбор полей ответа API: ?fields= и ?expand=.
+
+?fields=id,first_name,average_rating оставляет в ответе только
+перечисленные поля; ?expand=user заменяет id связанной записи вложенным
+объектом для полей из Meta.expandable_fields. Без параметров ответ не
+меняется.
+
+Сериализатор с SparseFieldsMixin сам убирает лишние поля, а query_plan
+подсказывает представлению, что нужно от запроса к базе: какие аннотации
+(Meta.annotated_fields: поле -> аннотации, из которых оно считается) и
+какие связи для select_related (Meta.related_fields: поле -> путь связи,
+для раскрытых полей - сама связь и связи вложенного сериализатора).
+Так список, которому нужны только имена и рейтинг, не считает остальные
+агрегаты и не присоединяет отзывы.
+
+Параметры действуют только на чтение: при записи сериализатор работает
+со всеми полями.
+"""
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+
+def requested_fields(request):
+    """(поля или None - все, раскрываемые поля) из параметров запроса"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    params = getattr(request, 'query_params', request.GET)
+    fields = _split(params.get('fields'))
+    return (fields or None), set(_split(params.get('expand')))
+
+
+class SparseFieldsMixin:
+    """Поля ответа по ?fields= и ?expand= (или аргументам fields=, expand=)"""
+
+    def __init__(self, *args, **kwargs):
+        only = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+        if only is None and expand is None:
+            only, expand = requested_fields(self._context.get('request'))
+        if only is None and not expand:
+            return
+        selected = self.selected_fields(only)
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in selected & set(expand or ()) & set(expandable):
+            serializer_class, options = expandable[name]
+            self.fields[name] = serializer_class(read_only=True, **options)
+        for name in set(self.fields) - selected:
+            self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, only):
+        """Имена полей ответа; раскрытие поля, не попавшего в fields, его не добавляет"""
+        names = set(cls.Meta.fields)
+        if only is not None:
+            names &= set(only)
+        return names
+
+    @classmethod
+    def query_plan(cls, request, only=None, expand=None):
+        """
+        (аннотации, пути select_related) для ответа на request.
+        Аннотации - None, если нужны все (полный ответ или запись)
+        """
+        if only is None and expand is None:
+            only, expand = requested_fields(request)
+        expand = set(expand or ())
+        selected = cls.selected_fields(only)
+
+        annotated = getattr(cls.Meta, 'annotated_fields', {})
+        annotations = None
+        if only is not None:
+            annotations = {annotation for name in selected for annotation in annotated.get(name, ())}
+
+        related = {path for name, path in getattr(cls.Meta, 'related_fields', {}).items() if name in selected}
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        for name in selected & expand & set(expandable):
+            serializer_class, options = expandable[name]
+            related.add(name)
+            if hasattr(serializer_class, 'query_plan'):
+                _, nested = serializer_class.query_plan(None, only=options.get('fields'), expand=())
+                related.update(f'{name}__{path}' for path in nested)
+        return annotations, sorted(related)
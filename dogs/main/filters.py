@@ -4,6 +4,15 @@ from django.db.models import Q
 from django.utils import timezone
 
 class DogSitterFilter(filters.FilterSet):
+    # Аннотации get_dogsitter_with_ratings, по которым фильтруют и сортируют параметры
+    annotated_params = {
+        'min_rating': ('average_rating',),
+        'max_rating': ('average_rating',),
+        'min_reviews': ('total_reviews',),
+        'has_reviews': ('total_reviews',),
+        'sort_by': ('average_rating', 'total_reviews'),
+    }
+
     min_rating = filters.NumberFilter(field_name='average_rating', lookup_expr='gte')
     max_rating = filters.NumberFilter(field_name='average_rating', lookup_expr='lte')
     min_experience = filters.NumberFilter(field_name='experience_years', lookup_expr='gte')
@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.archive import archive_bookings, archive_horizon, archivable_bookings
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит завершённые и отменённые бронирования старше горизонта "
+        "(settings.BOOKING_ARCHIVE_AFTER_DAYS) в архивные таблицы"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Горизонт архивации в днях")
+        parser.add_argument('--before', default=None, help="Архивировать закончившиеся до даты (ГГГГ-ММ-ДД)")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--limit', type=int, default=None, help="Максимум бронирований за запуск")
+        parser.add_argument('--dry-run', action='store_true', help="Только посчитать подходящие бронирования")
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                before = date.fromisoformat(options['before'])
+            except ValueError:
+                raise CommandError("Дата должна быть в формате ГГГГ-ММ-ДД")
+        else:
+            before = archive_horizon(options['days'])
+
+        if options['dry_run']:
+            count = archivable_bookings(before).count()
+            self.stdout.write(f"К архивации (до {before}): {count}")
+            return
+
+        total = archive_bookings(
+            before=before,
+            batch_size=options['batch_size'],
+            limit=options['limit'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Перенесено в архив: {total}"))
@@ -0,0 +1,99 @@
+import io
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+from django.urls import reverse
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+
+from main import renderers
+from main.datagen import DatasetGenerator
+from main.models import User
+
+# Большие списки API: имя -> маршрут
+RESPONSES = {
+    'dogsitters_list': 'dogsitter-list',
+    'bookings_list': 'booking-list',
+    'animals_list': 'animal-list',
+}
+
+
+def _median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает стандартные JSONRenderer/JSONParser DRF с orjson (main.renderers) "
+        "на данных больших списков API. Данные создаются в отдельной тестовой базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=10000, help="Количество бронирований")
+        parser.add_argument('--repeat', type=int, default=20, help="Количество замеров")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default=None, help="Сохранить отчёт в JSON")
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError("orjson не установлен: сравнивать не с чем")
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(PROFILING_SAMPLE_RATE=0):
+                self.stdout.write(f"Генерация данных: {options['bookings']} бронирований")
+                DatasetGenerator(seed=options['seed']).generate(bookings=options['bookings'])
+                report = self.compare(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Отчёт сохранён в {options['output']}"))
+
+    def compare(self, repeat):
+        # Суперпользователь видит все записи - самые большие ответы
+        user = User.objects.filter(is_superuser=True).first() or User.objects.order_by('id').first()
+        user.is_superuser = True
+        user.save(update_fields=['is_superuser'])
+        client = Client()
+        auth = f'Bearer {AccessToken.for_user(user)}'
+
+        stdlib_renderer, fast_renderer = JSONRenderer(), renderers.FastJSONRenderer()
+        stdlib_parser, fast_parser = JSONParser(), renderers.FastJSONParser()
+        report = {}
+        for name, route in RESPONSES.items():
+            data = client.get(reverse(route), HTTP_AUTHORIZATION=auth).data
+            body = stdlib_renderer.render(data)
+            if json.loads(fast_renderer.render(data)) != json.loads(body):
+                raise CommandError(f"{name}: ответы рендереров различаются")
+
+            result = {
+                'records': len(data),
+                'bytes': len(body),
+                'render_stdlib_ms': _median_ms(lambda: stdlib_renderer.render(data), repeat),
+                'render_orjson_ms': _median_ms(lambda: fast_renderer.render(data), repeat),
+                'parse_stdlib_ms': _median_ms(lambda: stdlib_parser.parse(io.BytesIO(body)), repeat),
+                'parse_orjson_ms': _median_ms(lambda: fast_parser.parse(io.BytesIO(body)), repeat),
+            }
+            report[name] = result
+            self.stdout.write(
+                f"  {name}: {result['records']} записей, {result['bytes']} байт; "
+                f"рендер {result['render_stdlib_ms']} -> {result['render_orjson_ms']} ms, "
+                f"разбор {result['parse_stdlib_ms']} -> {result['parse_orjson_ms']} ms"
+            )
+        return report
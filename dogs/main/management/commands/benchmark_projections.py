@@ -0,0 +1,87 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from main.datagen import DatasetGenerator
+from main.projections import BOOKING_LIST, DOGSITTER_LIST
+from main.serializers import BookingSerializer, DogSitterSerializer
+from main.views_annotations import get_bookings_with_ratings, get_dogsitter_with_ratings
+
+# Списки API: имя -> (queryset, сериализатор, проекция)
+RESPONSES = {
+    'bookings_list': (get_bookings_with_ratings, BookingSerializer, BOOKING_LIST),
+    'dogsitters_list': (get_dogsitter_with_ratings, DogSitterSerializer, DOGSITTER_LIST),
+}
+
+
+def _median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает сборку списков API сериализаторами и проекциями (main.projections): "
+        "запрос к базе и построение строк ответа. Данные создаются в отдельной тестовой базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=10000, help="Количество бронирований")
+        parser.add_argument('--repeat', type=int, default=5, help="Количество замеров")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default=None, help="Сохранить отчёт в JSON")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(PROFILING_SAMPLE_RATE=0):
+                self.stdout.write(f"Генерация данных: {options['bookings']} бронирований")
+                DatasetGenerator(seed=options['seed']).generate(bookings=options['bookings'])
+                report = self.compare(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Отчёт сохранён в {options['output']}"))
+
+    def compare(self, repeat):
+        request = APIRequestFactory().get('/api/')
+        renderer = JSONRenderer()
+        report = {}
+        for name, (get_queryset, serializer_class, projection) in RESPONSES.items():
+            def serialized():
+                queryset = get_queryset().order_by('id')
+                return serializer_class(queryset, many=True, context={'request': request}).data
+
+            def projected():
+                return list(projection.rows(get_queryset().order_by('id'), request))
+
+            data = projected()
+            if json.loads(renderer.render(data)) != json.loads(renderer.render(serialized())):
+                raise CommandError(f"{name}: ответы сериализатора и проекции различаются")
+
+            result = {
+                'records': len(data),
+                'serializer_ms': _median_ms(serialized, repeat),
+                'projection_ms': _median_ms(projected, repeat),
+            }
+            report[name] = result
+            self.stdout.write(
+                f"  {name}: {result['records']} записей; "
+                f"{result['serializer_ms']} -> {result['projection_ms']} ms"
+            )
+        return report
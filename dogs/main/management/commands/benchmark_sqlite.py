@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from main.sqlite_profile import run_concurrency_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает пропускную способность конкурентного чтения и записи SQLite "
+        "с настройками по умолчанию и с продакшен-профилем (settings.SQLITE_PRAGMAS)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=3.0, help="Длительность каждого прогона, с")
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--output', default=None, help="Сохранить результат в JSON-файл")
+
+    def handle(self, *args, **options):
+        results = run_concurrency_benchmark(
+            readers=options['readers'],
+            writers=options['writers'],
+            duration=options['duration'],
+            rows=options['rows'],
+        )
+
+        self.stdout.write(f"{'профиль':<12}{'чтений/с':>12}{'записей/с':>12}{'ошибок чт.':>12}{'ошибок зап.':>13}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<12}{result['reads_per_sec']:>12}{result['writes_per_sec']:>12}"
+                f"{result['read_errors']:>12}{result['write_errors']:>13}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Результат сохранён в {options['output']}"))
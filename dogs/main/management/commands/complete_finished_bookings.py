@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.booking_status import complete_finished_bookings, finished_bookings
+
+
+class Command(BaseCommand):
+    help = (
+        "Переводит подтверждённые бронирования, у которых прошла дата окончания, "
+        "в статус completed. Рассчитана на ежедневный запуск по расписанию; "
+        "параллельные запуски безопасны"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--today', default=None, help="Дата, относительно которой считать (ГГГГ-ММ-ДД)")
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true', help="Только посчитать подходящие бронирования")
+
+    def handle(self, *args, **options):
+        today = None
+        if options['today']:
+            try:
+                today = date.fromisoformat(options['today'])
+            except ValueError:
+                raise CommandError("Дата должна быть в формате ГГГГ-ММ-ДД")
+
+        if options['dry_run']:
+            self.stdout.write(f"К завершению: {finished_bookings(today).count()}")
+            return
+
+        total = complete_finished_bookings(today=today, chunk_size=options['chunk_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Завершено бронирований: {total}"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from main.outbox import dispatch_pending, prune_dispatched, run_forever
+
+
+class Command(BaseCommand):
+    help = (
+        "Доставляет недоставленные события outbox обработчикам пачками. "
+        "С --loop работает постоянно, без него - разовый запуск по расписанию (например, "
+        "cron раз в минуту). Нужна и при доставке сразу после фиксации: подбирает события, "
+        "которые тогда доставить не удалось"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help="Событий в пачке")
+        parser.add_argument('--loop', action='store_true', help="Работать постоянно")
+        parser.add_argument('--prune', action='store_true', help="Удалить доставленные события старше срока хранения")
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            run_forever(options['batch_size'])
+            return
+        delivered, failed = dispatch_pending(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Доставлено событий: {delivered}, с ошибкой: {failed}"))
+        if options['prune']:
+            self.stdout.write(f"Удалено доставленных событий: {prune_dispatched()}")
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main import query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        "Показывает планы выполнения горячих запросов, найденные проблемы "
+        "(полные сканирования, временные B-деревья) и рекомендуемые индексы"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Имена запросов из HOT_QUERYSETS (по умолчанию все)")
+        parser.add_argument('--check', action='store_true',
+                            help="Завершиться с ошибкой, если план хуже сохранённого снимка")
+        parser.add_argument('--update-snapshots', action='store_true',
+                            help="Сохранить текущие планы как снимки")
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(query_plans.HOT_QUERYSETS)
+        unknown = set(names) - set(query_plans.HOT_QUERYSETS)
+        if unknown:
+            raise CommandError(f"Неизвестные запросы: {', '.join(sorted(unknown))}")
+
+        results = [query_plans.analyze(name) for name in names]
+        for result in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(result['name']))
+            self.stdout.write(result['plan'])
+            if result['problems']:
+                self.stdout.write(self.style.WARNING(f"  Проблемы: {', '.join(result['problems'])}"))
+            index = result['suggested_index']
+            if index:
+                fields = ', '.join(f"'{field}'" for field in index['fields'])
+                self.stdout.write(self.style.NOTICE(
+                    f"  Рекомендуемый индекс: {index['model']}.Meta.indexes += [models.Index(fields=[{fields}])]"
+                ))
+
+        if options['update_snapshots']:
+            query_plans.save_snapshots(results)
+            self.stdout.write(self.style.SUCCESS(f"Снимки сохранены в {query_plans.snapshot_path()}"))
+
+        if options['check']:
+            regressions = query_plans.find_regressions(results, query_plans.load_snapshots())
+            if regressions:
+                details = '; '.join(f"{name}: {', '.join(new)}" for name, new in regressions.items())
+                raise CommandError(f"План запроса ухудшился: {details}")
+            self.stdout.write(self.style.SUCCESS("Планы не хуже сохранённых снимков"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from main.datagen import DatasetGenerator, DEFAULT_PASSWORD
+
+
+class Command(BaseCommand):
+    help = "Генерирует воспроизводимый набор тестовых данных (пользователи, животные, догситтеры, бронирования, отзывы)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=10000, help="Количество бронирований")
+        parser.add_argument('--users', type=int, default=None, help="Количество владельцев (по умолчанию bookings / 10)")
+        parser.add_argument('--sitters', type=int, default=None, help="Количество догситтеров (по умолчанию bookings / 100)")
+        parser.add_argument('--animals-per-user', type=float, default=1.5)
+        parser.add_argument('--review-ratio', type=float, default=0.5, help="Доля завершённых бронирований с отзывом")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='bench', help="Префикс имён создаваемых пользователей")
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            prefix=options['prefix'],
+            stdout=self.stdout,
+        )
+        result = generator.generate(
+            bookings=options['bookings'],
+            users=options['users'],
+            sitters=options['sitters'],
+            animals_per_user=options['animals_per_user'],
+            review_ratio=options['review_ratio'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Создано: {users} пользователей, {dogsitters} догситтеров, "
+            "{animals} животных, {bookings} бронирований".format(**result)
+        ))
+        self.stdout.write(f"Пароль всех созданных пользователей: {DEFAULT_PASSWORD}")
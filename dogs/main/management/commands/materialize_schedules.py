@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.schedules import materialize
+
+
+class Command(BaseCommand):
+    help = (
+        "Создаёт бронирования по расписаниям повторяющихся бронирований на "
+        "SCHEDULE_HORIZON_DAYS дней вперёд. Рассчитана на ежедневный запуск по "
+        "расписанию; повторные и параллельные запуски безопасны"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--today', default=None, help="Дата, относительно которой считать (ГГГГ-ММ-ДД)")
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        today = None
+        if options['today']:
+            try:
+                today = date.fromisoformat(options['today'])
+            except ValueError:
+                raise CommandError("Дата должна быть в формате ГГГГ-ММ-ДД")
+
+        created, skipped = materialize(today=today, batch_size=options['batch_size'])
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"Пропущено вхождений с пересечениями: {skipped}"))
+        self.stdout.write(self.style.SUCCESS(f"Создано бронирований: {created}"))
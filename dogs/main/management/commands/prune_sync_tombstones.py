@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет отметки об удалении старше SYNC_TOMBSTONE_RETENTION_DAYS. "
+        "Рассчитана на ежедневный запуск по расписанию"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Срок хранения в днях")
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Удалено отметок: {deleted}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main.booking_cube import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает куб помесячной статистики бронирований. Нужна после "
+        "миграции и после массовых изменений в обход сигналов"
+    )
+
+    def handle(self, *args, **options):
+        cells = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Ячеек куба: {cells}"))
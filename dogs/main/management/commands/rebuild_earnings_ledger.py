@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from main.earnings import rebuild_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Дописывает в журнал заработка недостающие записи по всем бронированиям "
+        "и пересчитывает из журнала помесячные итоги. "
+        "Нужна один раз после миграции и для сверки; повторный запуск ничего не меняет"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        added = rebuild_ledger(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Добавлено записей журнала: {added}"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from main.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счётчики записей по таблицам. Рассчитана на запуск "
+        "по расписанию и после массовых изменений в обход сигналов"
+    )
+
+    def handle(self, *args, **options):
+        values = reconcile()
+        for name, value in sorted(values.items()):
+            self.stdout.write(f"  {name}: {value}")
+        self.stdout.write(self.style.SUCCESS(f"Счётчиков: {len(values)}"))
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.db_router import refresh_sqlite_snapshot, replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Обновляет копию основной базы SQLite, с которой читаются аналитические "
+        "запросы (ANALYTICS_REPLICA=sqlite). Запускать по расписанию чаще, "
+        "чем REPLICA_MAX_LAG_SECONDS"
+    )
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("Реплика не настроена: задайте ANALYTICS_REPLICA=sqlite")
+        if settings.DATABASES[alias]['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("Снимок обновляется только для реплики SQLite; реплика PostgreSQL обновляется сама")
+
+        path = refresh_sqlite_snapshot(alias)
+        self.stdout.write(self.style.SUCCESS(f"Снимок обновлён: {path}"))
@@ -0,0 +1,175 @@
+import json
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from main import views
+from main.metrics import QueryCounter
+from main.datagen import DatasetGenerator, DEFAULT_PASSWORD
+from main.models import User, DogSitter, Booking
+from main.utils import generate_booking_pdf, generate_dogsitter_report_pdf
+
+
+class BenchmarkContext:
+    """Общие объекты для замеров: клиент с JWT-токеном, пользователь, бронирование, догситтер"""
+
+    def __init__(self):
+        self.user = User.objects.filter(username__startswith='bench_user_').order_by('id').first()
+        self.booking = Booking.objects.select_related('user', 'dog_sitter__user').order_by('id').first()
+        self.dogsitter = DogSitter.objects.select_related('user').order_by('id').first()
+        self.client = Client(raise_request_exception=False)
+        self.auth_header = f'Bearer {AccessToken.for_user(self.user)}'
+        self.factory = RequestFactory()
+
+    def get(self, url):
+        return self.client.get(url, HTTP_AUTHORIZATION=self.auth_header)
+
+
+def bench_dogsitters(ctx):
+    return ctx.get(reverse('dogsitter-list'))
+
+
+def bench_bookings(ctx):
+    return ctx.get(reverse('booking-list'))
+
+
+def bench_statistics(ctx):
+    return ctx.get(reverse('api-statistics'))
+
+
+def bench_animal_search(ctx):
+    return views.api_animal_search(ctx.factory.get('/animals/search/', {'query': 'Рекс', 'type': 'dog'}))
+
+
+def bench_booking_pdf(ctx):
+    return generate_booking_pdf(ctx.booking)
+
+
+def bench_dogsitter_report_pdf(ctx):
+    return generate_dogsitter_report_pdf(ctx.dogsitter)
+
+
+def bench_login(ctx):
+    return ctx.client.post(
+        reverse('api_login'),
+        {'email': ctx.user.email, 'password': DEFAULT_PASSWORD},
+        content_type='application/json'
+    )
+
+
+BENCHMARKS = {
+    'dogsitters_list': bench_dogsitters,
+    'bookings_list': bench_bookings,
+    'statistics': bench_statistics,
+    'api_animal_search': bench_animal_search,
+    'booking_pdf': bench_booking_pdf,
+    'dogsitter_report_pdf': bench_dogsitter_report_pdf,
+    'login': bench_login,
+}
+
+
+def get_git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет время основных эндпоинтов на синтетических данных разного объёма "
+        "и сохраняет JSON-отчёт для сравнения между коммитами. "
+        "Данные создаются в отдельной тестовой базе, рабочая база не изменяется."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help="Количество бронирований для каждого прогона")
+        parser.add_argument('--repeat', type=int, default=5, help="Количество замеров каждого эндпоинта")
+        parser.add_argument('--benchmarks', nargs='+', choices=sorted(BENCHMARKS), default=None,
+                            help="Запустить только указанные замеры")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='benchmark_report.json')
+
+    def handle(self, *args, **options):
+        names = options['benchmarks'] or list(BENCHMARKS)
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'git_commit': get_git_commit(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'seed': options['seed'],
+            'scales': {},
+        }
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(PROFILING_SAMPLE_RATE=0):
+                generator = DatasetGenerator(seed=options['seed'])
+                current = 0
+                for scale in sorted(options['scales']):
+                    self.stdout.write(f"Генерация данных: {scale} бронирований")
+                    generator.generate(bookings=scale - current)
+                    current = scale
+
+                    ctx = BenchmarkContext()
+                    report['scales'][str(scale)] = {
+                        name: self.run_benchmark(BENCHMARKS[name], ctx, options['repeat'])
+                        for name in names
+                    }
+                    for name, result in report['scales'][str(scale)].items():
+                        if 'error' in result:
+                            self.stdout.write(self.style.ERROR(f"  {name}: {result['error']}"))
+                            continue
+                        self.stdout.write(
+                            f"  {name}: median {result['median_ms']} ms, "
+                            f"{result['queries']} запросов, статус {result['status']}"
+                        )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        self.stdout.write(self.style.SUCCESS(f"Отчёт сохранён в {options['output']}"))
+
+    def run_benchmark(self, func, ctx, repeat):
+        timings = []
+        status = None
+        size = 0
+        # Счётчик через execute_wrapper: queries_log очищается в начале каждого запроса
+        queries = QueryCounter()
+        try:
+            with connection.execute_wrapper(queries):
+                func(ctx)  # прогрев
+        except Exception as e:
+            return {'error': f'{type(e).__name__}: {e}'}
+
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = func(ctx)
+            timings.append((time.perf_counter() - started) * 1000)
+            status = response.status_code
+            size = len(response.content) if not response.streaming else None
+
+        return {
+            'min_ms': round(min(timings), 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': queries.count,
+            'status': status,
+            'response_bytes': size,
+        }
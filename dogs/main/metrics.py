@@ -0,0 +1,321 @@
+"""
+Метрики производительности представлений.
+
+RouteMetricsMiddleware собирает для каждого маршрута гистограммы времени
+ответа, количества SQL-запросов и размера ответа, а также счётчики
+запросов и исключений. Каждый процесс хранит свои значения в памяти и
+периодически сбрасывает их в файл METRICS_DIR/metrics_<pid>.json;
+при выдаче метрик файлы всех процессов суммируются. Значения
+завершившихся процессов переносятся в накопительный файл
+METRICS_DIR/metrics_accumulated.json (как в multiprocess-режиме
+prometheus_client), а их файлы удаляются - так счётчики не уменьшаются
+при перезапуске воркеров. Перенос выполняется под файловой блокировкой,
+чтобы два процесса не учли один файл дважды.
+SQL-запросы считаются по всем подключениям к базам (основной и реплике).
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка не поддерживается
+    fcntl = None
+
+from django.conf import settings
+from django.db import connections
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'dogs_request_duration_seconds': ('Время обработки запроса', DURATION_BUCKETS),
+    'dogs_request_queries': ('Количество SQL-запросов на запрос', QUERY_BUCKETS),
+    'dogs_response_size_bytes': ('Размер тела ответа', SIZE_BUCKETS),
+}
+
+COUNTERS = {
+    'dogs_requests_total': 'Количество обработанных запросов',
+    'dogs_request_exceptions_total': 'Количество необработанных исключений',
+}
+
+
+METRICS_FILE_RE = re.compile(r'^metrics_(\d+)\.json$')
+ACCUMULATED_FILE = 'metrics_accumulated.json'
+LOCK_FILE = 'metrics.lock'
+
+
+def get_metrics_dir():
+    return getattr(settings, 'METRICS_DIR', os.path.join(settings.BASE_DIR, 'metrics'))
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """Метрики текущего процесса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = defaultdict(int)
+        self._last_flush = 0.0
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, labels)
+        with self._lock:
+            data = self.histograms.get(key)
+            if data is None:
+                data = self.histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    data['buckets'][i] += 1
+            data['sum'] += value
+            data['count'] += 1
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self.counters[(name, labels)] += amount
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'histograms': [
+                    [name, list(labels), dict(data, buckets=list(data['buckets']))]
+                    for (name, labels), data in self.histograms.items()
+                ],
+                'counters': [
+                    [name, list(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        """Записывает снимок метрик процесса в файл (не чаще METRICS_FLUSH_INTERVAL)"""
+        now = time.monotonic()
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if not force and now - self._last_flush < interval:
+            return
+        self._last_flush = now
+
+        metrics_dir = get_metrics_dir()
+        path = os.path.join(metrics_dir, f'metrics_{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        try:
+            os.makedirs(metrics_dir, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+registry = MetricsRegistry()
+
+
+def _read_metrics_file(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(histograms, counters, data):
+    """Добавляет значения из файла метрик к суммам"""
+    for name, labels, hist in data.get('histograms', []):
+        key = (name, tuple(tuple(label) for label in labels))
+        total = histograms.setdefault(
+            key, {'buckets': [0] * len(hist['buckets']), 'sum': 0, 'count': 0}
+        )
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], hist['buckets'])]
+        total['sum'] += hist['sum']
+        total['count'] += hist['count']
+    for name, labels, value in data.get('counters', []):
+        counters[(name, tuple(tuple(label) for label in labels))] += value
+
+
+def _write_metrics_file(path, histograms, counters):
+    data = {
+        'histograms': [[name, list(labels), hist] for (name, labels), hist in histograms.items()],
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+    }
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _metrics_lock(metrics_dir):
+    with open(os.path.join(metrics_dir, LOCK_FILE), 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _accumulate_dead_processes(metrics_dir, paths):
+    """Переносит метрики завершившихся процессов в накопительный файл и удаляет их файлы"""
+    try:
+        with _metrics_lock(metrics_dir):
+            # Файл мог перенести другой процесс, пока блокировка была занята
+            paths = [path for path in paths if os.path.exists(path)]
+            if not paths:
+                return
+            accumulated_path = os.path.join(metrics_dir, ACCUMULATED_FILE)
+            histograms, counters = {}, defaultdict(int)
+            _merge(histograms, counters, _read_metrics_file(accumulated_path) or {})
+            for path in paths:
+                _merge(histograms, counters, _read_metrics_file(path) or {})
+            _write_metrics_file(accumulated_path, histograms, counters)
+            for path in paths:
+                os.remove(path)
+    except OSError:
+        pass
+
+
+def collect_all_processes():
+    """Суммирует метрики всех процессов, включая завершившиеся, из файлового хранилища"""
+    registry.flush(force=True)
+    histograms = {}
+    counters = defaultdict(int)
+
+    metrics_dir = get_metrics_dir()
+    try:
+        filenames = os.listdir(metrics_dir)
+    except FileNotFoundError:
+        filenames = []
+
+    live, dead = [], []
+    for filename in filenames:
+        match = METRICS_FILE_RE.match(filename)
+        if match is None:
+            continue
+        path = os.path.join(metrics_dir, filename)
+        (live if _process_alive(int(match.group(1))) else dead).append(path)
+    if dead:
+        _accumulate_dead_processes(metrics_dir, dead)
+
+    for path in [os.path.join(metrics_dir, ACCUMULATED_FILE)] + live:
+        data = _read_metrics_file(path)
+        if data is not None:
+            _merge(histograms, counters, data)
+
+    return histograms, counters
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_prometheus():
+    """Возвращает метрики всех процессов в текстовом формате Prometheus"""
+    histograms, counters = collect_all_processes()
+    lines = []
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, labels), data in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(buckets, data['buckets']):
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {data["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {data["sum"]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {data["count"]}')
+
+    for name, help_text in COUNTERS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class QueryCounter:
+    """Обёртка выполнения SQL, считающая запросы"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class RouteMetricsMiddleware:
+    """
+    Собирает метрики для представлений, подключённых через main.urls.
+    Маршрут определяется по имени URL (например, dogsitter-list).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_view_label(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None or not match.func.__module__.startswith(('main.', 'users.')):
+            return None
+        return match.view_name
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for db_connection in connections.all():
+                stack.enter_context(db_connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        view = self.get_view_label(request)
+        if view is not None:
+            labels = (('view', view), ('method', request.method))
+            registry.observe('dogs_request_duration_seconds', labels, duration)
+            registry.observe('dogs_request_queries', labels, counter.count)
+            if not response.streaming:
+                registry.observe('dogs_response_size_bytes', labels, len(response.content))
+            registry.inc('dogs_requests_total', labels + (('status', response.status_code),))
+            registry.flush()
+
+        return response
+
+    def process_exception(self, request, exception):
+        view = self.get_view_label(request)
+        if view is not None:
+            registry.inc(
+                'dogs_request_exceptions_total',
+                (('view', view), ('method', request.method), ('exception', type(exception).__name__))
+            )
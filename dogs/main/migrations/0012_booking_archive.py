@@ -0,0 +1,89 @@
+# Generated by Django 5.1.4 on 2026-10-19 14:24
+
+import django.db.models.deletion
+import django.utils.timezone
+import main.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('start_date', models.DateField(verbose_name='Дата начала')),
+                ('end_date', models.DateField(verbose_name='Дата окончания')),
+                ('total_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Общая стоимость')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Последнее обновление')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('confirmed', 'Подтверждено'), ('completed', 'Завершено'), ('cancelled', 'Отменено')], max_length=20, verbose_name='Статус бронирования')),
+                ('contract_file', models.FileField(blank=True, null=True, upload_to=main.models.booking_document_path, verbose_name='Договор')),
+                ('payment_receipt', models.FileField(blank=True, null=True, upload_to=main.models.booking_document_path, verbose_name='Чек об оплате')),
+                ('additional_documents', models.FileField(blank=True, null=True, upload_to=main.models.booking_document_path, verbose_name='Дополнительные документы')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата архивации')),
+                ('dog_sitter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to='main.dogsitter', verbose_name='Догситтер')),
+                ('services', models.ManyToManyField(related_name='archived_bookings', to='main.service', verbose_name='Услуги')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Архивное бронирование',
+                'verbose_name_plural': 'Архивные бронирования',
+                'ordering': ['-start_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedBookingAnimal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('special_notes', models.TextField(blank=True, verbose_name='Особые заметки')),
+                ('special_diet', models.CharField(blank=True, max_length=255, verbose_name='Особая диета')),
+                ('medications', models.TextField(blank=True, verbose_name='Медикаменты')),
+                ('added_at', models.DateTimeField(verbose_name='Время добавления')),
+                ('animal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.animal', verbose_name='Животное')),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.archivedbooking', verbose_name='Бронирование')),
+            ],
+            options={
+                'verbose_name': 'Животное в архивном бронировании',
+                'verbose_name_plural': 'Животные в архивных бронированиях',
+                'unique_together': {('booking', 'animal')},
+            },
+        ),
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='animals',
+            field=models.ManyToManyField(related_name='archived_bookings', through='main.ArchivedBookingAnimal', to='main.animal', verbose_name='Животные'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedReview',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('rating', models.IntegerField(choices=[(1, '⭐ Очень плохо'), (2, '⭐⭐ Плохо'), (3, '⭐⭐⭐ Нормально'), (4, '⭐⭐⭐⭐ Хорошо'), (5, '⭐⭐⭐⭐⭐ Отлично')], verbose_name='Оценка')),
+                ('comment', models.TextField(blank=True, null=True, verbose_name='Комментарий')),
+                ('date', models.DateTimeField(verbose_name='Дата отзыва')),
+                ('is_verified', models.BooleanField(default=False, verbose_name='Проверен')),
+                ('created_at', models.DateTimeField()),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='review', to='main.archivedbooking', verbose_name='Бронирование')),
+            ],
+            options={
+                'verbose_name': 'Архивный отзыв',
+                'verbose_name_plural': 'Архивные отзывы',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['dog_sitter', 'status', 'start_date'], name='archived_sitter_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['user', 'start_date'], name='archived_user_start_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-19 14:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_booking_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarningsEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_id', models.BigIntegerField(db_index=True, verbose_name='Бронирование')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время записи')),
+                ('dog_sitter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='earnings_entries', to='main.dogsitter', verbose_name='Догситтер')),
+            ],
+            options={
+                'verbose_name': 'Запись журнала заработка',
+                'verbose_name_plural': 'Журнал заработка',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyEarnings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Заработок за месяц')),
+                ('bookings_count', models.IntegerField(default=0, verbose_name='Завершённых бронирований')),
+                ('running_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Нарастающий итог')),
+                ('dog_sitter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_earnings', to='main.dogsitter', verbose_name='Догситтер')),
+            ],
+            options={
+                'verbose_name': 'Заработок за месяц',
+                'verbose_name_plural': 'Заработок по месяцам',
+                'ordering': ['dog_sitter', 'month'],
+                'constraints': [models.UniqueConstraint(fields=('dog_sitter', 'month'), name='monthly_earnings_sitter_month_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-19 14:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_earnings_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingMonthStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('confirmed', 'Подтверждено'), ('completed', 'Завершено'), ('cancelled', 'Отменено')], max_length=20, verbose_name='Статус бронирования')),
+                ('bookings_count', models.IntegerField(default=0, verbose_name='Бронирований')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('priced_count', models.IntegerField(default=0, verbose_name='Бронирований с ценой')),
+                ('animals_count', models.IntegerField(default=0, verbose_name='Животных')),
+                ('services_count', models.IntegerField(default=0, verbose_name='Услуг')),
+                ('dog_sitter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='month_stats', to='main.dogsitter', verbose_name='Догситтер')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_month_stats', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Статистика бронирований за месяц',
+                'verbose_name_plural': 'Статистика бронирований по месяцам',
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['dog_sitter', 'month'], name='month_stats_sitter_idx'), models.Index(fields=['user', 'month'], name='month_stats_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('month', 'dog_sitter', 'user', 'status'), name='booking_month_stats_uniq')],
+            },
+        ),
+    ]
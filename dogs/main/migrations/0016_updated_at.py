@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_system_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Последнее обновление'),
+        ),
+        migrations.AddField(
+            model_name='archivedreview',
+            name='updated_at',
+            field=models.DateTimeField(null=True, verbose_name='Последнее обновление'),
+        ),
+        migrations.AddField(
+            model_name='dogsitter',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Последнее обновление'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Последнее обновление'),
+        ),
+    ]
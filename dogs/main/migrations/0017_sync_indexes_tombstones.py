@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-19 14:42
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=20, verbose_name='Ресурс')),
+                ('object_id', models.BigIntegerField(verbose_name='ID записи')),
+                ('user_id', models.BigIntegerField(null=True, verbose_name='Владелец')),
+                ('sitter_user_id', models.BigIntegerField(null=True, verbose_name='Пользователь-догситтер')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Удалена')),
+            ],
+            options={
+                'verbose_name': 'Отметка об удалении',
+                'verbose_name_plural': 'Отметки об удалении',
+                'ordering': ['deleted_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['updated_at', 'id'], name='animal_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['updated_at', 'id'], name='booking_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['updated_at', 'id'], name='review_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['resource', 'deleted_at', 'id'], name='tombstone_resource_idx'),
+        ),
+    ]
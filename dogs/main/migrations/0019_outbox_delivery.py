@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-19 14:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_outbox_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Попыток доставки'),
+        ),
+        migrations.AddField(
+            model_name='outboxevent',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Доставлено'),
+        ),
+        migrations.AddField(
+            model_name='outboxevent',
+            name='last_error',
+            field=models.TextField(blank=True, verbose_name='Последняя ошибка'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['id'], name='outbox_pending_idx'),
+        ),
+    ]
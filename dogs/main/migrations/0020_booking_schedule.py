@@ -0,0 +1,60 @@
+# Generated by Django 5.1.4 on 2026-10-19 15:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_outbox_delivery'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('daily', 'Ежедневно'), ('weekly', 'Еженедельно'), ('monthly', 'Ежемесячно')], default='weekly', max_length=10, verbose_name='Частота')),
+                ('interval', models.PositiveSmallIntegerField(default=1, verbose_name='Интервал')),
+                ('weekdays', models.JSONField(blank=True, default=list, verbose_name='Дни недели')),
+                ('duration_days', models.PositiveSmallIntegerField(default=1, verbose_name='Продолжительность, дней')),
+                ('start_date', models.DateField(verbose_name='Дата начала')),
+                ('until', models.DateField(blank=True, null=True, verbose_name='Повторять до')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активно')),
+                ('materialized_until', models.DateField(blank=True, null=True, verbose_name='Бронирования созданы по')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Последнее обновление')),
+                ('animals', models.ManyToManyField(related_name='booking_schedules', to='main.animal', verbose_name='Животные')),
+                ('dog_sitter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_schedules', to='main.dogsitter', verbose_name='Догситтер')),
+                ('services', models.ManyToManyField(blank=True, related_name='booking_schedules', to='main.service', verbose_name='Услуги')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_schedules', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Расписание бронирований',
+                'verbose_name_plural': 'Расписания бронирований',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_bookings', to='main.bookingschedule', verbose_name='Расписание'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bookings', to='main.bookingschedule', verbose_name='Расписание'),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(fields=('schedule', 'start_date'), name='booking_schedule_occurrence_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingschedule',
+            index=models.Index(fields=['is_active', 'materialized_until'], name='schedule_due_idx'),
+        ),
+    ]
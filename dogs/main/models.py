@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import RegexValidator, EmailValidator, MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from datetime import timedelta
@@ -73,6 +73,19 @@ class BookingManager(models.Manager):
             'bookinganimal_set' 
         )
 
+    def with_history(self, *args, **kwargs):
+        """
+        Бронирования вместе с архивными (ArchivedBooking) через UNION ALL.
+        Фильтры применяются к обеим таблицам; у архивных записей заполнено
+        archived_at, у живых - None. Результат можно сортировать, считать
+        и нарезать, но не фильтровать повторно.
+        """
+        live = self.filter(*args, **kwargs).annotate(
+            archived_at=Value(None, output_field=models.DateTimeField())
+        ).order_by()
+        archived = ArchivedBooking.objects.filter(*args, **kwargs).order_by()
+        return live.union(archived, all=True).order_by('-start_date', '-id')
+
 
 class Animal(models.Model):
     """Модель для таблицы Animals (Животные)"""
@@ -110,6 +123,7 @@ class Animal(models.Model):
         blank=True,
         verbose_name="Фотография животного"
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее обновление")
 
     def __str__(self):
         return self.name
@@ -201,6 +215,11 @@ class Animal(models.Model):
         verbose_name = "Животное"
         verbose_name_plural = "Животные"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['type', 'size', 'name'], name='animal_type_size_idx'),
+            # Синхронизация изменений (main.sync)
+            models.Index(fields=['updated_at', 'id'], name='animal_updated_idx'),
+        ]
 
 
 class Service(models.Model):
@@ -262,6 +281,7 @@ class DogSitter(models.Model):
         null=True,
         verbose_name="Ссылки на соцсети"
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее обновление")
 
     def __str__(self):
         return f"Догситтер {self.user.last_name} {self.user.first_name}"
@@ -278,9 +298,19 @@ class DogSitter(models.Model):
         return self.last_login >= (timezone.now() - timedelta(days=30))
 
     def calculate_total_earnings(self):
-        """Расчет общего заработка догситтера"""
-        completed_bookings = self.bookings.filter(status=Booking.STATUS_COMPLETED)
-        return sum(booking.total_price for booking in completed_bookings if booking.total_price)
+        """Расчет общего заработка догситтера (по журналу заработка)"""
+        from .earnings import lifetime_earnings
+        return lifetime_earnings(self)
+
+    def get_earnings_between(self, start, end):
+        """Заработок за месяцы с start по end включительно"""
+        from .earnings import earnings_between
+        return earnings_between(self, start, end)
+
+    def get_monthly_earnings(self, start=None, end=None):
+        """Заработок по месяцам с нарастающим итогом"""
+        from .earnings import monthly_earnings
+        return monthly_earnings(self, start, end)
     
     def get_average_rating_from_reviews(self):
         """Получение среднего рейтинга из всех отзывов по бронированиям догситтера"""
@@ -330,84 +360,25 @@ class DogSitter(models.Model):
         ).count()
         
     def get_statistics(self):
-        """Получает статистику по догситтеру"""
-        # Получаем статистику по бронированиям
-        bookings_stats = self.bookings.aggregate(
-            total_bookings=Count('id'),
-            completed_bookings=Count('id', filter=Q(status=Booking.STATUS_COMPLETED)),
-            cancelled_bookings=Count('id', filter=Q(status=Booking.STATUS_CANCELLED)),
-            total_earnings=Sum('total_price', filter=Q(status=Booking.STATUS_COMPLETED)),
-            avg_booking_price=Avg('total_price')
-        )
-        
-        # Получаем среднюю продолжительность бронирований отдельно
-        duration_stats = self.bookings.annotate(
-            duration=ExpressionWrapper(
-                F('end_date') - F('start_date'),
-                output_field=fields.DurationField()
-            )
-        ).aggregate(
-            avg_booking_duration=Avg('duration')
-        )
-        
-        # Обрабатываем None значения в статистике бронирований
-        bookings_stats['total_bookings'] = bookings_stats.get('total_bookings', 0)
-        bookings_stats['completed_bookings'] = bookings_stats.get('completed_bookings', 0)
-        bookings_stats['cancelled_bookings'] = bookings_stats.get('cancelled_bookings', 0)
-        bookings_stats['total_earnings'] = float(bookings_stats.get('total_earnings', 0) or 0)
-        bookings_stats['avg_booking_price'] = float(bookings_stats.get('avg_booking_price', 0) or 0)
-        
-        # Преобразуем timedelta в дни
-        avg_duration = duration_stats.get('avg_booking_duration')
-        bookings_stats['avg_booking_duration'] = avg_duration.days if avg_duration else 0
-        
-        # Получаем статистику по животным
-        animals_stats = self.bookings.aggregate(
-            total_animals=Count('animals', distinct=True),
-            dogs_count=Count('animals', filter=Q(animals__type=Animal.DOG), distinct=True),
-            cats_count=Count('animals', filter=Q(animals__type=Animal.CAT), distinct=True),
-            small_animals=Count('animals', filter=Q(animals__size=Animal.SIZE_SMALL), distinct=True),
-            medium_animals=Count('animals', filter=Q(animals__size=Animal.SIZE_MEDIUM), distinct=True),
-            large_animals=Count('animals', filter=Q(animals__size=Animal.SIZE_LARGE), distinct=True)
-        )
-        
-        # Обрабатываем None значения в статистике животных
-        for key in animals_stats:
-            animals_stats[key] = animals_stats.get(key, 0)
-        
-        # Получаем статистику по отзывам
-        reviews_stats = Review.objects.filter(booking__dog_sitter=self).aggregate(
-            total_reviews=Count('id'),
-            avg_rating=Avg('rating'),
-            five_star_reviews=Count('id', filter=Q(rating=5)),
-            four_star_reviews=Count('id', filter=Q(rating=4)),
-            three_star_reviews=Count('id', filter=Q(rating=3)),
-            two_star_reviews=Count('id', filter=Q(rating=2)),
-            one_star_reviews=Count('id', filter=Q(rating=1))
-        )
-        
-        reviews_stats['total_reviews'] = reviews_stats.get('total_reviews', 0)
-        reviews_stats['avg_rating'] = float(reviews_stats.get('avg_rating', 0) or 0)
-        reviews_stats['five_star_reviews'] = reviews_stats.get('five_star_reviews', 0)
-        reviews_stats['four_star_reviews'] = reviews_stats.get('four_star_reviews', 0)
-        reviews_stats['three_star_reviews'] = reviews_stats.get('three_star_reviews', 0)
-        reviews_stats['two_star_reviews'] = reviews_stats.get('two_star_reviews', 0)
-        reviews_stats['one_star_reviews'] = reviews_stats.get('one_star_reviews', 0)
-
-        return {
-            'bookings_stats': bookings_stats,
-            'animals_stats': animals_stats,
-            'reviews_stats': reviews_stats
-        }
+        """
+        Получает статистику по догситтеру (SitterStatistics, кэшируется).
+        Без replica_reads: кэш сбрасывается записью, а реплика может отставать
+        """
+        from .sitter_stats import get_statistics
+        return get_statistics(self)
         
     def get_bookings_by_month(self):
-        return self.bookings.annotate(
-            month=TruncMonth('start_date')
-        ).values('month').annotate(
-            count=Count('id'),
-            total_revenue=Sum('total_price'),
-            avg_price=Avg('total_price')
-        ).order_by('-month')
+        """Бронирования догситтера по месяцам (из куба main.booking_cube)"""
+        from .booking_cube import monthly_series
+        return [
+            {
+                'month': row['month'],
+                'count': row['bookings_count'],
+                'total_revenue': row['revenue'],
+                'avg_price': row['avg_price'],
+            }
+            for row in monthly_series(dog_sitter=self)
+        ]
         
     def get_clients_with_stats(self):
         return User.objects.filter(
@@ -546,6 +517,9 @@ class Booking(models.Model):
         (STATUS_COMPLETED, "Завершено"),
         (STATUS_CANCELLED, "Отменено")
     ]
+
+    # Стоимость животного за день в зависимости от размера
+    SIZE_COST_MAP = {"Маленький": 500, "Средний": 700, "Крупный": 1000}
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="bookings", verbose_name="Владелец")
     animals = models.ManyToManyField(
@@ -585,9 +559,20 @@ class Booking(models.Model):
         blank=True,
         verbose_name="Дополнительные документы"
     )
+    # Расписание, по которому создано бронирование (main.schedules)
+    schedule = models.ForeignKey(
+        'BookingSchedule',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="bookings",
+        verbose_name="Расписание"
+    )
     
     objects = BookingManager()
 
+    # Сигналы (события, счётчики, журнал) пишут в той же транзакции
+    @transaction.atomic
     def save(self, *args, **kwargs):
         # Сохраняем объект, чтобы получить id (если это новый объект)
         if not self.pk:
@@ -606,8 +591,7 @@ class Booking(models.Model):
         service_cost = sum(service.price for service in self.services.all())
 
         # Стоимость животных (в зависимости от размера)
-        size_cost_map = {"Маленький": 500, "Средний": 700, "Крупный": 1000}
-        animal_cost = sum(size_cost_map.get(animal.size, 500) for animal in self.animals.all())
+        animal_cost = sum(self.SIZE_COST_MAP.get(animal.size, 500) for animal in self.animals.all())
 
         # Общая стоимость
         self.total_price = (service_cost + animal_cost) * days
@@ -735,6 +719,70 @@ class Booking(models.Model):
         verbose_name = "Бронирование"
         verbose_name_plural = "Бронирования"
         ordering = ['-start_date']
+        indexes = [
+            # BookingManager.active/pending/confirmed
+            models.Index(fields=['status', 'start_date'], name='booking_status_start_idx'),
+            # BookingManager.current/completed
+            models.Index(fields=['status', 'end_date'], name='booking_status_end_idx'),
+            # BookingManager.future и сортировка по умолчанию
+            models.Index(fields=['start_date', 'end_date'], name='booking_dates_idx'),
+            # Бронирования догситтера по статусу (заработок, статистика)
+            models.Index(fields=['dog_sitter', 'status', 'start_date'], name='booking_sitter_status_idx'),
+            # Синхронизация изменений (main.sync)
+            models.Index(fields=['updated_at', 'id'], name='booking_updated_idx'),
+        ]
+        constraints = [
+            # Повторный запуск materialize_schedules не создаёт дубликатов
+            models.UniqueConstraint(fields=['schedule', 'start_date'], name='booking_schedule_occurrence_uniq'),
+        ]
+
+
+class BookingSchedule(models.Model):
+    """
+    Повторяющееся бронирование (main.schedules): шаблон Booking и правило
+    повторения по образцу RRULE - частота, интервал и дни недели.
+    Бронирования создаются только на ближайшие SCHEDULE_HORIZON_DAYS дней
+    (materialized_until - по какую дату они уже созданы), дальние вхождения
+    вычисляются по правилу при запросе календаря.
+    """
+    FREQ_DAILY = 'daily'
+    FREQ_WEEKLY = 'weekly'
+    FREQ_MONTHLY = 'monthly'
+
+    FREQUENCY_CHOICES = [
+        (FREQ_DAILY, "Ежедневно"),
+        (FREQ_WEEKLY, "Еженедельно"),
+        (FREQ_MONTHLY, "Ежемесячно"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="booking_schedules", verbose_name="Владелец")
+    dog_sitter = models.ForeignKey(DogSitter, on_delete=models.CASCADE, related_name="booking_schedules", verbose_name="Догситтер")
+    animals = models.ManyToManyField(Animal, related_name="booking_schedules", verbose_name="Животные")
+    services = models.ManyToManyField(Service, blank=True, related_name="booking_schedules", verbose_name="Услуги")
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default=FREQ_WEEKLY, verbose_name="Частота")
+    interval = models.PositiveSmallIntegerField(default=1, verbose_name="Интервал")
+    # Номера дней недели (0 - понедельник), как BYDAY; пусто - день недели даты начала
+    weekdays = models.JSONField(default=list, blank=True, verbose_name="Дни недели")
+    duration_days = models.PositiveSmallIntegerField(default=1, verbose_name="Продолжительность, дней")
+    start_date = models.DateField(verbose_name="Дата начала")
+    until = models.DateField(null=True, blank=True, verbose_name="Повторять до")
+    is_active = models.BooleanField(default=True, verbose_name="Активно")
+    materialized_until = models.DateField(null=True, blank=True, verbose_name="Бронирования созданы по")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее обновление")
+
+    def __str__(self):
+        return f"Расписание {self.id}: {self.get_frequency_display().lower()} с {self.start_date}"
+
+    class Meta:
+        verbose_name = "Расписание бронирований"
+        verbose_name_plural = "Расписания бронирований"
+        ordering = ['-created_at']
+        indexes = [
+            # Выборка расписаний для materialize_schedules
+            models.Index(fields=['is_active', 'materialized_until'], name='schedule_due_idx'),
+        ]
+
 
 class Review(models.Model):
     """Модель для таблицы Reviews (Отзывы)"""
@@ -762,15 +810,15 @@ class Review(models.Model):
     date = models.DateTimeField(default=timezone.now, verbose_name="Дата отзыва")
     is_verified = models.BooleanField(default=False, verbose_name="Проверен")
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее обновление")
 
+    @transaction.atomic
     def save(self, *args, **kwargs):
-        """Обновление рейтинга догситтера после отзыва"""
+        """
+        Сохранение отзыва вместе с событием review.saved (main.signals);
+        рейтинг догситтера пересчитывает обработчик события
+        """
         super().save(*args, **kwargs)
-        if self.booking.dog_sitter:
-            sitter = self.booking.dog_sitter
-            all_ratings = [review.rating for review in Review.objects.filter(booking__dog_sitter=sitter)]
-            sitter.rating = sum(all_ratings) / len(all_ratings) if all_ratings else 0
-            sitter.save()
             
     def is_recent_review(self):
         """Проверяет, является ли отзыв недавним (создан менее 7 дней назад)"""
@@ -837,5 +885,250 @@ class Review(models.Model):
         verbose_name = "Отзыв"
         verbose_name_plural = "Отзывы"
         ordering = ['-date']
+        indexes = [
+            # Синхронизация изменений (main.sync)
+            models.Index(fields=['updated_at', 'id'], name='review_updated_idx'),
+        ]
+
+
+class ArchivedBooking(models.Model):
+    """
+    Архив завершённых и отменённых бронирований (main.archive).
+    Столбцы повторяют Booking в том же порядке, чтобы
+    Booking.objects.with_history() мог объединять таблицы через UNION.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_bookings", verbose_name="Владелец")
+    animals = models.ManyToManyField(
+        Animal,
+        through='ArchivedBookingAnimal',
+        related_name="archived_bookings",
+        verbose_name="Животные"
+    )
+    start_date = models.DateField(verbose_name="Дата начала")
+    end_date = models.DateField(verbose_name="Дата окончания")
+    services = models.ManyToManyField(Service, related_name="archived_bookings", verbose_name="Услуги")
+    dog_sitter = models.ForeignKey(DogSitter, on_delete=models.CASCADE, related_name="archived_bookings", verbose_name="Догситтер")
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Общая стоимость", blank=True, null=True)
+    created_at = models.DateTimeField(verbose_name="Дата создания")
+    updated_at = models.DateTimeField(verbose_name="Последнее обновление")
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES, verbose_name="Статус бронирования")
+    contract_file = models.FileField(upload_to=booking_document_path, null=True, blank=True, verbose_name="Договор")
+    payment_receipt = models.FileField(upload_to=booking_document_path, null=True, blank=True, verbose_name="Чек об оплате")
+    additional_documents = models.FileField(
+        upload_to=booking_document_path,
+        null=True,
+        blank=True,
+        verbose_name="Дополнительные документы"
+    )
+    schedule = models.ForeignKey(
+        BookingSchedule,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_bookings",
+        verbose_name="Расписание"
+    )
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name="Дата архивации")
+
+    def __str__(self):
+        return f"Архивное бронирование {self.id} с {self.start_date} по {self.end_date}"
+
+    class Meta:
+        verbose_name = "Архивное бронирование"
+        verbose_name_plural = "Архивные бронирования"
+        ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['dog_sitter', 'status', 'start_date'], name='archived_sitter_status_idx'),
+            models.Index(fields=['user', 'start_date'], name='archived_user_start_idx'),
+        ]
+
+
+class ArchivedBookingAnimal(models.Model):
+    """Животные архивного бронирования"""
+    booking = models.ForeignKey(ArchivedBooking, on_delete=models.CASCADE, verbose_name="Бронирование")
+    animal = models.ForeignKey(Animal, on_delete=models.CASCADE, verbose_name="Животное")
+    special_notes = models.TextField(blank=True, verbose_name="Особые заметки")
+    special_diet = models.CharField(max_length=255, blank=True, verbose_name="Особая диета")
+    medications = models.TextField(blank=True, verbose_name="Медикаменты")
+    added_at = models.DateTimeField(verbose_name="Время добавления")
+
+    class Meta:
+        verbose_name = "Животное в архивном бронировании"
+        verbose_name_plural = "Животные в архивных бронированиях"
+        unique_together = ['booking', 'animal']
+
+
+class ArchivedReview(models.Model):
+    """Отзыв на архивное бронирование"""
+    id = models.BigIntegerField(primary_key=True)
+    booking = models.OneToOneField(
+        ArchivedBooking,
+        on_delete=models.CASCADE,
+        related_name="review",
+        verbose_name="Бронирование"
+    )
+    rating = models.IntegerField(verbose_name="Оценка", choices=Review.RATING_CHOICES)
+    comment = models.TextField(blank=True, null=True, verbose_name="Комментарий")
+    date = models.DateTimeField(verbose_name="Дата отзыва")
+    is_verified = models.BooleanField(default=False, verbose_name="Проверен")
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField(null=True, verbose_name="Последнее обновление")
+
+    def __str__(self):
+        return f"Отзыв на архивное бронирование {self.booking_id}"
+
+    class Meta:
+        verbose_name = "Архивный отзыв"
+        verbose_name_plural = "Архивные отзывы"
+        ordering = ['-date']
+
+
+class EarningsEntry(models.Model):
+    """
+    Запись журнала заработка догситтера (main.earnings).
+    Журнал только дополняется: завершение бронирования добавляет его
+    стоимость, отмена завершённого - обратную запись с минусом.
+    booking_id хранится без внешнего ключа, чтобы записи переживали
+    перенос бронирования в архив.
+    """
+    dog_sitter = models.ForeignKey(DogSitter, on_delete=models.CASCADE, related_name="earnings_entries", verbose_name="Догситтер")
+    booking_id = models.BigIntegerField(db_index=True, verbose_name="Бронирование")
+    month = models.DateField(verbose_name="Месяц")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Сумма")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Время записи")
+
+    def __str__(self):
+        return f"{self.amount} за бронирование {self.booking_id}"
+
+    class Meta:
+        verbose_name = "Запись журнала заработка"
+        verbose_name_plural = "Журнал заработка"
+        ordering = ['id']
 
 
+class MonthlyEarnings(models.Model):
+    """
+    Заработок догситтера за месяц с нарастающим итогом.
+    running_total - сумма всех месяцев до текущего включительно, поэтому
+    заработок за всё время и за период читается из одной-двух строк.
+    """
+    dog_sitter = models.ForeignKey(DogSitter, on_delete=models.CASCADE, related_name="monthly_earnings", verbose_name="Догситтер")
+    month = models.DateField(verbose_name="Месяц")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Заработок за месяц")
+    bookings_count = models.IntegerField(default=0, verbose_name="Завершённых бронирований")
+    running_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Нарастающий итог")
+
+    def __str__(self):
+        return f"{self.dog_sitter_id}: {self.month:%Y-%m} - {self.amount}"
+
+    class Meta:
+        verbose_name = "Заработок за месяц"
+        verbose_name_plural = "Заработок по месяцам"
+        ordering = ['dog_sitter', 'month']
+        constraints = [
+            models.UniqueConstraint(fields=['dog_sitter', 'month'], name='monthly_earnings_sitter_month_uniq'),
+        ]
+
+
+class BookingMonthStats(models.Model):
+    """
+    Куб помесячной статистики бронирований (main.booking_cube).
+    Измерения: месяц начала, догситтер, владелец, статус; меры:
+    количество, выручка, животные и услуги. Учитываются и живые,
+    и архивные бронирования.
+    """
+    month = models.DateField(verbose_name="Месяц")
+    dog_sitter = models.ForeignKey(DogSitter, on_delete=models.CASCADE, related_name="month_stats", verbose_name="Догситтер")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="booking_month_stats", verbose_name="Владелец")
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES, verbose_name="Статус бронирования")
+    bookings_count = models.IntegerField(default=0, verbose_name="Бронирований")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Выручка")
+    priced_count = models.IntegerField(default=0, verbose_name="Бронирований с ценой")
+    animals_count = models.IntegerField(default=0, verbose_name="Животных")
+    services_count = models.IntegerField(default=0, verbose_name="Услуг")
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.dog_sitter_id}/{self.user_id} {self.status}: {self.bookings_count}"
+
+    class Meta:
+        verbose_name = "Статистика бронирований за месяц"
+        verbose_name_plural = "Статистика бронирований по месяцам"
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'dog_sitter', 'user', 'status'], name='booking_month_stats_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['dog_sitter', 'month'], name='month_stats_sitter_idx'),
+            models.Index(fields=['user', 'month'], name='month_stats_user_idx'),
+        ]
+
+
+class SystemCounter(models.Model):
+    """
+    Счётчик записей (main.counters): общее число пользователей, животных,
+    догситтеров, бронирований, отзывов и разбивки по типам и статусам.
+    Поддерживается сигналами, сверяется командой reconcile_counters.
+    """
+    name = models.CharField(max_length=50, unique=True, verbose_name="Счётчик")
+    value = models.BigIntegerField(default=0, verbose_name="Значение")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлён")
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+    class Meta:
+        verbose_name = "Счётчик"
+        verbose_name_plural = "Счётчики"
+        ordering = ['name']
+
+
+class SyncTombstone(models.Model):
+    """
+    Отметка об удалении записи для синхронизации изменений (main.sync).
+    user_id и sitter_user_id - пользователи, которым запись была видна;
+    без внешних ключей, чтобы отметки переживали удаление пользователей.
+    """
+    resource = models.CharField(max_length=20, verbose_name="Ресурс")
+    object_id = models.BigIntegerField(verbose_name="ID записи")
+    user_id = models.BigIntegerField(null=True, verbose_name="Владелец")
+    sitter_user_id = models.BigIntegerField(null=True, verbose_name="Пользователь-догситтер")
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="Удалена")
+
+    def __str__(self):
+        return f"{self.resource} {self.object_id} удалена {self.deleted_at:%d.%m.%Y %H:%M}"
+
+    class Meta:
+        verbose_name = "Отметка об удалении"
+        verbose_name_plural = "Отметки об удалении"
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['resource', 'deleted_at', 'id'], name='tombstone_resource_idx'),
+        ]
+
+
+class OutboxEvent(models.Model):
+    """
+    Событие предметной области (main.outbox). Записывается в той же
+    транзакции, что и изменение состояния; диспетчер доставляет события
+    обработчикам и отмечает dispatched_at, поток SSE (main.events) читает
+    таблицу по возрастанию id.
+    """
+    topic = models.CharField(max_length=50, verbose_name="Тема")
+    payload = models.JSONField(default=dict, verbose_name="Данные")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Создано")
+    dispatched_at = models.DateTimeField(null=True, blank=True, verbose_name="Доставлено")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток доставки")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk}"
+
+    class Meta:
+        verbose_name = "Событие"
+        verbose_name_plural = "События"
+        ordering = ['id']
+        indexes = [
+            # Очередь диспетчера: только недоставленные события
+            models.Index(fields=['id'], condition=Q(dispatched_at__isnull=True), name='outbox_pending_idx'),
+        ]
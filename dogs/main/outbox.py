@@ -0,0 +1,155 @@
+"""
+Исходящие события предметной области (transactional outbox).
+
+Изменение состояния и событие о нём записываются в одной транзакции:
+publish добавляет строку OutboxEvent, и если транзакция откатится,
+события не будет. Побочные эффекты (пересчёт рейтингов, агрегатов,
+уведомления) выполняют не запросы, а обработчики, которые регистрируются
+декоратором handler и вызываются диспетчером пачками.
+
+Доставка "хотя бы один раз": событие отмечается доставленным только
+после успешной работы всех обработчиков его темы. Если обработчик упал,
+его изменения откатываются (точка сохранения), у событий пачки
+увеличивается attempts, и они будут доставлены повторно - поэтому
+обработчики должны быть идемпотентными. После OUTBOX_MAX_ATTEMPTS
+попыток событие остаётся в таблице с last_error для разбора.
+
+Диспетчер запускается командой dispatch_outbox (--loop для постоянной
+работы); несколько диспетчеров не мешают друг другу благодаря
+SELECT ... FOR UPDATE SKIP LOCKED там, где база его поддерживает.
+События, последствия которых пользователь ждёт сразу (рейтинг после
+отзыва), дополнительно доставляются сразу после фиксации транзакции
+(dispatch_on_commit); если это не удалось, их доставит dispatch_outbox,
+поэтому команда должна работать постоянно или по расписанию.
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Тема: список обработчиков handler(events)
+HANDLERS = defaultdict(list)
+
+
+def handler(topic):
+    """Регистрирует обработчик темы; он получает список событий пачки"""
+    def decorator(func):
+        if func not in HANDLERS[topic]:
+            HANDLERS[topic].append(func)
+        return func
+    return decorator
+
+
+def publish(topic, payload):
+    """Записывает событие в текущей транзакции"""
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def publish_many(topic, payloads):
+    """Записывает несколько событий одной темы одним запросом"""
+    return OutboxEvent.objects.bulk_create([OutboxEvent(topic=topic, payload=payload) for payload in payloads])
+
+
+def pending():
+    return OutboxEvent.objects.filter(dispatched_at__isnull=True, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)
+
+
+def _deliver(topic, events):
+    """Вызывает обработчики темы; None при успехе, иначе текст ошибки"""
+    try:
+        with transaction.atomic():
+            for func in HANDLERS.get(topic, ()):
+                func(events)
+    except Exception as exc:
+        logger.exception("Ошибка обработки событий %s (%d шт.)", topic, len(events))
+        return f"{type(exc).__name__}: {exc}"
+    return None
+
+
+def dispatch_batch(batch_size=None, after_id=0, event_ids=None):
+    """
+    Доставляет одну пачку недоставленных событий с id больше after_id
+    (только из event_ids, если они указаны).
+    Возвращает (доставлено, с ошибкой, id последнего события пачки или None)
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    with transaction.atomic():
+        queryset = pending().filter(id__gt=after_id).order_by('id')
+        if event_ids is not None:
+            queryset = queryset.filter(id__in=event_ids)
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        events = list(queryset[:batch_size])
+
+        by_topic = defaultdict(list)
+        for event in events:
+            by_topic[event.topic].append(event)
+
+        delivered, failed = [], {}
+        for topic, topic_events in by_topic.items():
+            error = _deliver(topic, topic_events)
+            if error is None:
+                delivered += [event.pk for event in topic_events]
+            else:
+                failed.update((event.pk, error) for event in topic_events)
+
+        if delivered:
+            OutboxEvent.objects.filter(pk__in=delivered).update(dispatched_at=timezone.now())
+        errors = defaultdict(list)
+        for pk, error in failed.items():
+            errors[error].append(pk)
+        for error, pks in errors.items():
+            OutboxEvent.objects.filter(pk__in=pks).update(attempts=F('attempts') + 1, last_error=error)
+    return len(delivered), len(failed), events[-1].pk if events else None
+
+
+def dispatch_on_commit(events):
+    """
+    Доставляет события сразу после фиксации текущей транзакции. Ошибка
+    доставки только записывается в журнал: событие остаётся недоставленным
+    и его подберёт dispatch_outbox
+    """
+    event_ids = [event.pk for event in events]
+    if event_ids:
+        transaction.on_commit(lambda: dispatch_batch(event_ids=event_ids), robust=True)
+
+
+def dispatch_pending(batch_size=None, max_batches=None):
+    """Доставляет пачки, пока есть события. Возвращает (доставлено, с ошибкой)"""
+    total_delivered = total_failed = batches = last_id = 0
+    while max_batches is None or batches < max_batches:
+        delivered, failed, batch_last_id = dispatch_batch(batch_size, after_id=last_id)
+        if batch_last_id is None:
+            break
+        total_delivered += delivered
+        total_failed += failed
+        batches += 1
+        # Упавшие события повторяются при следующем запуске, а не в этом цикле
+        last_id = batch_last_id
+    return total_delivered, total_failed
+
+
+def run_forever(batch_size=None, interval=None):
+    interval = settings.OUTBOX_POLL_INTERVAL if interval is None else interval
+    while True:
+        delivered, _ = dispatch_pending(batch_size)
+        if not delivered:
+            time.sleep(interval)
+
+
+def prune_dispatched(days=None):
+    """Удаляет доставленные события старше срока хранения. Возвращает число удалённых"""
+    days = settings.OUTBOX_RETENTION_DAYS if days is None else days
+    deleted, _ = OutboxEvent.objects.filter(
+        dispatched_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
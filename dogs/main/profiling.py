@@ -0,0 +1,132 @@
+"""
+Выборочное профилирование запросов.
+
+Заменяет постоянно включённый Silk: cProfile запускается только для
+случайной доли запросов (PROFILING_SAMPLE_RATE) или для запросов с
+заголовком, подписанным администратором. Профили записываются в файлы
+фоновым потоком, а последние медленные запросы хранятся в небольшом
+кольцевом буфере в памяти процесса.
+"""
+import cProfile
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+PROFILE_TOKEN_SALT = 'main.profiling'
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+recent_slow_requests = deque(maxlen=get_setting('PROFILING_RING_SIZE', 50))
+
+_write_queue = queue.Queue()
+_writer_thread = None
+_writer_lock = threading.Lock()
+
+
+def _writer_loop():
+    while True:
+        profiler, path = _write_queue.get()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            profiler.dump_stats(path)
+        except OSError:
+            pass
+        finally:
+            _write_queue.task_done()
+
+
+def save_profile_async(profiler, path):
+    """Передаёт профиль фоновому потоку для записи на диск"""
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name='profile-writer', daemon=True)
+            _writer_thread.start()
+    _write_queue.put((profiler, path))
+
+
+def make_profile_token(user):
+    """Создаёт подписанное значение заголовка для принудительного профилирования"""
+    return signing.dumps({'user_id': user.pk}, salt=PROFILE_TOKEN_SALT)
+
+
+def is_valid_profile_token(value):
+    if not value:
+        return False
+    try:
+        signing.loads(
+            value,
+            salt=PROFILE_TOKEN_SALT,
+            max_age=get_setting('PROFILING_TOKEN_MAX_AGE', 3600)
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+class SampledProfilingMiddleware:
+    """
+    Middleware, которое профилирует только выбранные запросы.
+
+    Для всех запросов измеряется только время выполнения; если оно
+    превышает PROFILING_SLOW_REQUEST_MS, запрос попадает в кольцевой
+    буфер recent_slow_requests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = get_setting('PROFILING_SAMPLE_RATE', 0.0)
+        self.slow_request_ms = get_setting('PROFILING_SLOW_REQUEST_MS', 500)
+        self.profile_dir = get_setting('PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+        self.header = 'HTTP_' + get_setting('PROFILING_HEADER', 'X-Profile').upper().replace('-', '_')
+
+    def should_profile(self, request):
+        if is_valid_profile_token(request.META.get(self.header)):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        profiler = None
+        if self.should_profile(request):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # В этом потоке уже работает другой профилировщик
+                profiler = None
+
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        profile_name = None
+        if profiler is not None:
+            profile_name = f"{uuid.uuid4()}.prof"
+            save_profile_async(profiler, os.path.join(self.profile_dir, profile_name))
+
+        if duration_ms >= self.slow_request_ms or profile_name:
+            recent_slow_requests.append({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration_ms, 2),
+                'profile': profile_name,
+                'timestamp': timezone.now().isoformat(),
+            })
+
+        return response
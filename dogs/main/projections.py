@@ -0,0 +1,347 @@
+"""
+Проекции для чтения: строки ответа прямо из .values_list().
+
+ModelSerializer на каждой строке создаёт экземпляр модели, обходит поля
+сериализатора и вызывает для каждого get_attribute и to_representation.
+Проекция описывает ответ один раз - какие колонки выбрать и как из них
+собрать словарь - и заранее компилирует это в список функций над
+кортежем значений: подписи choices берутся из готового словаря,
+преобразования (Decimal, даты) - из тех же полей DRF, что и в
+сериализаторах, поэтому JSON совпадает с ответом сериализатора.
+
+Описание - именованные аргументы Projection: строка - путь values()
+('dog_sitter__user__first_name'), Column - путь с преобразованием,
+Display - подпись choices, Computed - функция от нескольких колонок,
+Nested - вложенный словарь, Many - список из связи многие-ко-многим
+(один запрос на пачку строк), FileUrl - ссылка на файл.
+
+Сравнение с сериализаторами - команда benchmark_projections.
+"""
+from collections import defaultdict
+from itertools import islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from rest_framework import serializers
+
+
+def model_field(model, lookup):
+    """Поле модели по пути values()"""
+    field = None
+    for part in lookup.split('__'):
+        field = model._meta.get_field(part)
+        if field.is_relation and field.related_model is not None:
+            model = field.related_model
+    return field
+
+
+class Column:
+    """Колонка; convert применяется к значениям, отличным от None"""
+
+    def __init__(self, lookup, convert=None):
+        self.lookup = lookup
+        self.convert = convert
+
+    def lookups(self):
+        return [self.lookup]
+
+    def compile(self, model, index):
+        position, convert = index[self.lookup], self.convert
+        if convert is None:
+            return lambda row, extra: row[position]
+        return lambda row, extra: None if row[position] is None else convert(row[position])
+
+
+class Display(Column):
+    """Подпись значения choices, как get_<поле>_display()"""
+
+    def compile(self, model, index):
+        position = index[self.lookup]
+        labels = {
+            value: force_str(label, strings_only=True)
+            for value, label in model_field(model, self.lookup).flatchoices
+        }
+        return lambda row, extra: labels.get(row[position], row[position])
+
+
+class FileUrl(Column):
+    """Ссылка на файл поля FileField/ImageField; абсолютная, если передан запрос"""
+
+    def compile(self, model, index):
+        position = index[self.lookup]
+        storage = model_field(model, self.lookup).storage
+
+        def url(row, extra):
+            name = row[position]
+            if not name:
+                return None
+            request = extra.get('request')
+            return request.build_absolute_uri(storage.url(name)) if request else storage.url(name)
+        return url
+
+
+class Computed:
+    """Значение func(*колонки)"""
+
+    def __init__(self, func, *lookups):
+        self.func = func
+        self._lookups = list(lookups)
+
+    def lookups(self):
+        return self._lookups
+
+    def compile(self, model, index):
+        func = self.func
+        values = itemgetter(*(index[lookup] for lookup in self._lookups))
+        if len(self._lookups) == 1:
+            return lambda row, extra: func(values(row))
+        return lambda row, extra: func(*values(row))
+
+
+class Nested:
+    """Вложенный словарь; None, если колонка null_if пуста"""
+
+    def __init__(self, null_if=None, **fields):
+        self.null_if = null_if
+        self.fields = {name: _spec(spec) for name, spec in fields.items()}
+
+    def lookups(self):
+        lookups = [self.null_if] if self.null_if else []
+        for spec in self.fields.values():
+            lookups += spec.lookups()
+        return lookups
+
+    def compile(self, model, index):
+        getters = [(name, spec.compile(model, index)) for name, spec in self.fields.items()]
+        if not self.null_if:
+            return lambda row, extra: {name: get(row, extra) for name, get in getters}
+        position = index[self.null_if]
+        return lambda row, extra: None if row[position] is None else {
+            name: get(row, extra) for name, get in getters
+        }
+
+
+class Many:
+    """Список связанных записей по связи многие-ко-многим; догружается на пачку строк"""
+
+    def __init__(self, relation, **fields):
+        self.relation = relation
+        self.projection = Projection(**fields)
+
+    def lookups(self):
+        return []
+
+    def fetch(self, model, keys):
+        field = model._meta.get_field(self.relation)
+        query_name = field.related_query_name()
+        rows = field.related_model.objects.filter(**{f'{query_name}__in': keys})
+        grouped = defaultdict(list)
+        for key, item in self.projection.keyed_rows(rows, query_name):
+            grouped[key].append(item)
+        return grouped
+
+    def compile(self, model, index):
+        position, relation = index['pk'], self.relation
+        return lambda row, extra: extra[relation].get(row[position], [])
+
+
+def _spec(spec):
+    return Column(spec) if isinstance(spec, str) else spec
+
+
+class Projection:
+    """Описание строки ответа: имя поля -> колонка или спецификация"""
+
+    def __init__(self, **fields):
+        self.fields = {name: _spec(spec) for name, spec in fields.items()}
+        self.many = [spec for spec in self.fields.values() if isinstance(spec, Many)]
+        self._compiled = {}
+
+    def _compile(self, model, key=None):
+        """(колонки values_list, функция строки) для модели; кэшируется"""
+        if (model, key) not in self._compiled:
+            lookups = [key] if key else []
+            if self.many:
+                lookups.append('pk')
+            for spec in self.fields.values():
+                for lookup in spec.lookups():
+                    if lookup not in lookups:
+                        lookups.append(lookup)
+            index = {lookup: position for position, lookup in enumerate(lookups)}
+            getters = [(name, spec.compile(model, index)) for name, spec in self.fields.items()]
+
+            def build(row, extra):
+                return {name: get(row, extra) for name, get in getters}
+            self._compiled[model, key] = (lookups, build)
+        return self._compiled[model, key]
+
+    def keyed_rows(self, queryset, key):
+        """Пары (значение колонки key, строка) - для вложенных списков"""
+        lookups, build = self._compile(queryset.model, key)
+        for row in queryset.values_list(*lookups):
+            yield row[0], build(row, {})
+
+    def rows(self, queryset, request=None):
+        """Строки ответа; queryset читается пачками по STREAMING_CHUNK_SIZE"""
+        if not isinstance(queryset, QuerySet):
+            raise TypeError("Проекция строится по QuerySet")
+        lookups, build = self._compile(queryset.model)
+        values = queryset.values_list(*lookups).iterator(chunk_size=settings.STREAMING_CHUNK_SIZE)
+        pk_position = lookups.index('pk') if self.many else None
+        while True:
+            chunk = list(islice(values, settings.STREAMING_CHUNK_SIZE))
+            if not chunk:
+                return
+            extra = {'request': request}
+            if self.many:
+                keys = [row[pk_position] for row in chunk]
+                extra.update((many.relation, many.fetch(queryset.model, keys)) for many in self.many)
+            for row in chunk:
+                yield build(row, extra)
+
+    def one(self, queryset, request=None):
+        """Строка одной записи или None"""
+        return next(self.rows(queryset[:1], request), None)
+
+
+def _full_name(first_name, last_name):
+    return f"{first_name} {last_name}"
+
+
+def _money(value):
+    return str(value)
+
+
+# Бронирование с участниками, животными и услугами (выгрузки и карточка бронирования)
+BOOKING_EXPORT = Projection(
+    id='id',
+    status=Display('status'),
+    start_date='start_date',
+    end_date='end_date',
+    total_price=Column('total_price', _money),
+    dog_sitter=Nested(
+        null_if='dog_sitter_id',
+        id='dog_sitter_id',
+        name=Computed(_full_name, 'dog_sitter__user__first_name', 'dog_sitter__user__last_name'),
+    ),
+    animals=Many('animals', id='id', name='name', type=Display('type')),
+    services=Many('services', id='id', name='name', price=Column('price', _money)),
+)
+
+BOOKING_DETAIL = Projection(
+    **{name: spec for name, spec in BOOKING_EXPORT.fields.items() if name not in ('animals', 'services', 'dog_sitter')},
+    user=Nested(id='user_id', name=Computed(_full_name, 'user__first_name', 'user__last_name')),
+    dog_sitter=BOOKING_EXPORT.fields['dog_sitter'],
+    animals=BOOKING_EXPORT.fields['animals'],
+    services=BOOKING_EXPORT.fields['services'],
+)
+
+# Животные с владельцем (animal_list_api)
+ANIMAL_EXPORT = Projection(
+    id='id',
+    name='name',
+    type=Display('type'),
+    breed='breed',
+    age='age',
+    size=Display('size'),
+    owner=Nested(id='user_id', name=Computed(_full_name, 'user__first_name', 'user__last_name')),
+)
+
+
+# Преобразования тех же полей DRF, что в BookingSerializer и DogSitterSerializer
+_price = serializers.DecimalField(max_digits=10, decimal_places=2).to_representation
+_datetime = serializers.DateTimeField().to_representation
+_duration = serializers.DurationField().to_representation
+
+
+def _review_status(has_review, verified):
+    if not has_review:
+        return "Отзыв не оставлен"
+    if verified:
+        return "Проверенный отзыв"
+    return "Отзыв на проверке"
+
+
+def _review_summary(has_review, rating, length, days_until_review, verified):
+    if not has_review:
+        return None
+    return {
+        'rating': rating,
+        'length': length,
+        'days_after_booking': days_until_review.days if days_until_review else None,
+        'verified': verified,
+    }
+
+
+# Список бронирований: то же, что BookingSerializer по get_bookings_with_ratings()
+BOOKING_LIST = Projection(
+    id='id',
+    user='user_id',
+    dog_sitter='dog_sitter_id',
+    start_date='start_date',
+    end_date='end_date',
+    status='status',
+    total_price=Column('total_price', _price),
+    booking_rating='booking_rating',
+    has_review='has_review',
+    review_length='review_length',
+    review_date=Column('review_date', _datetime),
+    is_review_verified='is_review_verified',
+    days_until_review=Column('days_until_review', _duration),
+    review_status=Computed(_review_status, 'has_review', 'is_review_verified'),
+    review_summary=Computed(
+        _review_summary, 'has_review', 'booking_rating', 'review_length', 'days_until_review', 'is_review_verified',
+    ),
+)
+
+
+def _rating_distribution(total, five, four, three, two, one):
+    total = total or 1  # Избегаем деления на ноль
+    return {
+        '5_stars': (five * 100) / total,
+        '4_stars': (four * 100) / total,
+        '3_stars': (three * 100) / total,
+        '2_stars': (two * 100) / total,
+        '1_star': (one * 100) / total,
+    }
+
+
+def _rating_summary(total, average, positive, recent):
+    if not total:
+        return "Нет отзывов"
+    return {
+        'average': f"{average:.1f}",
+        'total': total,
+        'positive_percentage': f"{positive:.1f}%",
+        'recent_month': recent,
+    }
+
+
+# Список догситтеров: то же, что DogSitterSerializer по get_dogsitter_with_ratings()
+DOGSITTER_LIST = Projection(
+    id='id',
+    user='user_id',
+    first_name='user__first_name',
+    last_name='user__last_name',
+    avatar=FileUrl('avatar'),
+    experience_years='experience_years',
+    description='description',
+    average_rating=Column('average_rating', float),
+    total_reviews='total_reviews',
+    five_star_reviews='five_star_reviews',
+    four_star_reviews='four_star_reviews',
+    three_star_reviews='three_star_reviews',
+    two_star_reviews='two_star_reviews',
+    one_star_reviews='one_star_reviews',
+    positive_reviews_percentage=Column('positive_reviews_percentage', float),
+    recent_reviews='recent_reviews',
+    rating_distribution=Computed(
+        _rating_distribution, 'total_reviews', 'five_star_reviews', 'four_star_reviews',
+        'three_star_reviews', 'two_star_reviews', 'one_star_reviews',
+    ),
+    rating_summary=Computed(
+        _rating_summary, 'total_reviews', 'average_rating', 'positive_reviews_percentage', 'recent_reviews',
+    ),
+)
@@ -0,0 +1,188 @@
+"""
+Планы выполнения «горячих» запросов и советник по индексам.
+
+HOT_QUERYSETS - реестр именованных queryset'ов, которые выполняются
+чаще всего. Для каждого снимается план (EXPLAIN QUERY PLAN в SQLite,
+EXPLAIN в PostgreSQL), в нём ищутся полные сканирования таблиц и
+временные B-деревья для сортировки, а по условиям WHERE и ORDER BY
+предлагается составной индекс.
+
+Снимки планов хранятся в query_plan_snapshots/<vendor>.json; тесты
+падают, если у запроса появилась новая проблема, которой не было в снимке.
+"""
+import json
+import os
+import re
+
+from django.db import connection
+from django.db.models.lookups import Lookup
+from django.db.models.sql.where import WhereNode
+
+from .models import Animal, Booking, Review
+from .views_annotations import get_dogsitter_with_ratings
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'query_plan_snapshots')
+
+EQUALITY_LOOKUPS = {'exact', 'in', 'isnull'}
+RANGE_LOOKUPS = {'gt', 'gte', 'lt', 'lte', 'range', 'year', 'month', 'day'}
+
+HOT_QUERYSETS = {
+    'booking_active': lambda: Booking.objects.active(),
+    'booking_pending': lambda: Booking.objects.pending(),
+    'booking_current': lambda: Booking.objects.current(),
+    'booking_future': lambda: Booking.objects.future(),
+    'booking_completed_by_sitter': lambda: Booking.objects.filter(
+        dog_sitter_id=1, status=Booking.STATUS_COMPLETED
+    ),
+    'reviews_by_dogsitter': lambda: Review.objects.filter(booking__dog_sitter_id=1),
+    'animals_by_type_and_size': lambda: Animal.objects.filter(type=Animal.DOG, size=Animal.SIZE_LARGE),
+    'dogsitter_filter_min_rating': lambda: get_dogsitter_with_ratings().filter(average_rating__gte=4),
+}
+
+
+def explain(queryset):
+    return queryset.explain()
+
+
+def find_problems(plan):
+    """
+    Ищет в плане полные сканирования и временные B-деревья.
+    Возвращает отсортированный список строк вида 'full_scan:<table>'.
+    """
+    problems = set()
+    for line in plan.splitlines():
+        if connection.vendor == 'postgresql':
+            match = re.search(r'Seq Scan on (\w+)', line)
+            if match:
+                problems.add(f'full_scan:{match.group(1)}')
+            if re.search(r'\bSort\b', line) and 'Sort Key' not in line:
+                problems.add('temp_b_tree:ORDER BY')
+            continue
+
+        # SQLite: "SCAN main_booking" без индекса - полное сканирование
+        match = re.search(r'\bSCAN (?:TABLE )?(\w+)', line)
+        if match and 'INDEX' not in line:
+            problems.add(f'full_scan:{match.group(1)}')
+        match = re.search(r'USE TEMP B-TREE FOR (.+)$', line)
+        if match:
+            problems.add(f'temp_b_tree:{match.group(1).strip()}')
+    return sorted(problems)
+
+
+def _collect_lookups(node, query, result):
+    for child in node.children:
+        if isinstance(child, WhereNode):
+            _collect_lookups(child, query, result)
+        elif isinstance(child, Lookup) and hasattr(child.lhs, 'target'):
+            alias = getattr(child.lhs, 'alias', None)
+            table = query.alias_map[alias].table_name if alias in query.alias_map else None
+            result.append((table, child.lhs.target, child.lookup_name))
+
+
+def suggest_index(queryset):
+    """
+    Предлагает составной индекс для основной таблицы запроса:
+    сначала столбцы с условием равенства, затем столбец диапазона,
+    затем столбцы сортировки.
+    """
+    query = queryset.query
+    model = queryset.model
+    table = model._meta.db_table
+
+    lookups = []
+    _collect_lookups(query.where, query, lookups)
+
+    equality, ranges = [], []
+    for lookup_table, field, lookup_name in lookups:
+        if lookup_table != table:
+            continue
+        if lookup_name in EQUALITY_LOOKUPS and field.name not in equality:
+            equality.append(field.name)
+        elif lookup_name in RANGE_LOOKUPS and field.name not in ranges:
+            ranges.append(field.name)
+
+    ordering = []
+    for item in (query.order_by or model._meta.ordering):
+        if not isinstance(item, str):
+            continue
+        name = item.lstrip('-')
+        if '__' not in name and name not in equality and name not in ordering:
+            ordering.append(name)
+
+    # Запрос без условий на основную таблицу управляется соединением - индекс не поможет
+    if not equality and not ranges:
+        return None
+
+    fields = equality + ranges[:1]
+    if not ranges:
+        fields += ordering
+    elif ordering and ordering[0] == ranges[0]:
+        fields += ordering[1:]
+
+    if _is_covered(model, fields, len(equality)):
+        return None
+    return {'model': model.__name__, 'fields': fields}
+
+
+def _is_covered(model, fields, equality_count):
+    """
+    Проверяет, есть ли у модели индекс, начинающийся с тех же столбцов.
+    Порядок столбцов равенства не важен.
+    """
+    candidates = [list(index.fields) for index in model._meta.indexes]
+    # Одиночные индексы ForeignKey и unique создаются автоматически
+    candidates += [[field.name] for field in model._meta.concrete_fields if field.db_index or field.unique]
+
+    for index_fields in candidates:
+        if len(index_fields) < len(fields):
+            continue
+        head, tail = index_fields[:equality_count], index_fields[equality_count:len(fields)]
+        if set(head) == set(fields[:equality_count]) and tail == fields[equality_count:]:
+            return True
+    return False
+
+
+def analyze(name):
+    queryset = HOT_QUERYSETS[name]()
+    plan = explain(queryset)
+    return {
+        'name': name,
+        'plan': plan,
+        'problems': find_problems(plan),
+        'suggested_index': suggest_index(queryset),
+    }
+
+
+def analyze_all():
+    return [analyze(name) for name in HOT_QUERYSETS]
+
+
+def snapshot_path(vendor=None):
+    return os.path.join(SNAPSHOT_DIR, f'{vendor or connection.vendor}.json')
+
+
+def load_snapshots(vendor=None):
+    path = snapshot_path(vendor)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_snapshots(results, vendor=None):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    data = {result['name']: result['problems'] for result in results}
+    with open(snapshot_path(vendor), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def find_regressions(results, snapshots):
+    """Возвращает {имя запроса: [новые проблемы]} относительно снимков"""
+    regressions = {}
+    for result in results:
+        known = set(snapshots.get(result['name'], []))
+        new = [problem for problem in result['problems'] if problem not in known]
+        if new:
+            regressions[result['name']] = new
+    return regressions
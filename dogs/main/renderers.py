@@ -0,0 +1,92 @@
+"""
+Быстрые JSON-рендерер и парсер для DRF.
+
+Если установлен orjson, ответы кодируются и тела запросов разбираются
+им: даты, время и UUID он кодирует сам, кириллица (в том числе строки
+get_*_display) пишется как есть в UTF-8 без экранирования. Decimal,
+timedelta, ленивые строки перевода и QuerySet приводятся так же, как в
+rest_framework.utils.encoders.JSONEncoder, поэтому ответ совпадает с
+ответом стандартного JSONRenderer. Без orjson работают стандартные
+JSONRenderer и JSONParser.
+
+Сравнение скорости обоих вариантов на больших списках - команда
+benchmark_json.
+"""
+import datetime
+import decimal
+import json
+
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    """Типы, которых orjson не знает; как в JSONEncoder DRF"""
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, decimal.Decimal):
+        # Поля сериализаторов уже отдают Decimal строкой (COERCE_DECIMAL_TO_STRING)
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, QuerySet):
+        return tuple(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__getitem__') and hasattr(obj, 'keys'):
+        return dict(obj)
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f"Тип {type(obj).__name__} не сериализуется в JSON")
+
+
+def dumps(data):
+    """Компактный JSON в UTF-8 (bytes) - orjson или стандартный кодировщик DRF"""
+    if orjson is None:
+        return json.dumps(
+            data, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')
+        ).encode()
+    return orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson (если установлен)"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser на orjson (если установлен)"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding') or 'utf-8'
+        try:
+            body = stream.read() if stream is not None else b''
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError(f'JSON parse error - {exc}')
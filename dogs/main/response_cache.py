@@ -0,0 +1,143 @@
+"""
+Кэш ответов для читающих API.
+
+Декоратор cache_response сохраняет ответ GET-запроса в кэше
+settings.RESPONSE_CACHE_ALIAS (Redis, Memcached, таблица в базе или
+файлы - выбирается переменной RESPONSE_CACHE_BACKEND). Ключ строится из
+маршрута, нормализованных параметров запроса и классов разрешений
+представления; декоратор срабатывает уже после проверки разрешений DRF,
+поэтому закэшированный ответ получают только прошедшие ту же проверку.
+
+Инвалидация по тегам: у каждого тега есть версия, которая входит в ключ
+ответа. invalidate_tags увеличивает версии, и старые ответы перестают
+находиться (и истекают по таймауту). Такой способ одинаково работает на
+всех бэкендах, без перебора ключей. Теги сбрасываются сигналами
+(main.signals) при записи связанных моделей.
+
+Версии тегов должны видеть все процессы, поэтому на кэше в памяти
+процесса (LocMemCache) и на DummyCache декоратор ничего не кэширует.
+Версии хранятся без таймаута, но бэкенд может вытеснить их при
+переполнении; пропавшая версия заводится заново не с 1, а с текущего
+времени в наносекундах, так что вытеснение не возвращает старые ответы.
+"""
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+TAG_KEY = 'response_tag:{}'
+RESPONSE_KEY = 'response:{}'
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def enabled():
+    """Кэш ответов включён только на бэкенде, общем для всех процессов"""
+    return not isinstance(_cache(), (DummyCache, LocMemCache))
+
+
+def _new_version():
+    # Больше любой выданной ранее версии, даже если прежняя была вытеснена
+    return time.time_ns()
+
+
+def _tag_versions(tags):
+    cache = _cache()
+    keys = [TAG_KEY.format(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # Без таймаута: версия тега не должна пропасть раньше ответов.
+        # add не перезаписывает версию, заведённую параллельно другим процессом
+        for key in missing:
+            cache.add(key, _new_version(), None)
+        versions.update(cache.get_many(missing))
+    return [versions[key] if key in versions else _new_version() for key in keys]
+
+
+def invalidate_tags(*tags):
+    """Сбрасывает закэшированные ответы с указанными тегами после фиксации транзакции"""
+    if not enabled():
+        return
+
+    def bump():
+        cache = _cache()
+        for tag in tags:
+            key = TAG_KEY.format(tag)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, _new_version(), None)
+    transaction.on_commit(bump)
+
+
+def _permission_names(view, request):
+    if view is None and isinstance(request, Request):
+        view = request.parser_context.get('view')
+    if view is None:
+        return 'public'
+    return ','.join(type(permission).__name__ for permission in view.get_permissions())
+
+
+def make_key(request, tags, view=None):
+    params = sorted((name, sorted(values)) for name, values in request.GET.lists())
+    versions = _tag_versions(tags)
+    parts = [
+        request.get_host(),
+        request.path,
+        urlencode(params, doseq=True),
+        _permission_names(view, request),
+        ','.join(f'{tag}:{version}' for tag, version in zip(tags, versions)),
+    ]
+    return RESPONSE_KEY.format(hashlib.md5('|'.join(parts).encode()).hexdigest())
+
+
+def _split_args(args):
+    """(представление или None, запрос) для функции или метода представления"""
+    if isinstance(args[0], (HttpRequest, Request)):
+        return None, args[0]
+    return args[0], args[1]
+
+
+def cache_response(*tags, timeout=None):
+    """
+    Кэширует успешные ответы GET-запросов представления.
+    Подходит для функций-представлений и методов ViewSet'ов (list, retrieve, action).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            view, request = _split_args(args)
+            if request.method != 'GET' or not enabled():
+                return view_func(*args, **kwargs)
+
+            cache = _cache()
+            key = make_key(request, tags, view)
+            cached = cache.get(key)
+            if cached is not None:
+                kind, payload, status, content_type = cached
+                if kind == 'data':
+                    return Response(payload, status=status)
+                return HttpResponse(payload, status=status, content_type=content_type)
+
+            response = view_func(*args, **kwargs)
+            if response.status_code == 200:
+                if isinstance(response, Response):
+                    entry = ('data', response.data, response.status_code, None)
+                else:
+                    entry = ('content', response.content, response.status_code, response['Content-Type'])
+                cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT if timeout is None else timeout)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,195 @@
+"""
+Повторяющиеся бронирования (BookingSchedule).
+
+Правило расписания разворачивается в даты через dateutil.rrule лениво:
+occurrence_dates перебирает вхождения только до конца запрошенного
+диапазона, поэтому расписание без даты окончания не превращается в
+бесконечный список.
+
+Настоящие бронирования создаются только на ближайшие
+SCHEDULE_HORIZON_DAYS дней: при создании расписания и командой
+materialize_schedules, которую запускают по расписанию (например, раз в
+сутки) - горизонт сдвигается вместе с ней. Вхождения проверяются на
+пересечения, оцениваются и вставляются так же, как элементы массового
+создания (main.bulk_bookings); пересекающиеся с другими бронированиями
+тех же животных пропускаются с записью в журнал. materialized_until
+запоминает, по какую дату вхождения уже обработаны, поэтому повторный
+запуск их не создаёт; уникальность (schedule, start_date) защищает от
+дубликатов. Расписания обрабатываются пачками по SCHEDULE_BATCH_SIZE, на
+PostgreSQL - с SELECT ... FOR UPDATE SKIP LOCKED, так что параллельные
+запуски не мешают друг другу.
+
+calendar объединяет бронирования из базы с ещё не созданными
+вхождениями (после materialized_until): таблица бронирований не растёт
+на месяцы вперёд, а календарь владельца и занятость догситтера видят
+расписание целиком.
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from dateutil import rrule
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .bulk_bookings import find_overlaps, insert_bookings
+from .models import BookingSchedule
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIES = {
+    BookingSchedule.FREQ_DAILY: rrule.DAILY,
+    BookingSchedule.FREQ_WEEKLY: rrule.WEEKLY,
+    BookingSchedule.FREQ_MONTHLY: rrule.MONTHLY,
+}
+
+# Статус ещё не созданного вхождения в календаре
+STATUS_SCHEDULED = 'scheduled'
+
+
+def rule(schedule):
+    """Правило повторения расписания (dateutil.rrule)"""
+    return rrule.rrule(
+        FREQUENCIES[schedule.frequency],
+        dtstart=datetime.combine(schedule.start_date, time()),
+        interval=schedule.interval,
+        byweekday=schedule.weekdays or None,
+        until=datetime.combine(schedule.until, time()) if schedule.until else None,
+    )
+
+
+def occurrence_dates(schedule, start, end):
+    """Даты начала вхождений в [start, end]; вычисляются по мере перебора"""
+    for moment in rule(schedule).xafter(datetime.combine(start, time()), inc=True):
+        if moment.date() > end:
+            return
+        yield moment.date()
+
+
+def pending_occurrences(schedule, start, end):
+    """Ещё не созданные вхождения, пересекающиеся с [start, end]: (начало, окончание)"""
+    if not schedule.is_active:
+        return
+    duration = timedelta(days=schedule.duration_days)
+    first = start - duration + timedelta(days=1)
+    if schedule.materialized_until:
+        first = max(first, schedule.materialized_until + timedelta(days=1))
+    for day in occurrence_dates(schedule, first, end):
+        yield day, day + duration
+
+
+def calendar(bookings, schedules, start, end):
+    """
+    Бронирования и ещё не созданные вхождения расписаний, пересекающиеся
+    с [start, end], по дате начала. bookings и schedules - уже отфильтрованные
+    по правам доступа QuerySet'ы
+    """
+    entries = [
+        {
+            'booking': booking_id,
+            'schedule': schedule_id,
+            'dog_sitter': dog_sitter_id,
+            'start_date': start_date,
+            'end_date': end_date,
+            'status': status,
+        }
+        for booking_id, schedule_id, dog_sitter_id, start_date, end_date, status in bookings.filter(
+            start_date__lte=end, end_date__gt=start,
+        ).values_list('id', 'schedule_id', 'dog_sitter_id', 'start_date', 'end_date', 'status')
+    ]
+    for schedule in schedules.filter(is_active=True, start_date__lte=end):
+        entries.extend(
+            {
+                'booking': None,
+                'schedule': schedule.pk,
+                'dog_sitter': schedule.dog_sitter_id,
+                'start_date': occurrence_start,
+                'end_date': occurrence_end,
+                'status': STATUS_SCHEDULED,
+            }
+            for occurrence_start, occurrence_end in pending_occurrences(schedule, start, end)
+        )
+    entries.sort(key=lambda entry: (entry['start_date'], entry['booking'] is None))
+    return entries
+
+
+def _items(schedule, first, horizon, sizes, prices):
+    """Элементы для insert_bookings по вхождениям расписания в [first, horizon]"""
+    animals = [animal.pk for animal in schedule.animals.all()]
+    if not animals:
+        return []
+    services = [service.pk for service in schedule.services.all()]
+    sizes.update((animal.pk, animal.size) for animal in schedule.animals.all())
+    prices.update((service.pk, service.price) for service in schedule.services.all())
+    duration = timedelta(days=schedule.duration_days)
+    return [
+        {
+            'user_id': schedule.user_id,
+            'schedule_id': schedule.pk,
+            'dog_sitter': schedule.dog_sitter_id,
+            'start_date': day,
+            'end_date': day + duration,
+            'animals': animals,
+            'services': services,
+        }
+        for day in occurrence_dates(schedule, first, horizon)
+    ]
+
+
+def due_schedules(horizon):
+    """Активные расписания, вхождения которых созданы не по horizon"""
+    return BookingSchedule.objects.filter(is_active=True).filter(
+        Q(materialized_until__isnull=True) | Q(materialized_until__lt=horizon)
+    )
+
+
+def materialize_batch(schedules, today, horizon):
+    """
+    Создаёт бронирования по вхождениям пачки расписаний с датой начала до horizon.
+    Возвращает (создано, пропущено из-за пересечений)
+    """
+    sizes, prices, items = {}, {}, []
+    for schedule in schedules:
+        first = max(today, schedule.start_date)
+        if schedule.materialized_until:
+            first = max(first, schedule.materialized_until + timedelta(days=1))
+        items += _items(schedule, first, horizon, sizes, prices)
+        schedule.materialized_until = horizon
+
+    overlaps = find_overlaps(items) if items else {}
+    for index, animal_id in overlaps.items():
+        logger.warning(
+            "Вхождение расписания %s на %s пропущено: у животного %s пересекающееся бронирование",
+            items[index]['schedule_id'], items[index]['start_date'], animal_id,
+        )
+    created = insert_bookings([item for index, item in enumerate(items) if index not in overlaps], sizes, prices)
+    BookingSchedule.objects.bulk_update(schedules, ['materialized_until'])
+    return len(created), len(overlaps)
+
+
+def materialize(schedules=None, today=None, batch_size=None):
+    """
+    Создаёт бронирования по расписаниям на SCHEDULE_HORIZON_DAYS дней вперёд.
+    schedules - QuerySet расписаний (по умолчанию все). Возвращает (создано, пропущено)
+    """
+    today = today or timezone.now().date()
+    horizon = today + timedelta(days=settings.SCHEDULE_HORIZON_DAYS)
+    batch_size = batch_size or settings.SCHEDULE_BATCH_SIZE
+    queryset = due_schedules(horizon)
+    if schedules is not None:
+        queryset = queryset.filter(pk__in=schedules.values('pk'))
+    created = skipped = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = queryset.filter(id__gt=last_id).order_by('id')
+            if connection.features.has_select_for_update_skip_locked:
+                batch = batch.select_for_update(skip_locked=True)
+            batch = list(batch.prefetch_related('animals', 'services')[:batch_size])
+            if not batch:
+                return created, skipped
+            batch_created, batch_skipped = materialize_batch(batch, today, horizon)
+        created += batch_created
+        skipped += batch_skipped
+        last_id = batch[-1].pk
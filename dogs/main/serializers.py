@@ -1,10 +1,12 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import User, DogSitter, Booking, Animal, Service, Review
+from .models import User, DogSitter, Booking, BookingSchedule, Animal, Service, Review
 from django.db.models import Count, Avg
 from django.utils import timezone
+from .fieldsets import SparseFieldsMixin
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 'is_superuser')
@@ -19,7 +21,12 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ('id', 'text', 'rating', 'user', 'created_at')
         read_only_fields = ('id', 'user', 'created_at')
 
-class DogSitterSerializer(serializers.ModelSerializer):
+class ReviewSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Review
+        fields = ('id', 'booking', 'rating', 'comment', 'date', 'is_verified', 'updated_at')
+
+class DogSitterSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Добавляем поля пользователя
     first_name = serializers.CharField(source='user.first_name')
     last_name = serializers.CharField(source='user.last_name')
@@ -50,6 +57,25 @@ class DogSitterSerializer(serializers.ModelSerializer):
             'positive_reviews_percentage', 'recent_reviews',
             'rating_distribution', 'rating_summary'
         ]
+        # Аннотации get_dogsitter_with_ratings, из которых считаются поля
+        annotated_fields = {
+            'average_rating': ('average_rating',),
+            'total_reviews': ('total_reviews',),
+            'five_star_reviews': ('five_star_reviews',),
+            'four_star_reviews': ('four_star_reviews',),
+            'three_star_reviews': ('three_star_reviews',),
+            'two_star_reviews': ('two_star_reviews',),
+            'one_star_reviews': ('one_star_reviews',),
+            'positive_reviews_percentage': ('positive_reviews_percentage',),
+            'recent_reviews': ('recent_reviews',),
+            'rating_distribution': (
+                'total_reviews', 'five_star_reviews', 'four_star_reviews',
+                'three_star_reviews', 'two_star_reviews', 'one_star_reviews',
+            ),
+            'rating_summary': ('total_reviews', 'average_rating', 'positive_reviews_percentage', 'recent_reviews'),
+        }
+        related_fields = {'first_name': 'user', 'last_name': 'user'}
+        expandable_fields = {'user': (UserSerializer, {})}
 
     def get_rating_distribution(self, obj):
         """
@@ -78,7 +104,7 @@ class DogSitterSerializer(serializers.ModelSerializer):
             'recent_month': obj.recent_reviews
         }
 
-class AnimalSerializer(serializers.ModelSerializer):
+class AnimalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     booking_count = serializers.SerializerMethodField()
     last_booking_date = serializers.SerializerMethodField()
     is_available_for_booking = serializers.SerializerMethodField()
@@ -131,12 +157,12 @@ class AnimalSerializer(serializers.ModelSerializer):
             }
         return None
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Service
         fields = ['id', 'name', 'description', 'price']
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Поля из аннотаций
     booking_rating = serializers.IntegerField(read_only=True)
     has_review = serializers.BooleanField(read_only=True)
@@ -157,6 +183,21 @@ class BookingSerializer(serializers.ModelSerializer):
             'review_length', 'review_date', 'is_review_verified',
             'days_until_review', 'review_status', 'review_summary'
         ]
+        # Аннотации get_bookings_with_ratings, из которых считаются поля
+        annotated_fields = {
+            'booking_rating': ('booking_rating',),
+            'has_review': ('has_review',),
+            'review_length': ('review_length',),
+            'review_date': ('review_date',),
+            'is_review_verified': ('is_review_verified',),
+            'days_until_review': ('days_until_review',),
+            'review_status': ('has_review', 'is_review_verified'),
+            'review_summary': ('has_review', 'booking_rating', 'review_length', 'days_until_review', 'is_review_verified'),
+        }
+        expandable_fields = {
+            'user': (UserSerializer, {}),
+            'dog_sitter': (DogSitterSerializer, {'fields': ('id', 'first_name', 'last_name', 'experience_years')}),
+        }
 
     def get_review_status(self, obj):
         """
@@ -180,4 +221,84 @@ class BookingSerializer(serializers.ModelSerializer):
             'length': obj.review_length,
             'days_after_booking': obj.days_until_review.days if obj.days_until_review else None,
             'verified': obj.is_review_verified
-        } 
\ No newline at end of file
+        } 
+
+class BookingHistorySerializer(serializers.ModelSerializer):
+    """Бронирование из Booking.objects.with_history() (живое или архивное)"""
+    archived_at = serializers.DateTimeField(read_only=True)
+    is_archived = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Booking
+        fields = [
+            'id', 'user', 'dog_sitter', 'start_date', 'end_date',
+            'status', 'total_price', 'archived_at', 'is_archived'
+        ]
+
+    def get_is_archived(self, obj):
+        return obj.archived_at is not None
+
+
+class BulkBookingItemSerializer(serializers.Serializer):
+    """Элемент массового создания бронирований (main.bulk_bookings)"""
+    dog_sitter = serializers.IntegerField()
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    animals = serializers.ListField(child=serializers.IntegerField(), min_length=1)
+    services = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, attrs):
+        if attrs['start_date'] < timezone.now().date():
+            raise serializers.ValidationError({'start_date': "Дата начала бронирования не может быть в прошлом."})
+        if attrs['end_date'] <= attrs['start_date']:
+            raise serializers.ValidationError({'end_date': "Дата окончания бронирования должна быть позже даты начала."})
+        return attrs
+
+
+class BulkBookingSerializer(serializers.Serializer):
+    bookings = BulkBookingItemSerializer(many=True, allow_empty=False)
+
+    def validate_bookings(self, value):
+        limit = settings.BULK_BOOKINGS_MAX
+        if len(value) > limit:
+            raise serializers.ValidationError(f"Не больше {limit} бронирований за запрос")
+        return value
+
+
+class BookingScheduleSerializer(serializers.ModelSerializer):
+    """Расписание повторяющихся бронирований (main.schedules)"""
+    animals = serializers.PrimaryKeyRelatedField(many=True, queryset=Animal.objects.all())
+    services = serializers.PrimaryKeyRelatedField(many=True, queryset=Service.objects.all(), required=False)
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), required=False, max_length=7
+    )
+
+    class Meta:
+        model = BookingSchedule
+        fields = [
+            'id', 'dog_sitter', 'animals', 'services', 'frequency', 'interval', 'weekdays',
+            'duration_days', 'start_date', 'until', 'is_active', 'materialized_until',
+        ]
+        read_only_fields = ['materialized_until']
+        extra_kwargs = {
+            'interval': {'min_value': 1},
+            'duration_days': {'min_value': 1},
+        }
+
+    def validate_animals(self, value):
+        request = self.context.get('request')
+        if not value:
+            raise serializers.ValidationError("Нужно хотя бы одно животное")
+        if request and any(animal.user_id != request.user.pk for animal in value):
+            raise serializers.ValidationError("Можно добавлять только своих животных")
+        return value
+
+    def validate_weekdays(self, value):
+        return sorted(set(value))
+
+    def validate(self, attrs):
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        until = attrs.get('until', getattr(self.instance, 'until', None))
+        if until and start_date and until < start_date:
+            raise serializers.ValidationError({'until': "Дата окончания повторений раньше даты начала."})
+        return attrs
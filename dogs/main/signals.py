@@ -0,0 +1,295 @@
+"""
+Сигналы приложения main.
+
+bookings_completed отправляется пачкой после того, как массовый переход
+(main.booking_status.complete_finished_bookings) перевёл бронирования в
+статус completed. Получатели пересчитывают агрегаты только для
+затронутых догситтеров и должны быть идемпотентными: при конкурентных
+запусках одна и та же пачка может прийти дважды.
+
+Завершение, отмена и удаление бронирования записываются в журнал
+заработка (main.earnings), любая запись бронирования пересчитывает затронутые
+ячейки куба помесячной статистики (main.booking_cube) и сбрасывает
+кэш статистики догситтера (main.sitter_stats). bookings_changed
+отправляют массовые изменения в обход save() (действия админки).
+Создание, удаление и смена статуса или типа записей поддерживают
+счётчики main.counters, любая запись сбрасывает закэшированные ответы
+API с соответствующими тегами (main.response_cache). Удаление
+бронирований, животных и отзывов оставляет отметку для синхронизации
+(main.sync), запись отзыва, животных и услуг в бронировании и удаление
+расписания сдвигают updated_at связанных записей. Смена статуса бронирования записывает событие для потока
+SSE (main.events).
+
+Запись и удаление отзыва публикуют событие в outbox (main.outbox) в той
+же транзакции; рейтинг догситтера пересчитывает обработчик события при
+доставке сразу после фиксации, а при сбое - командой dispatch_outbox.
+"""
+import logging
+
+from django.db.models import Count, Sum
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import booking_cube, counters, sitter_stats
+from .earnings import reverse_bookings, sync_bookings
+from .models import (
+    Animal, ArchivedReview, Booking, BookingAnimal, BookingSchedule, DogSitter, Review, Service, User,
+)
+from .response_cache import invalidate_tags
+from .sync import tombstone_for, touch
+from . import outbox
+from .events import BOOKING_REFUND_REQUESTED, REVIEW_DELETED, REVIEW_SAVED, record_status_changes
+
+logger = logging.getLogger(__name__)
+
+# Аргументы: booking_ids, dog_sitter_ids
+bookings_completed = Signal()
+# Аргументы: booking_ids
+bookings_changed = Signal()
+
+
+def recalculate_sitter_ratings(dog_sitter_ids):
+    """
+    Пересчитывает рейтинг догситтеров: среднее по отзывам о завершённых
+    бронированиях (живых и архивных), округлённое до десятых
+    """
+    totals = {sitter_id: [0, 0] for sitter_id in dog_sitter_ids}
+    for model in (Review, ArchivedReview):
+        rows = model.objects.filter(
+            booking__dog_sitter_id__in=dog_sitter_ids, booking__status=Booking.STATUS_COMPLETED,
+        ).values('booking__dog_sitter_id').annotate(total=Sum('rating'), count=Count('id')).order_by()
+        for row in rows:
+            totals[row['booking__dog_sitter_id']][0] += row['total']
+            totals[row['booking__dog_sitter_id']][1] += row['count']
+
+    sitters = list(DogSitter.objects.filter(id__in=dog_sitter_ids).only('id', 'rating'))
+    for sitter in sitters:
+        total, count = totals[sitter.id]
+        sitter.rating = round(total / count, 1) if count else 0.0
+    DogSitter.objects.bulk_update(sitters, ['rating'])
+
+
+@receiver(bookings_completed, dispatch_uid='main.refresh_sitter_ratings')
+def refresh_sitter_ratings(sender, dog_sitter_ids, **kwargs):
+    recalculate_sitter_ratings(dog_sitter_ids)
+
+
+@receiver(bookings_completed, dispatch_uid='main.record_completed_earnings')
+def record_completed_earnings(sender, booking_ids, **kwargs):
+    sync_bookings(booking_ids)
+
+
+@receiver(post_save, sender=Booking, dispatch_uid='main.record_booking_earnings')
+def record_booking_earnings(sender, instance, **kwargs):
+    if instance.status in (Booking.STATUS_COMPLETED, Booking.STATUS_CANCELLED):
+        sync_bookings([instance.pk])
+
+
+@receiver(post_delete, sender=Booking, dispatch_uid='main.reverse_deleted_booking_earnings')
+def reverse_deleted_booking_earnings(sender, instance, **kwargs):
+    reverse_bookings([instance.pk])
+
+
+def refresh_booking_aggregates(booking_ids):
+    """Пересчитывает ячейки куба и сбрасывает статистику догситтеров по бронированиям"""
+    keys = booking_cube.refresh_bookings(booking_ids)
+    sitter_stats.invalidate(sitter_id for _, sitter_id, _ in keys)
+
+
+@receiver(bookings_completed, dispatch_uid='main.refresh_completed_month_stats')
+@receiver(bookings_changed, dispatch_uid='main.refresh_changed_month_stats')
+def refresh_changed_booking_aggregates(sender, booking_ids, **kwargs):
+    refresh_booking_aggregates(booking_ids)
+    invalidate_tags(*RESPONSE_TAGS[Booking])
+
+
+def _loaded_cube_key(instance):
+    # Через __dict__, чтобы не загружать отложенные поля
+    values = instance.__dict__
+    if values.get('start_date') is None:
+        return None
+    return (booking_cube.month_start(values['start_date']), values.get('dog_sitter_id'), values.get('user_id'))
+
+
+@receiver(post_init, sender=Booking, dispatch_uid='main.remember_booking_cube_key')
+def remember_booking_cube_key(sender, instance, **kwargs):
+    instance._cube_key = _loaded_cube_key(instance)
+
+
+@receiver(post_save, sender=Booking, dispatch_uid='main.refresh_booking_month_stats')
+def refresh_booking_month_stats(sender, instance, **kwargs):
+    key = booking_cube.booking_key(instance)
+    keys = {key, instance._cube_key} - {None}
+    booking_cube.schedule_refresh(keys)
+    sitter_stats.invalidate(sitter_id for _, sitter_id, _ in keys)
+    instance._cube_key = key
+
+
+@receiver(post_delete, sender=Booking, dispatch_uid='main.refresh_deleted_booking_month_stats')
+def refresh_deleted_booking_month_stats(sender, instance, **kwargs):
+    booking_cube.schedule_refresh({booking_cube.booking_key(instance)})
+    sitter_stats.invalidate([instance.dog_sitter_id])
+
+
+@receiver(post_save, sender=BookingAnimal, dispatch_uid='main.refresh_booking_animal_month_stats')
+@receiver(post_delete, sender=BookingAnimal, dispatch_uid='main.refresh_booking_animal_month_stats_delete')
+def refresh_booking_animal_month_stats(sender, instance, **kwargs):
+    refresh_booking_aggregates([instance.booking_id])
+
+
+@receiver(m2m_changed, sender=Booking.animals.through, dispatch_uid='main.refresh_animals_month_stats')
+@receiver(m2m_changed, sender=Booking.services.through, dispatch_uid='main.refresh_services_month_stats')
+def refresh_m2m_month_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh_booking_aggregates([instance.pk])
+    elif pk_set:
+        refresh_booking_aggregates(pk_set)
+
+
+@receiver(post_save, sender=Review, dispatch_uid='main.invalidate_review_sitter_stats')
+@receiver(post_delete, sender=Review, dispatch_uid='main.invalidate_deleted_review_sitter_stats')
+def invalidate_review_sitter_stats(sender, instance, **kwargs):
+    sitter_stats.invalidate(
+        Booking.objects.filter(pk=instance.booking_id).values_list('dog_sitter_id', flat=True)
+    )
+
+
+def _remember_counter_value(sender, instance, **kwargs):
+    _, field = counters.TRACKED[sender]
+    # Через __dict__, чтобы не загружать отложенные поля
+    instance._counter_value = instance.__dict__.get(field)
+
+
+def _count_saved(sender, instance, created, **kwargs):
+    _, field = counters.TRACKED[sender]
+    value = getattr(instance, field) if field else None
+    if created:
+        counters.record_created(sender, value)
+    elif field and instance._counter_value is not None:
+        counters.record_changed(sender, instance._counter_value, value)
+    if field:
+        instance._counter_value = value
+
+
+def _count_deleted(sender, instance, **kwargs):
+    _, field = counters.TRACKED[sender]
+    counters.record_deleted(sender, getattr(instance, '_counter_value', None) if field else None)
+
+
+for _model, (_prefix, _field) in counters.TRACKED.items():
+    if _field:
+        post_init.connect(_remember_counter_value, sender=_model, dispatch_uid=f'main.remember_{_prefix}_counter')
+    post_save.connect(_count_saved, sender=_model, dispatch_uid=f'main.count_saved_{_prefix}')
+    post_delete.connect(_count_deleted, sender=_model, dispatch_uid=f'main.count_deleted_{_prefix}')
+
+
+# Теги закэшированных ответов API, которые зависят от модели
+RESPONSE_TAGS = {
+    Service: ('services',),
+    DogSitter: ('dogsitters', 'statistics'),
+    Review: ('dogsitters', 'statistics'),
+    Booking: ('dogsitters', 'statistics'),
+    Animal: ('animals', 'statistics'),
+    User: ('dogsitters', 'animals', 'statistics'),
+}
+
+
+def _invalidate_responses(sender, **kwargs):
+    invalidate_tags(*RESPONSE_TAGS[sender])
+
+
+for _model in RESPONSE_TAGS:
+    post_save.connect(_invalidate_responses, sender=_model, dispatch_uid=f'main.invalidate_responses_{_model._meta.model_name}')
+    post_delete.connect(_invalidate_responses, sender=_model, dispatch_uid=f'main.invalidate_responses_deleted_{_model._meta.model_name}')
+
+
+@receiver(post_delete, sender=Booking, dispatch_uid='main.tombstone_booking')
+@receiver(post_delete, sender=Animal, dispatch_uid='main.tombstone_animal')
+@receiver(post_delete, sender=Review, dispatch_uid='main.tombstone_review')
+def record_sync_tombstone(sender, instance, **kwargs):
+    tombstone_for(instance).save()
+
+
+@receiver(post_save, sender=Review, dispatch_uid='main.touch_reviewed_booking')
+@receiver(post_delete, sender=Review, dispatch_uid='main.touch_unreviewed_booking')
+def touch_reviewed_booking(sender, instance, **kwargs):
+    touch(Booking, [instance.booking_id])
+
+
+@receiver(post_save, sender=BookingAnimal, dispatch_uid='main.touch_booking_animal')
+@receiver(post_delete, sender=BookingAnimal, dispatch_uid='main.touch_deleted_booking_animal')
+def touch_booking_animal(sender, instance, **kwargs):
+    touch(Booking, [instance.booking_id])
+    touch(Animal, [instance.animal_id])
+
+
+@receiver(m2m_changed, sender=Booking.animals.through, dispatch_uid='main.touch_animals_links')
+@receiver(m2m_changed, sender=Booking.services.through, dispatch_uid='main.touch_services_links')
+def touch_m2m_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    animals = sender is Booking.animals.through
+    if action == 'pre_clear':
+        # После очистки связи уже не найти
+        related = instance.bookings if reverse else getattr(instance, 'animals' if animals else 'services')
+        pk_set = set(related.values_list('pk', flat=True))
+    booking_ids, animal_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    touch(Booking, booking_ids)
+    if animals:
+        touch(Animal, animal_ids)
+
+
+@receiver(pre_delete, sender=BookingSchedule, dispatch_uid='main.touch_unscheduled_bookings')
+def touch_unscheduled_bookings(sender, instance, **kwargs):
+    # Booking.schedule обнуляется одним UPDATE без save(), поэтому сдвигаем до удаления
+    touch(Booking, instance.bookings.values_list('pk', flat=True))
+
+
+@receiver(post_init, sender=Booking, dispatch_uid='main.remember_booking_status')
+def remember_booking_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Booking, dispatch_uid='main.record_booking_status_event')
+def record_booking_status_event(sender, instance, created, **kwargs):
+    if created or instance.status != instance._loaded_status:
+        record_status_changes({instance.pk: None if created else instance._loaded_status}, instance.status)
+    instance._loaded_status = instance.status
+
+
+def _review_payload(instance):
+    return {
+        'review_id': instance.pk,
+        'booking_id': instance.booking_id,
+        'dog_sitter_id': Booking.objects.filter(pk=instance.booking_id).values_list('dog_sitter_id', flat=True).first(),
+        'rating': instance.rating,
+    }
+
+
+@receiver(post_save, sender=Review, dispatch_uid='main.publish_review_saved')
+def publish_review_saved(sender, instance, **kwargs):
+    outbox.dispatch_on_commit([outbox.publish(REVIEW_SAVED, _review_payload(instance))])
+
+
+@receiver(post_delete, sender=Review, dispatch_uid='main.publish_review_deleted')
+def publish_review_deleted(sender, instance, **kwargs):
+    outbox.dispatch_on_commit([outbox.publish(REVIEW_DELETED, _review_payload(instance))])
+
+
+@outbox.handler(REVIEW_SAVED)
+@outbox.handler(REVIEW_DELETED)
+def update_reviewed_sitter_ratings(events):
+    dog_sitter_ids = {event.payload['dog_sitter_id'] for event in events} - {None}
+    if dog_sitter_ids:
+        recalculate_sitter_ratings(dog_sitter_ids)
+        sitter_stats.invalidate(dog_sitter_ids)
+        invalidate_tags(*RESPONSE_TAGS[DogSitter])
+
+
+@outbox.handler(BOOKING_REFUND_REQUESTED)
+def request_refunds(events):
+    # Платёжной интеграции пока нет: заявки только фиксируются в журнале
+    for event in events:
+        logger.info("Возврат оплаты по бронированию %s: %s", event.payload['booking_id'], event.payload['amount'])
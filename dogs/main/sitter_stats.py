@@ -0,0 +1,199 @@
+"""
+Статистика догситтера за два запроса.
+
+SitterStatistics собирается одним запросом по бронированиям (условная
+агрегация по статусам, длительности и отзывам; отзыв связан с
+бронированием один к одному, поэтому строки не размножаются) и одним
+запросом по животным в
+бронированиях. get_statistics_bulk считает то же для многих догситтеров
+сразу - для PDF-отчётов. Все показатели, включая заработок, считаются
+по живым бронированиям: журнал main.earnings учитывает и архивные, и
+заработок из него не сходился бы с числом бронирований.
+
+Результат кэшируется по догситтеру в кэше SITTER_STATS_CACHE_ALIAS;
+сигналы (main.signals) сбрасывают кэш после фиксации записи бронирований,
+животных в бронированиях и отзывов. Сброс должны видеть все процессы,
+поэтому на кэше в памяти процесса (LocMemCache) статистика не кэшируется.
+SITTER_STATS_CACHE_TTL ограничивает срок жизни на случай изменений в
+обход сигналов. Кэшируется только прочитанное из основной базы: реплика
+может отставать, и её результат пережил бы сброс кэша после записи.
+"""
+from dataclasses import dataclass, asdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum
+
+from .db_router import current_read_alias
+from .models import Animal, Booking, BookingAnimal
+
+CACHE_KEY = 'sitter_stats:{}'
+
+BOOKING_FIELDS = (
+    'total_bookings', 'completed_bookings', 'cancelled_bookings',
+    'total_earnings', 'avg_booking_price', 'avg_booking_duration',
+)
+ANIMAL_FIELDS = (
+    'total_animals', 'dogs_count', 'cats_count',
+    'small_animals', 'medium_animals', 'large_animals',
+)
+REVIEW_FIELDS = (
+    'total_reviews', 'avg_rating', 'five_star_reviews', 'four_star_reviews',
+    'three_star_reviews', 'two_star_reviews', 'one_star_reviews',
+)
+
+
+@dataclass(frozen=True)
+class SitterStatistics:
+    total_bookings: int = 0
+    completed_bookings: int = 0
+    cancelled_bookings: int = 0
+    total_earnings: float = 0.0
+    avg_booking_price: float = 0.0
+    avg_booking_duration: int = 0  # дней
+
+    total_animals: int = 0
+    dogs_count: int = 0
+    cats_count: int = 0
+    small_animals: int = 0
+    medium_animals: int = 0
+    large_animals: int = 0
+
+    total_reviews: int = 0
+    avg_rating: float = 0.0
+    five_star_reviews: int = 0
+    four_star_reviews: int = 0
+    three_star_reviews: int = 0
+    two_star_reviews: int = 0
+    one_star_reviews: int = 0
+
+    def _section(self, names):
+        return {name: getattr(self, name) for name in names}
+
+    # Разделы в формате прежнего DogSitter.get_statistics (шаблоны, PDF)
+    @property
+    def bookings_stats(self):
+        return self._section(BOOKING_FIELDS)
+
+    @property
+    def animals_stats(self):
+        return self._section(ANIMAL_FIELDS)
+
+    @property
+    def reviews_stats(self):
+        return self._section(REVIEW_FIELDS)
+
+    def as_dict(self):
+        return {
+            'bookings_stats': self.bookings_stats,
+            'animals_stats': self.animals_stats,
+            'reviews_stats': self.reviews_stats,
+        }
+
+
+def _cache():
+    """Общий для процессов кэш статистики или None, если такого нет"""
+    cache = caches[settings.SITTER_STATS_CACHE_ALIAS]
+    return None if isinstance(cache, (DummyCache, LocMemCache)) else cache
+
+
+def _booking_rows(sitter_ids):
+    duration = ExpressionWrapper(F('end_date') - F('start_date'), output_field=DurationField())
+    return Booking.objects.filter(dog_sitter_id__in=sitter_ids).order_by().values('dog_sitter_id').annotate(
+        total_bookings=Count('id'),
+        completed_bookings=Count('id', filter=Q(status=Booking.STATUS_COMPLETED)),
+        cancelled_bookings=Count('id', filter=Q(status=Booking.STATUS_CANCELLED)),
+        total_earnings=Sum('total_price', filter=Q(status=Booking.STATUS_COMPLETED)),
+        avg_booking_price=Avg('total_price'),
+        avg_booking_duration=Avg(duration),
+        total_reviews=Count('review'),
+        avg_rating=Avg('review__rating'),
+        five_star_reviews=Count('review', filter=Q(review__rating=5)),
+        four_star_reviews=Count('review', filter=Q(review__rating=4)),
+        three_star_reviews=Count('review', filter=Q(review__rating=3)),
+        two_star_reviews=Count('review', filter=Q(review__rating=2)),
+        one_star_reviews=Count('review', filter=Q(review__rating=1)),
+    )
+
+
+def _animal_rows(sitter_ids):
+    def distinct_animals(**conditions):
+        condition = Q(**{f'animal__{name}': value for name, value in conditions.items()}) if conditions else None
+        return Count('animal', filter=condition, distinct=True)
+
+    return BookingAnimal.objects.filter(booking__dog_sitter_id__in=sitter_ids).order_by().values(
+        'booking__dog_sitter_id'
+    ).annotate(
+        total_animals=distinct_animals(),
+        dogs_count=distinct_animals(type=Animal.DOG),
+        cats_count=distinct_animals(type=Animal.CAT),
+        small_animals=distinct_animals(size=Animal.SIZE_SMALL),
+        medium_animals=distinct_animals(size=Animal.SIZE_MEDIUM),
+        large_animals=distinct_animals(size=Animal.SIZE_LARGE),
+    )
+
+
+def _normalize(values):
+    duration = values.get('avg_booking_duration')
+    if duration is not None:
+        values['avg_booking_duration'] = duration.days
+    for name in ('total_earnings', 'avg_booking_price', 'avg_rating'):
+        if values.get(name) is not None:
+            values[name] = float(values[name])
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def compute_statistics(sitter_ids):
+    """Считает статистику для догситтеров без кэша: {id: SitterStatistics}"""
+    sitter_ids = list(sitter_ids)
+    values = {sitter_id: {} for sitter_id in sitter_ids}
+    for row in _booking_rows(sitter_ids):
+        values[row.pop('dog_sitter_id')].update(row)
+    for row in _animal_rows(sitter_ids):
+        values[row.pop('booking__dog_sitter_id')].update(row)
+    return {sitter_id: SitterStatistics(**_normalize(data)) for sitter_id, data in values.items()}
+
+
+def get_statistics_bulk(dog_sitters):
+    """Статистика для многих догситтеров: из кэша, недостающие - двумя запросами на всех"""
+    sitter_ids = [getattr(sitter, 'pk', sitter) for sitter in dog_sitters]
+    cache = _cache()
+    if cache is None or current_read_alias() is not None:
+        return compute_statistics(sitter_ids)
+    keys = {sitter_id: CACHE_KEY.format(sitter_id) for sitter_id in sitter_ids}
+    cached = cache.get_many(keys.values())
+
+    result = {}
+    missing = []
+    for sitter_id, key in keys.items():
+        if key in cached:
+            result[sitter_id] = SitterStatistics(**cached[key])
+        else:
+            missing.append(sitter_id)
+
+    if missing:
+        computed = compute_statistics(missing)
+        cache.set_many(
+            {keys[sitter_id]: asdict(stats) for sitter_id, stats in computed.items()},
+            settings.SITTER_STATS_CACHE_TTL,
+        )
+        result.update(computed)
+    return result
+
+
+def get_statistics(dog_sitter):
+    sitter_id = getattr(dog_sitter, 'pk', dog_sitter)
+    return get_statistics_bulk([sitter_id])[sitter_id]
+
+
+def invalidate(dog_sitter_ids):
+    """Сбрасывает статистику догситтеров после фиксации транзакции"""
+    cache = _cache()
+    if cache is None:
+        return
+    keys = [CACHE_KEY.format(sitter_id) for sitter_id in set(dog_sitter_ids) if sitter_id]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,14 @@
+"""
+Бэкенд SQLite продакшен-профиля (main.sqlite_profile).
+
+Транзакции начинаются с BEGIN IMMEDIATE: писатель сразу берёт блокировку
+записи и ждёт busy_timeout, а не получает "database is locked" при
+повышении блокировки посреди транзакции. Опция OPTIONS['transaction_mode']
+делает то же, но появилась только в Django 5.1.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
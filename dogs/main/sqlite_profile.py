@@ -0,0 +1,130 @@
+"""
+Продакшен-профиль SQLite.
+
+apply_sqlite_pragmas подключается к сигналу connection_created и
+выполняет PRAGMA из settings.SQLITE_PRAGMAS для каждого нового
+соединения основной базы: WAL-журнал, synchronous=NORMAL, mmap, размер кэша и
+busy_timeout. Вместе с CONN_MAX_AGE соединения переиспользуются между
+запросами, поэтому PRAGMA выполняются один раз на соединение. Снимок
+реплики (main.db_router.refresh_sqlite_snapshot) остаётся в режиме
+журнала DELETE, поэтому к другим алиасам PRAGMA не применяются.
+Транзакции основной базы начинаются с BEGIN IMMEDIATE (main.sqlite_backend).
+
+run_concurrency_benchmark сравнивает пропускную способность чтения и
+записи при настройках SQLite по умолчанию и с профилем.
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+def get_pragmas():
+    if not getattr(settings, 'SQLITE_PRODUCTION_PROFILE', False):
+        return {}
+    return getattr(settings, 'SQLITE_PRAGMAS', {})
+
+
+def execute_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Обработчик connection_created: настраивает новое соединение SQLite"""
+    if connection.vendor != 'sqlite' or connection.alias != DEFAULT_DB_ALIAS:
+        return
+    pragmas = get_pragmas()
+    if pragmas:
+        with connection.cursor() as cursor:
+            execute_pragmas(cursor, pragmas)
+
+
+def _prepare_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        'CREATE TABLE booking ('
+        'id INTEGER PRIMARY KEY, status TEXT, start_date TEXT, end_date TEXT, total_price REAL)'
+    )
+    conn.executemany(
+        'INSERT INTO booking (status, start_date, end_date, total_price) VALUES (?, ?, ?, ?)',
+        [('pending', '2025-01-01', '2025-01-05', 1000.0) for _ in range(rows)]
+    )
+    conn.execute('CREATE INDEX booking_status ON booking (status)')
+    conn.commit()
+    conn.close()
+
+
+def _worker(path, pragmas, timeout, deadline, is_writer, stats, lock, rows):
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    execute_pragmas(conn.cursor(), pragmas)
+    ops = errors = 0
+    rnd = random.Random()
+    while time.monotonic() < deadline:
+        try:
+            if is_writer:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute(
+                    'UPDATE booking SET status = ?, total_price = total_price + 1 WHERE id = ?',
+                    (rnd.choice(['pending', 'confirmed']), rnd.randint(1, rows))
+                )
+                conn.execute('COMMIT')
+            else:
+                conn.execute("SELECT COUNT(*), SUM(total_price) FROM booking WHERE status = 'confirmed'").fetchone()
+            ops += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    conn.close()
+    with lock:
+        key = 'writes' if is_writer else 'reads'
+        stats[key] += ops
+        stats[f'{key[:-1]}_errors'] += errors
+
+
+def run_scenario(pragmas, readers=4, writers=2, duration=3.0, rows=5000, timeout=5.0):
+    """
+    Запускает читателей и писателей на временной базе и возвращает количество
+    операций в секунду. timeout по умолчанию совпадает с тем, что Django
+    получает от модуля sqlite3.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench.sqlite3')
+        _prepare_database(path, rows)
+
+        stats = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+        threads = [
+            threading.Thread(
+                target=_worker,
+                args=(path, pragmas, timeout, deadline, i < writers, stats, lock, rows)
+            )
+            for i in range(readers + writers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return {
+        'reads_per_sec': round(stats['reads'] / duration, 1),
+        'writes_per_sec': round(stats['writes'] / duration, 1),
+        'read_errors': stats['read_errors'],
+        'write_errors': stats['write_errors'],
+    }
+
+
+def run_concurrency_benchmark(readers=4, writers=2, duration=3.0, rows=5000):
+    """Сравнивает настройки SQLite по умолчанию с продакшен-профилем"""
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    return {
+        'default': run_scenario({}, readers, writers, duration, rows),
+        'production': run_scenario(pragmas, readers, writers, duration, rows),
+    }
@@ -0,0 +1,89 @@
+"""
+Потоковые ответы для выгрузок.
+
+StreamingJSONResponse отдаёт записи по мере чтения из базы: queryset
+перебирается через .iterator(chunk_size=STREAMING_CHUNK_SIZE) (связи из
+prefetch_related догружаются на каждую пачку), каждая запись сразу
+кодируется (main.renderers.dumps) и копится в буфере до
+STREAMING_BUFFER_BYTES. В памяти процесса одновременно находится одна
+пачка записей, а не весь список.
+
+Формат - JSON-массив или NDJSON (по записи в строке). NDJSON выбирается
+через согласование содержимого DRF: заголовок Accept: application/x-ndjson
+или ?format=ndjson, если у представления есть NDJSONRenderer (см.
+EXPORT_RENDERERS).
+
+Статус ответа отправляется до первой записи, поэтому ошибка посреди
+выгрузки обрывает поток: клиент получит неполный JSON и должен считать
+выгрузку неудачной.
+"""
+from django.conf import settings
+from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from .renderers import FastJSONRenderer, dumps
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """NDJSON для согласования содержимого; обычный ответ (например, ошибка) - одной строкой"""
+    media_type = NDJSON_CONTENT_TYPE
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(dumps(row) + b'\n' for row in rows)
+
+
+# Рендереры представлений-выгрузок: JSON по умолчанию и NDJSON
+EXPORT_RENDERERS = [FastJSONRenderer, NDJSONRenderer]
+
+
+def iterate(rows):
+    """Записи queryset'а пачками по STREAMING_CHUNK_SIZE; прочие итерируемые - как есть"""
+    if isinstance(rows, QuerySet):
+        return rows.iterator(chunk_size=settings.STREAMING_CHUNK_SIZE)
+    return iter(rows)
+
+
+def _encode(rows, ndjson):
+    buffer = bytearray(b'' if ndjson else b'[')
+    first = True
+    for row in rows:
+        if ndjson:
+            buffer += dumps(row) + b'\n'
+        else:
+            if not first:
+                buffer += b','
+            buffer += dumps(row)
+        first = False
+        if len(buffer) >= settings.STREAMING_BUFFER_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if not ndjson:
+        buffer += b']'
+    if buffer:
+        yield bytes(buffer)
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    Потоковый JSON-массив или NDJSON.
+    rows - итерируемое словарей (например, генератор над iterate(queryset))
+    """
+
+    def __init__(self, rows, ndjson=False, **kwargs):
+        kwargs.setdefault('content_type', NDJSON_CONTENT_TYPE if ndjson else 'application/json')
+        super().__init__(_encode(rows, ndjson), **kwargs)
+        self['X-Accel-Buffering'] = 'no'
+
+
+def export_response(request, rows):
+    """Потоковый ответ в формате, выбранном согласованием содержимого DRF"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    return StreamingJSONResponse(rows, ndjson=isinstance(renderer, NDJSONRenderer))
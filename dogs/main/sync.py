@@ -0,0 +1,179 @@
+"""
+Синхронизация изменений для клиентов.
+
+Клиент передаёт курсор из прошлого ответа и получает только записи,
+изменённые после него (по индексу (updated_at, id)), и id удалённых
+записей (SyncTombstone). Курсор - пара позиций (updated_at, id) для
+изменений и (deleted_at, id) для удалений, упакованная в строку; выборка
+идёт по ключу, а не смещением, поэтому стоимость опроса пропорциональна
+числу изменений, а не размеру таблицы.
+
+Записи моложе SYNC_SETTLE_SECONDS не отдаются до следующего опроса:
+транзакция, начатая раньше, может зафиксироваться с более ранним
+updated_at, и курсор не должен её обогнать. Отметки об удалении хранятся
+SYNC_TOMBSTONE_RETENTION_DAYS дней; более старый курсор устаревает, и
+клиент должен загрузить данные заново.
+
+Ответ по записи зависит и от связанных строк (отзыв бронирования,
+животные в бронировании, расписание), поэтому сигналы (main.signals)
+при их записи сдвигают updated_at родителя через touch.
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Animal, Booking, DogSitter, Review, SyncTombstone
+from .serializers import AnimalSerializer, BookingSerializer, ReviewSyncSerializer
+from .views_annotations import get_bookings_with_ratings
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def _bookings(user):
+    return get_bookings_with_ratings(), Q(user=user) | Q(dog_sitter__user=user)
+
+
+def _animals(user):
+    return Animal.objects.select_related('user'), Q(user=user)
+
+
+def _reviews(user):
+    return Review.objects.all(), Q(booking__user=user) | Q(booking__dog_sitter__user=user)
+
+
+# Ресурс: (функция пользователь -> (queryset, условие видимости), сериализатор)
+RESOURCES = {
+    'bookings': (_bookings, BookingSerializer),
+    'animals': (_animals, AnimalSerializer),
+    'reviews': (_reviews, ReviewSyncSerializer),
+}
+
+
+def encode_cursor(changed, deleted):
+    payload = {
+        'c': [changed[0].isoformat(), changed[1]],
+        'd': [deleted[0].isoformat(), deleted[1]],
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(token):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        positions = tuple(
+            (datetime.fromisoformat(payload[key][0]), int(payload[key][1]))
+            for key in ('c', 'd')
+        )
+    except (ValueError, KeyError, IndexError, TypeError):
+        raise InvalidCursor("Некорректный курсор синхронизации")
+    # encode_cursor пишет время с часовым поясом; наивное сравнить с ним нельзя
+    if any(moment.tzinfo is None for moment, _ in positions):
+        raise InvalidCursor("Некорректный курсор синхронизации")
+    return positions
+
+
+def _after(position, time_field):
+    moment, last_id = position
+    return Q(**{f'{time_field}__gt': moment}) | Q(**{time_field: moment, 'id__gt': last_id})
+
+
+def _page(queryset, position, time_field, limit):
+    rows = list(queryset.filter(_after(position, time_field)).order_by(time_field, 'id')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def _tombstones(resource, user):
+    tombstones = SyncTombstone.objects.filter(resource=resource)
+    if user.is_superuser:
+        return tombstones
+    return tombstones.filter(Q(user_id=user.pk) | Q(sitter_user_id=user.pk))
+
+
+def changes(resource, user, cursor=None, limit=None, context=None):
+    """
+    Изменения ресурса для пользователя после курсора:
+    {'changed': [...], 'deleted': [id...], 'cursor': str, 'has_more': bool}
+    """
+    scope, serializer_class = RESOURCES[resource]
+    limit = min(max(limit or settings.SYNC_PAGE_SIZE, 1), settings.SYNC_MAX_PAGE_SIZE)
+    now = timezone.now()
+    settled = now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+    if cursor:
+        changed_position, deleted_position = decode_cursor(cursor)
+        if deleted_position[0] < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+            raise CursorExpired("Курсор устарел, нужна полная загрузка")
+    else:
+        # Первая загрузка: все записи, удалять у клиента пока нечего
+        changed_position = (datetime(1970, 1, 1, tzinfo=dt_timezone.utc), 0)
+        deleted_position = (settled, 0)
+
+    queryset, visible = scope(user)
+    if not user.is_superuser:
+        queryset = queryset.filter(visible)
+    records, more_changed = _page(queryset.filter(updated_at__lte=settled), changed_position, 'updated_at', limit)
+    tombstones, more_deleted = _page(
+        _tombstones(resource, user).filter(deleted_at__lte=settled), deleted_position, 'deleted_at', limit
+    )
+
+    if records:
+        changed_position = (records[-1].updated_at, records[-1].id)
+    if tombstones:
+        deleted_position = (tombstones[-1].deleted_at, tombstones[-1].id)
+    # Всё до settled выбрано - курсор можно подвинуть, чтобы он не устаревал
+    if not more_changed:
+        changed_position = max(changed_position, (settled, 0))
+    if not more_deleted:
+        deleted_position = max(deleted_position, (settled, 0))
+
+    return {
+        'changed': serializer_class(records, many=True, context=context or {}).data,
+        'deleted': [tombstone.object_id for tombstone in tombstones],
+        'cursor': encode_cursor(changed_position, deleted_position),
+        'has_more': more_changed or more_deleted,
+    }
+
+
+def touch(model, ids):
+    """Сдвигает updated_at записей, чтобы они попали в следующую дельту"""
+    ids = set(ids) - {None}
+    if ids:
+        model.objects.filter(pk__in=ids).update(updated_at=timezone.now())
+
+
+def _sitter_user_id(dog_sitter_id):
+    return DogSitter.objects.filter(pk=dog_sitter_id).values_list('user_id', flat=True).first()
+
+
+def tombstone_for(instance):
+    """Отметка об удалении для Booking, Animal или Review"""
+    if isinstance(instance, Booking):
+        return SyncTombstone(
+            resource='bookings', object_id=instance.pk,
+            user_id=instance.user_id, sitter_user_id=_sitter_user_id(instance.dog_sitter_id),
+        )
+    if isinstance(instance, Review):
+        user_id, sitter_user_id = Booking.objects.filter(pk=instance.booking_id).values_list(
+            'user_id', 'dog_sitter__user_id'
+        ).first() or (None, None)
+        return SyncTombstone(
+            resource='reviews', object_id=instance.pk, user_id=user_id, sitter_user_id=sitter_user_id,
+        )
+    return SyncTombstone(resource='animals', object_id=instance.pk, user_id=instance.user_id)
+
+
+def prune_tombstones(days=None):
+    """Удаляет отметки старше срока хранения. Возвращает число удалённых"""
+    days = settings.SYNC_TOMBSTONE_RETENTION_DAYS if days is None else days
+    deleted, _ = SyncTombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
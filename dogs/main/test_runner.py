@@ -0,0 +1,35 @@
+"""
+Запуск тестов (settings.TEST_RUNNER).
+
+Запросы в тестах проходят через RouteMetricsMiddleware и профилирование,
+которые пишут файлы в METRICS_DIR и PROFILING_DIR, а статистика
+догситтеров и версии пользователей JWT кэшируются в файлах. На время
+тестов эти каталоги подменяются временными, чтобы прогоны не оставляли
+файлы в каталогах работающего приложения.
+"""
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TempDirsTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._temp_dirs = [tempfile.mkdtemp(prefix=f'dogs-{name}-') for name in ('metrics', 'profiles', 'cache')]
+        caches = {
+            alias: dict(config, LOCATION=self._temp_dirs[2]) if config['BACKEND'].endswith('FileBasedCache') else config
+            for alias, config in settings.CACHES.items()
+        }
+        self._temp_settings = override_settings(
+            METRICS_DIR=self._temp_dirs[0], PROFILING_DIR=self._temp_dirs[1], CACHES=caches,
+        )
+        self._temp_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._temp_settings.disable()
+        for path in self._temp_dirs:
+            shutil.rmtree(path, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
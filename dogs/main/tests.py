@@ -1,3 +1,1261 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.db import connection
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.contrib.auth import get_user_model
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from users.authentication import CachedJWTAuthentication, invalidate_cached_user, user_cache
+from main import sqlite_profile, profiling, metrics, query_plans, db_router, earnings, booking_cube, sitter_stats, counters, events, outbox, renderers, projections, schedules, response_cache
+from main.datagen import DatasetGenerator, DEFAULT_PASSWORD
+from main.archive import archive_batch, archive_bookings
+from main.booking_status import complete_batch, complete_finished_bookings
+from main.signals import bookings_completed
+from main.models import (
+    Animal, ArchivedBooking, ArchivedBookingAnimal, ArchivedReview, Booking, BookingAnimal,
+    BookingMonthStats, BookingSchedule, DogSitter, OutboxEvent, Review, Service,
+)
+from main.serializers import BookingSerializer, DogSitterSerializer
+from main.views_annotations import get_bookings_with_ratings, get_dogsitter_statistics, get_dogsitter_with_ratings
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='cached',
+            email='cached@example.com',
+            password='cachedpass123'
+        )
+        self.auth = CachedJWTAuthentication()
+        self.token = AccessToken.for_user(self.user)
+
+    def test_second_lookup_is_served_from_cache(self):
+        """Повторное получение пользователя не обращается к базе"""
+        self.auth.get_user(self.token)
+        with self.assertNumQueries(0):
+            user = self.auth.get_user(self.token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.email, 'cached@example.com')
+
+    def test_save_invalidates_snapshot(self):
+        """Сохранение пользователя сбрасывает его снимок"""
+        self.auth.get_user(self.token)
+        self.user.first_name = 'Новое'
+        self.user.save()
+        with self.assertNumQueries(1):
+            user = self.auth.get_user(self.token)
+        self.assertEqual(user.first_name, 'Новое')
+
+    def test_deactivated_user_is_rejected(self):
+        """Деактивированный пользователь не проходит аутентификацию"""
+        self.auth.get_user(self.token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+    def test_update_in_other_process_invalidates_snapshot(self):
+        """Деактивация в другом процессе меняет общую версию, и снимок этого процесса не используется"""
+        self.auth.get_user(self.token)
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        # другой процесс меняет версию в общем кэше, но не видит снимков этого процесса
+        with mock.patch.object(user_cache, 'invalidate_user'):
+            invalidate_cached_user(self.user.pk)
+        self.assertEqual(len(user_cache), 1)
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+
+class SampledProfilingTests(TestCase):
+    def setUp(self):
+        profiling.recent_slow_requests.clear()
+        self.profile_dir = tempfile.mkdtemp()
+        self.admin = get_user_model().objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123',
+            is_staff=True
+        )
+
+    def test_signed_header_forces_profiling(self):
+        """Запрос с подписанным заголовком профилируется и попадает в буфер"""
+        token = profiling.make_profile_token(self.admin)
+        with override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_DIR=self.profile_dir):
+            self.client.get(reverse('index'), HTTP_X_PROFILE=token)
+        profiling._write_queue.join()
+
+        entry = profiling.recent_slow_requests[-1]
+        self.assertEqual(entry['path'], reverse('index'))
+        self.assertTrue(os.path.isfile(os.path.join(self.profile_dir, entry['profile'])))
+
+    def test_unsigned_header_is_ignored(self):
+        """Поддельный заголовок не включает профилирование"""
+        with override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_SLOW_REQUEST_MS=10 ** 6):
+            self.client.get(reverse('index'), HTTP_X_PROFILE='forged')
+        self.assertEqual(len(profiling.recent_slow_requests), 0)
+
+    def test_slow_requests_endpoint_requires_admin(self):
+        """Список медленных запросов доступен только администраторам"""
+        user = get_user_model().objects.create_user(
+            username='plain', email='plain@example.com', password='plainpass123'
+        )
+        self.client.force_login(user)
+        response = self.client.get(reverse('profiling-slow-requests'))
+        self.assertIn(response.status_code, (401, 403))
+
+
+class RouteMetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.metrics_dir = tempfile.mkdtemp()
+        self.admin = get_user_model().objects.create_user(
+            username='metrics',
+            email='metrics@example.com',
+            password='metricspass123',
+            is_staff=True
+        )
+
+    def test_metrics_endpoint_reports_route_histograms(self):
+        """Метрики представлений выдаются в формате Prometheus"""
+        token = AccessToken.for_user(self.admin)
+        with override_settings(METRICS_DIR=self.metrics_dir):
+            self.client.get(reverse('index'))
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        body = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE dogs_request_duration_seconds histogram', body)
+        self.assertIn('dogs_requests_total{view="index",method="GET",status="200"} 1', body)
+        self.assertIn('dogs_request_duration_seconds_count{view="index",method="GET"} 1', body)
+
+    def test_dead_processes_are_accumulated(self):
+        """Метрики завершившихся процессов переносятся в накопительный файл и остаются в сумме"""
+        dead = []
+        for _ in range(2):
+            process = subprocess.Popen([sys.executable, '-c', ''])
+            process.wait()
+            path = os.path.join(self.metrics_dir, f'metrics_{process.pid}.json')
+            with open(path, 'w') as f:
+                json.dump({'histograms': [], 'counters': [['dogs_requests_total', [['view', 'dead']], 7]]}, f)
+            dead.append(path)
+
+            with override_settings(METRICS_DIR=self.metrics_dir):
+                self.client.get(reverse('index'))
+                histograms, counters = metrics.collect_all_processes()
+
+        self.assertFalse(any(os.path.exists(path) for path in dead))
+        self.assertTrue(os.path.exists(os.path.join(self.metrics_dir, metrics.ACCUMULATED_FILE)))
+        self.assertTrue(os.path.exists(os.path.join(self.metrics_dir, f'metrics_{os.getpid()}.json')))
+        self.assertEqual(counters[('dogs_requests_total', (('view', 'dead'),))], 14)
+        self.assertEqual(histograms[('dogs_request_queries', (('view', 'index'), ('method', 'GET')))]['count'], 2)
+
+
+class DatasetGeneratorTests(TestCase):
+    def test_generates_requested_volume(self):
+        """Генератор создаёт бронирования вместе с животными и пересчитывает рейтинги"""
+        result = DatasetGenerator(seed=1, batch_size=50).generate(bookings=120)
+
+        self.assertEqual(result['bookings'], 120)
+        self.assertEqual(Booking.objects.count(), 120)
+        self.assertEqual(
+            BookingAnimal.objects.values('booking').distinct().count(), 120
+        )
+        rated = DogSitter.objects.filter(bookings__review__isnull=False).distinct()
+        self.assertTrue(all(sitter.rating > 0 for sitter in rated))
+
+    def test_same_seed_gives_same_data(self):
+        """Одинаковый seed даёт одинаковые бронирования"""
+        DatasetGenerator(seed=7, prefix='first').generate(bookings=30)
+        first = list(Booking.objects.order_by('id').values_list('start_date', 'end_date', 'status', 'total_price'))
+        Booking.objects.all().delete()
+        DatasetGenerator(seed=7, prefix='second').generate(bookings=30)
+        second = list(Booking.objects.order_by('id').values_list('start_date', 'end_date', 'status', 'total_price'))
+        self.assertEqual(first, second)
+
+    def test_ratings_match_review_signals(self):
+        """Рейтинг после генерации - округлённое среднее отзывов, как при сохранении отзыва"""
+        DatasetGenerator(seed=11, batch_size=2).generate(bookings=60)
+        for sitter in DogSitter.objects.all():
+            ratings = list(Review.objects.filter(booking__dog_sitter=sitter).values_list('rating', flat=True))
+            expected = round(sum(ratings) / len(ratings), 1) if ratings else 0.0
+            self.assertEqual(sitter.rating, expected)
+
+
+class QueryPlanSnapshotTests(TestCase):
+    def test_hot_query_plans_do_not_degrade(self):
+        """Планы горячих запросов не хуже сохранённых снимков"""
+        snapshots = query_plans.load_snapshots()
+        if not snapshots:
+            self.skipTest(f"Нет снимков планов для {query_plans.snapshot_path()}")
+        regressions = query_plans.find_regressions(query_plans.analyze_all(), snapshots)
+        self.assertEqual(regressions, {})
+
+    def test_advisor_suggests_index_for_unindexed_filter(self):
+        """Советник предлагает индекс для фильтра по неиндексированному столбцу"""
+        queryset = Animal.objects.filter(breed='Лабрадор')
+        suggestion = query_plans.suggest_index(queryset)
+        self.assertEqual(suggestion, {'model': 'Animal', 'fields': ['breed', 'name']})
+        if query_plans.connection.vendor == 'sqlite':
+            self.assertIn('full_scan:main_animal', query_plans.find_problems(query_plans.explain(queryset)))
+
+    def test_advisor_accepts_existing_composite_index(self):
+        """Существующий составной индекс не предлагается повторно"""
+        self.assertIsNone(query_plans.suggest_index(Booking.objects.current()))
+
+
+class SQLiteProfileTests(TestCase):
+    def test_pragmas_applied_to_connection(self):
+        """PRAGMA продакшен-профиля применяются к соединению"""
+        if connection.vendor != 'sqlite':
+            self.skipTest("Профиль относится только к SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_immediate_transactions_and_primary_only_pragmas(self):
+        """Транзакции основной базы начинаются с BEGIN IMMEDIATE, PRAGMA не трогают реплику"""
+        if connection.vendor != 'sqlite':
+            self.skipTest("Профиль относится только к SQLite")
+        with mock.patch.object(connection, 'cursor') as cursor:
+            connection._start_transaction_under_autocommit()
+        cursor.return_value.execute.assert_called_once_with('BEGIN IMMEDIATE')
+
+        replica = mock.Mock(vendor='sqlite', alias='replica')
+        sqlite_profile.apply_sqlite_pragmas(sender=None, connection=replica)
+        replica.cursor.assert_not_called()
+
+
+class AnalyticsReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = db_router.AnalyticsReplicaRouter()
+
+    def test_reads_go_to_primary_without_replica(self):
+        """Без настроенной реплики аналитика читается из основной базы"""
+        with db_router.using_replica() as alias:
+            self.assertEqual(alias, 'default')
+            self.assertIsNone(self.router.db_for_read(Booking))
+
+    @mock.patch.object(db_router, 'replica_alias', return_value='replica')
+    def test_fresh_replica_used_for_reads_only(self, _):
+        """Свежая реплика обслуживает чтение внутри контекста, запись идёт в основную базу"""
+        with mock.patch.object(db_router, 'get_replica_lag', return_value=1.0):
+            with db_router.using_replica() as alias:
+                self.assertEqual(alias, 'replica')
+                self.assertEqual(self.router.db_for_read(Booking), 'replica')
+                self.assertEqual(self.router.db_for_write(Booking), 'default')
+                self.assertEqual(db_router.replica_reads(Booking.objects.all)().db, 'replica')
+            # Отчёты - с реплики, querysets представлений (и их запись) - с основной базы
+            self.assertEqual(get_dogsitter_statistics().db, 'replica')
+            self.assertEqual(get_bookings_with_ratings().db, 'default')
+        self.assertIsNone(self.router.db_for_read(Booking))
+
+    @mock.patch.object(db_router, 'replica_alias', return_value='replica')
+    def test_lagging_replica_falls_back_to_primary(self, _):
+        """Отстающая или недоступная реплика не используется"""
+        for lag in (10 ** 6, None):
+            with mock.patch.object(db_router, 'get_replica_lag', return_value=lag):
+                with db_router.using_replica() as alias:
+                    self.assertEqual(alias, 'default')
+                    self.assertIsNone(self.router.db_for_read(Booking))
+
+
+class BookingArchiveTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=3, batch_size=25).generate(bookings=80)
+        self.today = timezone.now().date()
+        self.total = Booking.objects.count()
+        self.animal_links = BookingAnimal.objects.count()
+        self.service_links = Booking.services.through.objects.count()
+        self.reviews = Review.objects.count()
+
+    def test_old_bookings_moved_with_related_rows(self):
+        """Старые бронирования переносятся в архив вместе с животными, услугами и отзывами"""
+        moved = archive_bookings(before=self.today, batch_size=7)
+
+        self.assertGreater(moved, 0)
+        self.assertEqual(ArchivedBooking.objects.count(), moved)
+        self.assertEqual(Booking.objects.count() + moved, self.total)
+        self.assertFalse(
+            Booking.objects.filter(status__in=['completed', 'cancelled'], end_date__lt=self.today).exists()
+        )
+        self.assertEqual(BookingAnimal.objects.count() + ArchivedBookingAnimal.objects.count(), self.animal_links)
+        self.assertEqual(
+            Booking.services.through.objects.count() + ArchivedBooking.services.through.objects.count(),
+            self.service_links
+        )
+        self.assertEqual(Review.objects.count() + ArchivedReview.objects.count(), self.reviews)
+        self.assertEqual(archive_bookings(before=self.today), 0)
+
+    def test_archiving_keeps_earnings(self):
+        """Архивация удаляет бронирования без сигналов: журнал заработка не получает обратных записей"""
+        with self.captureOnCommitCallbacks(execute=True):
+            earnings.rebuild_ledger()
+        entries = earnings.EarningsEntry.objects.count()
+        sitter = DogSitter.objects.filter(bookings__status='completed', bookings__end_date__lt=self.today).first()
+        lifetime = earnings.lifetime_earnings(sitter)
+        self.assertGreater(lifetime, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertGreater(archive_bookings(before=self.today), 0)
+
+        self.assertEqual(earnings.EarningsEntry.objects.count(), entries)
+        self.assertEqual(earnings.lifetime_earnings(sitter), lifetime)
+
+    def test_with_history_unions_live_and_archive(self):
+        """with_history возвращает живые и архивные бронирования вместе"""
+        user = Booking.objects.filter(status='completed').first().user
+        expected = set(Booking.objects.filter(user=user).values_list('id', flat=True))
+        archive_bookings(before=self.today)
+
+        history = list(Booking.objects.with_history(user=user))
+        self.assertEqual({booking.id for booking in history}, expected)
+        self.assertTrue(any(booking.archived_at for booking in history))
+        self.assertEqual(Booking.objects.with_history().count(), self.total)
+
+        response = self.client.get(
+            reverse('booking-history'),
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), len(expected))
+
+
+class BookingCompletionTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=5, batch_size=25).generate(bookings=60)
+        self.today = timezone.now().date()
+        Booking.objects.filter(end_date__lt=self.today).update(status=Booking.STATUS_CONFIRMED)
+        self.expected = set(
+            Booking.objects.filter(status='confirmed', end_date__lt=self.today).values_list('id', flat=True)
+        )
+        self.batches = []
+        bookings_completed.connect(self.record_batch, dispatch_uid='test.record_batch')
+        self.addCleanup(bookings_completed.disconnect, dispatch_uid='test.record_batch')
+
+    def record_batch(self, sender, booking_ids, dog_sitter_ids, **kwargs):
+        self.batches.append(booking_ids)
+
+    def test_finished_bookings_completed_in_chunks(self):
+        """Закончившиеся бронирования переводятся пачками, хук получает каждую пачку"""
+        with self.captureOnCommitCallbacks(execute=True):
+            total = complete_finished_bookings(chunk_size=5)
+
+        self.assertEqual(total, len(self.expected))
+        self.assertFalse(Booking.objects.filter(status='confirmed', end_date__lt=self.today).exists())
+        self.assertEqual({booking_id for batch in self.batches for booking_id in batch}, self.expected)
+        self.assertTrue(all(len(batch) <= 5 for batch in self.batches))
+
+    def test_only_updated_bookings_are_reported(self):
+        """Строка, изменённая между выборкой и UPDATE, не попадает в события и хук"""
+        changed = min(self.expected)
+        selected = Booking.objects.filter(id__in=self.expected)
+
+        def finished_bookings(today):
+            Booking.objects.filter(pk=changed).update(status=Booking.STATUS_CANCELLED)
+            return selected
+
+        events_before = OutboxEvent.objects.filter(topic=events.BOOKING_STATUS_CHANGED).count()
+        with mock.patch('main.booking_status.finished_bookings', finished_bookings):
+            with self.captureOnCommitCallbacks(execute=True):
+                selected_count, updated = complete_batch(self.today, len(self.expected))
+
+        self.assertEqual((selected_count, updated), (len(self.expected), len(self.expected) - 1))
+        self.assertEqual(set(self.batches[0]), self.expected - {changed})
+        self.assertEqual(
+            OutboxEvent.objects.filter(topic=events.BOOKING_STATUS_CHANGED).count(),
+            events_before + len(self.expected) - 1,
+        )
+
+    def test_repeated_run_is_noop(self):
+        """Повторный запуск ничего не меняет и не отправляет хук"""
+        complete_finished_bookings()
+        self.batches.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(complete_finished_bookings(), 0)
+        self.assertEqual(self.batches, [])
+
+
+class EarningsLedgerTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=11, batch_size=25).generate(bookings=60)
+        self.sitter = DogSitter.objects.filter(bookings__status='completed').distinct().first()
+
+    def expected_total(self, **filters):
+        bookings = Booking.objects.filter(dog_sitter=self.sitter, status='completed', **filters)
+        return sum(booking.total_price for booking in bookings)
+
+    def test_lifetime_and_range_match_bookings(self):
+        """Заработок из журнала совпадает с суммой завершённых бронирований"""
+        self.assertEqual(self.sitter.calculate_total_earnings(), self.expected_total())
+
+        month = Booking.objects.filter(dog_sitter=self.sitter, status='completed').first().end_date.replace(day=1)
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        with self.assertNumQueries(2):
+            in_month = earnings.earnings_between(self.sitter, month, month)
+        self.assertEqual(in_month, self.expected_total(end_date__gte=month, end_date__lt=next_month))
+        rows = list(earnings.monthly_earnings(self.sitter, month, month))
+        self.assertEqual(rows[0]['amount'], in_month)
+
+    def test_cancellation_appends_reversal(self):
+        """Отмена завершённого бронирования добавляет обратную запись, журнал не переписывается"""
+        booking = Booking.objects.filter(dog_sitter=self.sitter, status='completed').first()
+        before = self.sitter.calculate_total_earnings()
+        entries = earnings.EarningsEntry.objects.count()
+
+        Booking.objects.filter(pk=booking.pk).update(status='cancelled')
+        earnings.sync_bookings([booking.pk])
+        earnings.sync_bookings([booking.pk])
+
+        self.assertEqual(earnings.EarningsEntry.objects.count(), entries + 1)
+        self.assertEqual(self.sitter.calculate_total_earnings(), before - booking.total_price)
+
+    def test_delete_reverses_and_rebuild_recomputes_totals(self):
+        """Удаление завершённого бронирования списывает заработок, сверка пересобирает итоги"""
+        booking = Booking.objects.filter(dog_sitter=self.sitter, status='completed').first()
+        before = self.sitter.calculate_total_earnings()
+        booking.delete()
+        self.assertEqual(self.sitter.calculate_total_earnings(), before - booking.total_price)
+
+        expected = list(earnings.monthly_earnings(self.sitter))
+        earnings.MonthlyEarnings.objects.filter(dog_sitter=self.sitter).update(amount=0, running_total=0)
+        earnings.rebuild_ledger()
+        self.assertEqual(list(earnings.monthly_earnings(self.sitter)), expected)
+
+
+class BookingMonthCubeTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=13, batch_size=25).generate(bookings=60)
+        self.sitter = DogSitter.objects.annotate(n=Count('bookings')).order_by('-n').first()
+
+    def test_series_matches_grouping_over_bookings(self):
+        """Ряд по месяцам из куба совпадает с группировкой бронирований"""
+        expected = {
+            row['month']: (row['count'], row['total'])
+            for row in self.sitter.bookings.annotate(month=TruncMonth('start_date'))
+            .values('month').annotate(count=Count('id'), total=Sum('total_price'))
+        }
+        with self.assertNumQueries(1):
+            series = self.sitter.get_bookings_by_month()
+        self.assertEqual({row['month']: (row['count'], row['total_revenue']) for row in series}, expected)
+
+    def test_booking_writes_update_cells(self):
+        """Создание, смена статуса и удаление бронирования обновляют куб"""
+        owner = Animal.objects.first().user
+        start = timezone.now().date() + timedelta(days=400)
+        month = start.replace(day=1)
+        cell = BookingMonthStats.objects.filter(month=month, dog_sitter=self.sitter, user=owner)
+
+        booking = Booking(user=owner, dog_sitter=self.sitter, start_date=start, end_date=start + timedelta(days=2))
+        with mock.patch.object(booking_cube, 'refresh_cells', wraps=booking_cube.refresh_cells) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                booking.save()
+                booking.animals.add(owner.animals.first())
+                booking.save()
+                self.assertFalse(cell.exists())
+        # Ячейки пересчитываются один раз за транзакцию, после фиксации
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(list(cell.values_list('status', 'bookings_count', 'animals_count')), [('pending', 1, 1)])
+
+        booking.status = Booking.STATUS_CANCELLED
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertEqual(list(cell.values_list('status', 'bookings_count')), [('cancelled', 1)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        self.assertFalse(cell.exists())
+
+
+def shared_response_cache():
+    """Настройки CACHES с кэшем ответов в файлах - общем для процессов бэкенде"""
+    return override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'responses': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.mkdtemp(),
+        },
+        'sitter_stats': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.mkdtemp(),
+        },
+        'jwt_users': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.mkdtemp(),
+        },
+    })
+
+
+class SitterStatisticsTests(TestCase):
+    def setUp(self):
+        caches['sitter_stats'].clear()
+        DatasetGenerator(seed=17, batch_size=25).generate(bookings=60)
+        self.sitter = DogSitter.objects.annotate(n=Count('bookings__review')).order_by('-n').first()
+
+    def test_statistics_match_and_are_cached(self):
+        """Статистика считается двумя запросами, повторный вызов берётся из кэша"""
+        with self.assertNumQueries(2):
+            stats = sitter_stats.get_statistics(self.sitter)
+        bookings = self.sitter.bookings.all()
+        self.assertEqual(stats.total_bookings, bookings.count())
+        self.assertEqual(stats.completed_bookings, bookings.filter(status='completed').count())
+        self.assertEqual(stats.total_reviews, Review.objects.filter(booking__dog_sitter=self.sitter).count())
+        self.assertEqual(
+            stats.total_animals,
+            BookingAnimal.objects.filter(booking__dog_sitter=self.sitter).values('animal').distinct().count(),
+        )
+        self.assertEqual(stats.total_earnings, float(self.sitter.calculate_total_earnings()))
+        self.assertEqual(self.sitter.get_statistics().bookings_stats, stats.bookings_stats)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.sitter.get_statistics(), stats)
+
+        caches['sitter_stats'].clear()
+        sitters = list(DogSitter.objects.all()[:5])
+        with self.assertNumQueries(2):
+            bulk = sitter_stats.get_statistics_bulk(sitters)
+        self.assertEqual(len(bulk), 5)
+
+    def test_writes_invalidate_cache(self):
+        """Запись отзыва и бронирования сбрасывает кэш догситтера"""
+        before = self.sitter.get_statistics()
+        review = Review.objects.filter(booking__dog_sitter=self.sitter).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            review.delete()
+        self.assertEqual(self.sitter.get_statistics().total_reviews, before.total_reviews - 1)
+
+        booking = self.sitter.bookings.exclude(status='cancelled').first()
+        booking.status = Booking.STATUS_CANCELLED
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertEqual(self.sitter.get_statistics().cancelled_bookings, before.cancelled_bookings + 1)
+
+    def test_replica_reads_are_not_cached(self):
+        """Статистика, прочитанная в контексте реплики, не попадает в кэш"""
+        with mock.patch.object(sitter_stats, 'current_read_alias', return_value='replica'):
+            sitter_stats.get_statistics(self.sitter)
+        self.assertIsNone(caches['sitter_stats'].get(sitter_stats.CACHE_KEY.format(self.sitter.pk)))
+        sitter_stats.get_statistics(self.sitter)
+        self.assertIsNotNone(caches['sitter_stats'].get(sitter_stats.CACHE_KEY.format(self.sitter.pk)))
+
+    def test_earnings_match_live_bookings_after_archiving(self):
+        """Заработок считается по тем же живым бронированиям, что и их число"""
+        completed = self.sitter.bookings.filter(status='completed')
+        archive_batch([completed.first().pk])
+        stats = sitter_stats.compute_statistics([self.sitter.pk])[self.sitter.pk]
+        self.assertEqual(stats.completed_bookings, completed.count())
+        self.assertEqual(stats.total_earnings, float(completed.aggregate(total=Sum('total_price'))['total']))
+
+
+class SystemCountersTests(TestCase):
+    def setUp(self):
+        counters.snapshot.clear()
+        DatasetGenerator(seed=19, batch_size=25).generate(bookings=40)
+
+    def expected(self):
+        return {
+            'users': get_user_model().objects.count(),
+            'animals': Animal.objects.count(),
+            'animals.dog': Animal.objects.filter(type=Animal.DOG).count(),
+            'bookings': Booking.objects.count(),
+            'bookings.pending': Booking.objects.filter(status='pending').count(),
+            'bookings.cancelled': Booking.objects.filter(status='cancelled').count(),
+            'reviews': Review.objects.count(),
+        }
+
+    def actual(self):
+        counts = counters.get_counts()
+        return {name: counts[name] for name in self.expected()}
+
+    def test_signals_keep_counters_in_sync(self):
+        """Создание, смена статуса и удаление записей меняют счётчики"""
+        owner = Animal.objects.first().user
+        animal = Animal.objects.create(user=owner, name='Шарик', type=Animal.DOG, size=Animal.SIZE_SMALL, age=3)
+        start = timezone.now().date() + timedelta(days=30)
+        booking = Booking(user=owner, dog_sitter=DogSitter.objects.first(), start_date=start, end_date=start + timedelta(days=1))
+        booking.save()
+        booking.status = Booking.STATUS_CANCELLED
+        booking.save()
+        Review.objects.first().delete()
+        animal.delete()
+        self.assertEqual(self.actual(), self.expected())
+
+    def test_counts_are_served_from_snapshot(self):
+        """Повторное чтение счётчиков не обращается к базе, сверка исправляет расхождения"""
+        counters.get_counts()
+        with self.assertNumQueries(0):
+            counters.get_counts()
+
+        Booking.objects.filter(status='pending').update(status='cancelled')
+        counters.reconcile([Booking])
+        self.assertEqual(self.actual(), self.expected())
+
+
+@shared_response_cache()
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caches['responses'].clear()
+        user_cache.clear()
+        Service.objects.create(name='Выгул', price=500)
+        user = get_user_model().objects.create_user(username='reader', email='reader@example.com', password='x')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+
+    def get_services(self, query=''):
+        return self.client.get(reverse('service-list') + query, **self.auth)
+
+    def test_repeated_request_is_served_from_cache(self):
+        """Повторный запрос с теми же параметрами в другом порядке не обращается к базе"""
+        first = self.get_services('?a=1&b=2')
+        with self.assertNumQueries(0):
+            second = self.get_services('?b=2&a=1')
+        self.assertEqual(first.json(), second.json())
+
+    def test_model_signal_invalidates_tag(self):
+        """Запись услуги сбрасывает закэшированный список услуг"""
+        self.assertEqual(len(self.get_services().json()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(name='Передержка', price=1500)
+        self.assertEqual(len(self.get_services().json()), 2)
+
+        self.assertEqual(self.client.get(reverse('service-list')).status_code, 401)
+
+    def test_local_memory_cache_is_disabled_and_versions_survive_eviction(self):
+        """На LocMemCache ответы не кэшируются; вытесненная версия тега не возвращает старые ответы"""
+        first_key = response_cache.make_key(APIRequestFactory().get('/api/services/'), ['services'])
+        caches['responses'].delete(response_cache.TAG_KEY.format('services'))
+        self.assertNotEqual(
+            response_cache.make_key(APIRequestFactory().get('/api/services/'), ['services']), first_key
+        )
+
+        with override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }):
+            self.assertFalse(response_cache.enabled())
+            self.get_services()
+            with self.assertNumQueries(1):
+                self.get_services()
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        caches['responses'].clear()
+        DatasetGenerator(seed=23, batch_size=25).generate(bookings=30)
+        self.animal = Animal.objects.filter(bookings__isnull=False).first()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.animal.user)}'}
+
+    def test_list_returns_304_until_data_changes(self):
+        """Список животных отдаёт 304 по ETag, пока не изменится животное или его бронирование"""
+        url = reverse('animal-list')
+        first = self.client.get(url, **self.auth)
+        etag = first['ETag']
+        self.assertNotIn('Last-Modified', first)
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        booking = self.animal.bookings.first()
+        booking.animals.remove(self.animal)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_detail_supports_if_modified_since(self):
+        """Профиль пользователя и бронирование отдают 304 по Last-Modified"""
+        profile = self.client.get(reverse('user-profile'), **self.auth)
+        response = self.client.get(
+            reverse('user-profile'), HTTP_IF_MODIFIED_SINCE=profile['Last-Modified'], **self.auth
+        )
+        self.assertEqual(response.status_code, 304)
+
+        booking = self.animal.bookings.first()
+        url = reverse('booking_detail_api', args=[booking.pk])
+        etag = self.client.get(url, **self.auth)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth).status_code, 304)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=29, batch_size=25).generate(bookings=40)
+        self.user = Booking.objects.values('user').annotate(n=Count('id')).order_by('-n').first()['user']
+        self.user = get_user_model().objects.get(pk=self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def sync(self, resource='bookings', **params):
+        return self.client.get(reverse('sync-changes', args=[resource]), params, **self.auth)
+
+    def test_changes_and_tombstones_after_cursor(self):
+        """После курсора приходят только изменённые записи и id удалённых"""
+        first = self.sync().json()
+        own = Booking.objects.filter(user=self.user)
+        self.assertEqual({row['id'] for row in first['changed']}, set(own.values_list('id', flat=True)))
+        self.assertEqual(self.sync(cursor=first['cursor']).json()['changed'], [])
+
+        changed, deleted = own.order_by('id')[:2]
+        own.filter(pk=changed.pk).update(status=Booking.STATUS_CANCELLED, updated_at=timezone.now())
+        deleted_id = deleted.id
+        deleted.delete()
+
+        delta = self.sync(cursor=first['cursor']).json()
+        self.assertEqual([row['id'] for row in delta['changed']], [changed.id])
+        self.assertEqual(delta['deleted'], [deleted_id])
+        self.assertFalse(delta['has_more'])
+
+    def test_paging_and_invalid_cursor(self):
+        """Страницы по limit проходят все записи, испорченный курсор даёт 400"""
+        seen = []
+        cursor = None
+        while True:
+            page = self.sync('animals', limit=1, **({'cursor': cursor} if cursor else {})).json()
+            seen += [row['id'] for row in page['changed']]
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(sorted(seen), sorted(self.user.animals.values_list('id', flat=True)))
+        self.assertEqual(self.sync(cursor='garbage').status_code, 400)
+        naive = base64.urlsafe_b64encode(json.dumps({
+            'c': ['2024-01-01T00:00:00', 0], 'd': ['2024-01-01T00:00:00', 0],
+        }).encode()).decode()
+        self.assertEqual(self.sync(cursor=naive).status_code, 400)
+
+    def test_related_writes_bump_parent(self):
+        """Отзыв, животные в бронировании и удаление расписания попадают в дельту родителя"""
+        bookings_cursor = self.sync().json()['cursor']
+        animals_cursor = self.sync('animals').json()['cursor']
+        reviewed, relinked, scheduled = Booking.objects.filter(user=self.user).order_by('id')[:3]
+
+        Review.objects.update_or_create(booking=reviewed, defaults={'rating': 4, 'comment': 'Хорошо'})
+        animal = relinked.animals.first()
+        relinked.animals.remove(animal)
+        schedule = BookingSchedule.objects.create(
+            user=self.user, dog_sitter=scheduled.dog_sitter, start_date=scheduled.start_date,
+        )
+        Booking.objects.filter(pk=scheduled.pk).update(schedule=schedule)
+        schedule.delete()
+
+        delta = self.sync(cursor=bookings_cursor).json()
+        self.assertEqual({row['id'] for row in delta['changed']}, {reviewed.id, relinked.id, scheduled.id})
+        self.assertIn(animal.id, [row['id'] for row in self.sync('animals', cursor=animals_cursor).json()['changed']])
+
+
+class BookingEventStreamTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=31, batch_size=25).generate(bookings=20)
+        self.booking = Booking.objects.filter(status='confirmed').select_related('dog_sitter').first()
+
+    def test_status_changes_are_written_to_outbox(self):
+        """save() и ночное завершение записывают события смены статуса"""
+        start = timezone.now().date() + timedelta(days=10)
+        booking = Booking(user=self.booking.user, dog_sitter=self.booking.dog_sitter, start_date=start, end_date=start)
+        booking.save()
+        booking.status = Booking.STATUS_CANCELLED
+        booking.save()
+        booking.save()
+        statuses = [
+            (event.payload['old_status'], event.payload['status'])
+            for event in OutboxEvent.objects.filter(payload__booking_id=booking.pk)
+        ]
+        self.assertEqual(statuses, [(None, 'pending'), ('pending', 'cancelled')])
+
+        complete_finished_bookings(today=timezone.now().date() + timedelta(days=3650))
+        event = OutboxEvent.objects.filter(payload__booking_id=self.booking.pk).get()
+        self.assertEqual(event.payload['sitter_user_id'], self.booking.dog_sitter.user_id)
+
+    async def test_stream_replays_missed_and_pushes_live_events(self):
+        """Поток догружает события после Last-Event-ID и отдаёт новые из брокера"""
+        await sync_to_async(events.record_status_changes)({self.booking.pk: 'confirmed'}, 'cancelled')
+        event = await OutboxEvent.objects.alast()
+        user = await get_user_model().objects.aget(pk=self.booking.user_id)
+        access = str(AccessToken.for_user(user))
+        # Токен доступа к API в адресе не принимается - только токен потока
+        self.assertEqual((await self.async_client.get(reverse('booking-events'), {'token': access})).status_code, 401)
+        token = (await self.async_client.post(
+            reverse('booking-events-token'), headers={'Authorization': f'Bearer {access}'}
+        )).json()['token']
+
+        response = await self.async_client.get(
+            reverse('booking-events'), {'token': token}, headers={'Last-Event-ID': str(event.pk - 1)}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+        self.assertIn(f'id: {event.pk}'.encode(), await anext(chunks))
+
+        live = OutboxEvent(pk=event.pk + 1, topic=events.BOOKING_STATUS_CHANGED, payload={'user_id': self.booking.user_id})
+        events.broker.publish([live])
+        self.assertIn(f'id: {live.pk}'.encode(), await anext(chunks))
+        await chunks.aclose()
+
+    def test_broker_picks_up_late_commits(self):
+        """Событие с меньшим id, зафиксированное позже большего, всё равно доставляется"""
+        broker = events.EventBroker(events.BOOKING_STATUS_CHANGED)
+        broker._last_id = events.latest_event_id()
+        late, early = (
+            outbox.publish(events.BOOKING_STATUS_CHANGED, {'user_id': self.booking.user_id})
+            for _ in range(2)
+        )
+        # Транзакция с late ещё не зафиксирована
+        OutboxEvent.objects.filter(pk=late.pk).delete()
+        self.assertEqual([event.pk for event in broker.poll()[0]], [early.pk])
+
+        late.save()
+        self.assertEqual([event.pk for event in broker.poll()[0]], [late.pk])
+        self.assertEqual(broker.poll()[0], [])
+
+    async def test_stream_falls_back_to_session(self):
+        """Без токена поток открывается по сессии, без сессии - 401"""
+        self.assertEqual((await self.async_client.get(reverse('booking-events'))).status_code, 401)
+        user = await get_user_model().objects.aget(pk=self.booking.user_id)
+        await sync_to_async(self.client.force_login)(user)
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get(reverse('booking-events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        await aiter(response.streaming_content).aclose()
+
+
+class OutboxDispatchTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=37, batch_size=25).generate(bookings=30)
+        OutboxEvent.objects.update(dispatched_at=timezone.now())
+        self.booking = Booking.objects.filter(status='completed', review__isnull=True).select_related('dog_sitter').first()
+
+    def test_review_side_effects_run_on_commit(self):
+        """Отзыв пишет событие в той же транзакции, рейтинг пересчитывается сразу после фиксации"""
+        sitter = self.booking.dog_sitter
+        with self.captureOnCommitCallbacks(execute=True):
+            Review(booking=self.booking, rating=1, comment='').save()
+            event = OutboxEvent.objects.get(topic=events.REVIEW_SAVED, dispatched_at__isnull=True)
+            self.assertEqual(event.payload['dog_sitter_id'], sitter.pk)
+
+        event.refresh_from_db()
+        self.assertIsNotNone(event.dispatched_at)
+        self.assertEqual(outbox.dispatch_pending(), (0, 0))
+        ratings = list(Review.objects.filter(
+            booking__dog_sitter=sitter, booking__status='completed',
+        ).values_list('rating', flat=True))
+        ratings += list(ArchivedReview.objects.filter(
+            booking__dog_sitter=sitter, booking__status='completed',
+        ).values_list('rating', flat=True))
+        sitter.refresh_from_db()
+        self.assertEqual(sitter.rating, round(sum(ratings) / len(ratings), 1))
+
+    def test_rating_ignores_reviews_of_unfinished_bookings(self):
+        """В рейтинг идут только отзывы о завершённых бронированиях"""
+        sitter = self.booking.dog_sitter
+        with self.captureOnCommitCallbacks(execute=True):
+            Review(booking=self.booking, rating=5, comment='').save()
+        sitter.refresh_from_db()
+        rating = sitter.rating
+
+        other = Booking.objects.filter(dog_sitter=sitter, review__isnull=True).exclude(status='completed').first()
+        if other is None:
+            self.skipTest("Нет незавершённых бронирований без отзыва")
+        with self.captureOnCommitCallbacks(execute=True):
+            Review(booking=other, rating=1, comment='').save()
+        sitter.refresh_from_db()
+        self.assertEqual(sitter.rating, rating)
+
+    def test_failed_handler_keeps_events_for_retry(self):
+        """Ошибка обработчика откатывает его изменения, событие доставляется повторно"""
+        calls = []
+
+        def flaky(batch):
+            calls.append([event.pk for event in batch])
+            Service.objects.update(price=0)
+            if len(calls) == 1:
+                raise RuntimeError("сбой")
+
+        outbox.handler('test.flaky')(flaky)
+        self.addCleanup(outbox.HANDLERS.pop, 'test.flaky')
+        prices = list(Service.objects.order_by('id').values_list('price', flat=True))
+        event = outbox.publish('test.flaky', {})
+
+        with self.assertLogs('main.outbox', 'ERROR'):
+            self.assertEqual(outbox.dispatch_pending(), (0, 1))
+        event.refresh_from_db()
+        self.assertEqual((event.attempts, event.dispatched_at), (1, None))
+        self.assertIn('сбой', event.last_error)
+        self.assertEqual(list(Service.objects.order_by('id').values_list('price', flat=True)), prices)
+
+        self.assertEqual(outbox.dispatch_pending(), (1, 0))
+        self.assertEqual(calls, [[event.pk], [event.pk]])
+
+
+class BatchRequestsTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=41, batch_size=25).generate(bookings=20)
+        self.user = Animal.objects.first().user
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def batch(self, *paths, **extra):
+        return self.client.post(
+            reverse('batch-requests'), {'requests': [{'id': path, 'path': path} for path in paths]},
+            content_type='application/json', **extra,
+        )
+
+    def test_subrequests_share_user_and_report_status(self):
+        """Подзапросы выполняются от имени пользователя пакета, у каждого свой статус"""
+        response = self.batch('users/me/', 'animals/', '/api/services/', 'nope/', 'batch/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        results = {item['id']: item for item in response.json()['responses']}
+        self.assertEqual(results['users/me/']['body']['id'], self.user.pk)
+        self.assertEqual(
+            sorted(animal['id'] for animal in results['animals/']['body']),
+            sorted(self.user.animals.values_list('id', flat=True)),
+        )
+        self.assertIn('ETag', results['animals/']['headers'])
+        self.assertEqual(len(results['/api/services/']['body']), Service.objects.count())
+        self.assertEqual((results['nope/']['status'], results['batch/']['status']), (404, 400))
+
+    def test_plain_django_views_are_rejected(self):
+        """Обычные представления Django (могут менять данные по GET) в пакете не выполняются"""
+        animal = self.user.animals.first()
+        path = reverse('animal_delete', args=[animal.pk])
+        results = self.batch(path, 'animals/', **self.auth).json()['responses']
+        self.assertEqual([item['status'] for item in results], [400, 200])
+        self.assertTrue(Animal.objects.filter(pk=animal.pk).exists())
+
+    def test_permissions_checked_per_subrequest(self):
+        """Без токена закрытые подзапросы получают 401, POST в пакете не принимается"""
+        results = self.batch('animals/', 'users/me/').json()['responses']
+        self.assertEqual([item['status'] for item in results], [401, 401])
+        invalid = self.client.post(
+            reverse('batch-requests'), {'requests': [{'path': 'animals/', 'method': 'POST'}]},
+            content_type='application/json',
+        )
+        self.assertEqual(invalid.status_code, 400)
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=43, batch_size=25).generate(bookings=20)
+        self.user = Booking.objects.first().user
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in queries.captured_queries]
+
+    def test_dogsitter_fields_prune_annotations(self):
+        """?fields= убирает из ответа и из SQL ненужные агрегаты, ?expand= раскрывает пользователя"""
+        sitters, queries = self.get(reverse('dogsitter-list'), fields='id,first_name,average_rating', min_reviews=0)
+        self.assertEqual(set(sitters[0]), {'id', 'first_name', 'average_rating'})
+        sql = queries[-1]
+        self.assertIn('"average_rating"', sql)
+        self.assertIn('"total_reviews"', sql)
+        self.assertNotIn('five_star_reviews', sql)
+
+        sitters, _ = self.get(reverse('dogsitter-list'), fields='id,user', expand='user')
+        self.assertEqual(set(sitters[0]['user']), {'id', 'username', 'email', 'first_name', 'last_name', 'is_superuser'})
+        full, _ = self.get(reverse('dogsitter-list'))
+        self.assertIn('rating_distribution', full[0])
+
+    def test_booking_and_profile_fields(self):
+        """Бронирования без полей отзыва не присоединяют отзывы, профиль без photos их не читает"""
+        bookings, queries = self.get(reverse('booking-list'), fields='id,status,dog_sitter', expand='dog_sitter')
+        self.assertEqual(set(bookings[0]), {'id', 'status', 'dog_sitter'})
+        self.assertEqual(set(bookings[0]['dog_sitter']), {'id', 'first_name', 'last_name', 'experience_years'})
+        # Последний запрос - выборка данных (до него - отпечаток для ETag)
+        self.assertNotIn('main_review', queries[-1])
+
+        profile, queries = self.get(reverse('user-profile'), fields='id,email')
+        self.assertEqual(profile, {'id': self.user.pk, 'email': self.user.email})
+        self.assertFalse([sql for sql in queries if sql.startswith('SELECT "users_userphoto"')])
+
+
+class FastJSONTests(TestCase):
+    def test_renderer_matches_drf_encoding(self):
+        """orjson-рендерер кодирует Decimal, даты, UUID и кириллицу так же, как стандартный"""
+        data = {
+            'price': Decimal('1500.50'),
+            'date': date(2024, 5, 1),
+            'created': datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc),
+            'token': uuid.UUID(int=7),
+            'duration': timedelta(days=2),
+            'status': Booking(status=Booking.STATUS_CANCELLED).get_status_display(),
+            3: 'ключ-число',
+        }
+        fast = renderers.FastJSONRenderer().render(data)
+        self.assertEqual(json.loads(fast), json.loads(JSONRenderer().render(data)))
+        self.assertIn(data['status'].encode(), fast)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_api_uses_fast_parser(self):
+        """Тела запросов разбираются orjson-парсером, ошибка разбора - 400"""
+        DatasetGenerator(seed=47, batch_size=25).generate(bookings=5)
+        user = get_user_model().objects.first()
+        body = {'email': user.email, 'password': DEFAULT_PASSWORD}
+        with mock.patch.object(renderers.orjson, 'loads', wraps=renderers.orjson.loads) as loads:
+            response = self.client.post(reverse('api_login'), body, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        loads.assert_called_once()
+        invalid = self.client.post(reverse('api_login'), '{"email": ', content_type='application/json')
+        self.assertEqual(invalid.status_code, 400)
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=53, batch_size=25).generate(bookings=40)
+        self.admin = get_user_model().objects.first()
+        get_user_model().objects.filter(pk=self.admin.pk).update(is_staff=True, is_superuser=True)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.admin)}'}
+
+    @override_settings(STREAMING_CHUNK_SIZE=5, STREAMING_BUFFER_BYTES=1)
+    def test_bookings_export_streams_json_array(self):
+        """Выгрузка бронирований идёт потоком по пачкам и без запросов на каждую запись"""
+        user_id = Booking.objects.values('user').annotate(n=Count('id')).order_by('-n').first()['user']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin_bookings_by_user'), {'user_id': user_id}, **self.auth)
+            self.assertTrue(response.streaming)
+            chunks = list(response.streaming_content)
+        bookings = json.loads(b''.join(chunks))
+        self.assertEqual(
+            sorted(booking['id'] for booking in bookings),
+            sorted(Booking.objects.filter(user_id=user_id).values_list('id', flat=True)),
+        )
+        self.assertGreater(len(chunks), len(bookings))
+        # Пачки по 5: бронирования + животные и услуги на каждую пачку
+        self.assertLessEqual(len(queries), 3 * (len(bookings) // 5 + 1) + 2)
+
+    def test_ndjson_by_accept_header_and_format(self):
+        """NDJSON выбирается заголовком Accept или ?format=ndjson, ошибки прав - обычным ответом"""
+        response = self.client.get(reverse('admin_animals_by_user'), HTTP_ACCEPT='application/x-ndjson', **self.auth)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        users = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(
+            sum(len(user['animals']) for user in users),
+            Animal.objects.count(),
+        )
+        self.assertEqual(
+            self.client.get(reverse('admin_animals_by_user'), {'format': 'ndjson'}, **self.auth)['Content-Type'],
+            'application/x-ndjson',
+        )
+
+        other = get_user_model().objects.exclude(pk=self.admin.pk).first()
+        denied = self.client.get(
+            reverse('admin_animals_by_user'), HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(other)}',
+        )
+        self.assertEqual(denied.status_code, 403)
+
+
+class ReadProjectionTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=59, batch_size=25).generate(bookings=40)
+
+    def assertSameJSON(self, projected, serialized):
+        self.assertEqual(json.loads(JSONRenderer().render(projected)), json.loads(JSONRenderer().render(serialized)))
+
+    def test_list_projections_match_serializers(self):
+        """Проекции списков дают тот же JSON, что и сериализаторы"""
+        request = APIRequestFactory().get('/api/dogsitters/')
+        bookings = get_bookings_with_ratings().order_by('id')
+        self.assertSameJSON(
+            list(projections.BOOKING_LIST.rows(bookings)),
+            BookingSerializer(bookings, many=True).data,
+        )
+        sitters = get_dogsitter_with_ratings().order_by('id')
+        DogSitter.objects.filter(pk=sitters[0].pk).update(avatar='avatars/a.jpg')
+        self.assertSameJSON(
+            list(projections.DOGSITTER_LIST.rows(sitters, request)),
+            DogSitterSerializer(sitters, many=True, context={'request': request}).data,
+        )
+
+    @override_settings(STREAMING_CHUNK_SIZE=10)
+    def test_booking_detail_and_export_rows(self):
+        """Карточка и выгрузка бронирований: вложенные связи догружаются одним запросом на пачку"""
+        booking = Booking.objects.filter(animals__isnull=False, services__isnull=False).first()
+        with self.assertNumQueries(3):
+            row = projections.BOOKING_DETAIL.one(Booking.objects.filter(pk=booking.pk))
+        self.assertEqual(row['status'], booking.get_status_display())
+        self.assertEqual(row['user']['name'], f"{booking.user.first_name} {booking.user.last_name}")
+        self.assertEqual(
+            [(animal['id'], animal['type']) for animal in row['animals']],
+            [(animal.id, animal.get_type_display()) for animal in booking.animals.all()],
+        )
+        self.assertEqual(row['services'][0]['price'], str(booking.services.first().price))
+
+        with self.assertNumQueries(1 + 2 * 4):
+            rows = list(projections.BOOKING_EXPORT.rows(Booking.objects.order_by('id')))
+        self.assertEqual(len(rows), Booking.objects.count())
+
+
+class BulkBookingTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=61, batch_size=25).generate(bookings=20)
+        self.owner = get_user_model().objects.create_user(username='season', email='season@example.com', password='x')
+        self.dog = Animal.objects.create(user=self.owner, name='Рекс', type=Animal.DOG, size=Animal.SIZE_LARGE, age=4)
+        self.cat = Animal.objects.create(user=self.owner, name='Мурка', type=Animal.CAT, size=Animal.SIZE_SMALL, age=2)
+        self.sitter = DogSitter.objects.first()
+        self.services = list(Service.objects.order_by('id')[:2])
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.owner)}'}
+        self.start = timezone.now().date() + timedelta(days=7)
+
+    def item(self, week, animals, days=1, shift=0):
+        start = self.start + timedelta(weeks=week, days=shift)
+        return {
+            'dog_sitter': self.sitter.pk,
+            'start_date': str(start),
+            'end_date': str(start + timedelta(days=days)),
+            'animals': [animal.pk for animal in animals],
+            'services': [service.pk for service in self.services],
+        }
+
+    def post(self, items):
+        user_cache.clear()
+        return self.client.post(
+            reverse('booking-bulk'), {'bookings': items}, content_type='application/json', **self.auth
+        )
+
+    def test_bulk_create_matches_single_save(self):
+        """Пачка создаётся постоянным числом запросов, цены и побочные эффекты - как у Booking.save"""
+        reference = Booking(
+            user=self.owner, dog_sitter=self.sitter,
+            start_date=self.start + timedelta(weeks=40), end_date=self.start + timedelta(weeks=40, days=2),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            reference.save()
+            reference.animals.add(self.dog, self.cat)
+            reference.services.add(*self.services)
+            reference.save()
+        events_before = OutboxEvent.objects.filter(topic=events.BOOKING_STATUS_CHANGED).count()
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as small:
+            response = self.post([self.item(week, [self.dog, self.cat], days=2) for week in range(2)])
+        self.assertEqual(response.status_code, 201)
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as large:
+            response = self.post([self.item(week, [self.dog, self.cat], days=2) for week in range(2, 14)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(large), len(small))
+
+        created = Booking.objects.filter(pk__in=[row['id'] for row in response.json()])
+        self.assertEqual(created.count(), 12)
+        self.assertEqual({booking.total_price for booking in created}, {reference.total_price})
+        self.assertEqual(BookingAnimal.objects.filter(booking__in=created).count(), 24)
+        self.assertEqual(Booking.services.through.objects.filter(booking__in=created).count(), 24)
+        self.assertEqual(response.json()[0]['status'], Booking.STATUS_PENDING)
+        self.assertEqual(
+            OutboxEvent.objects.filter(topic=events.BOOKING_STATUS_CHANGED).count(), events_before + 14
+        )
+        counts = counters.get_counts()
+        self.assertEqual(counts['bookings.pending'], Booking.objects.filter(status='pending').count())
+        self.assertEqual(
+            BookingMonthStats.objects.filter(dog_sitter=self.sitter, user=self.owner).aggregate(n=Sum('bookings_count'))['n'],
+            Booking.objects.filter(dog_sitter=self.sitter, user=self.owner).count(),
+        )
+
+    def test_overlaps_and_foreign_animals_reject_whole_batch(self):
+        """Пересечения с бронированиями и внутри пачки, чужие животные - ошибки по элементам, ничего не создаётся"""
+        self.assertEqual(self.post([self.item(0, [self.dog])]).status_code, 201)
+        total = Booking.objects.count()
+        foreign = Animal.objects.exclude(user=self.owner).first()
+
+        response = self.post([
+            self.item(0, [self.dog], shift=-1, days=2),  # пересекается с существующим
+            self.item(0, [self.dog], shift=1),  # начинается в день окончания - не пересечение
+            self.item(3, [self.cat], days=3),
+            self.item(3, [self.cat], shift=2),  # пересекается с предыдущим элементом
+            self.item(5, [foreign]),
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual([bool(error) for error in errors], [True, False, False, True, True])
+        self.assertIn(str(self.dog.pk), errors[0]['animals'][0])
+        self.assertIn('не найдено', errors[4]['animals'][0])
+        self.assertEqual(Booking.objects.count(), total)
+
+
+@override_settings(SCHEDULE_HORIZON_DAYS=14)
+class BookingScheduleTests(TestCase):
+    def setUp(self):
+        DatasetGenerator(seed=67, batch_size=25).generate(bookings=10)
+        self.owner = get_user_model().objects.create_user(username='weekdays', email='weekdays@example.com', password='x')
+        self.dog = Animal.objects.create(user=self.owner, name='Рекс', type=Animal.DOG, size=Animal.SIZE_LARGE, age=4)
+        self.sitter = DogSitter.objects.first()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.owner)}'}
+        self.today = timezone.now().date()
+
+    def weekdays(self, start, end):
+        return [start + timedelta(days=n) for n in range((end - start).days + 1) if (start + timedelta(days=n)).weekday() < 5]
+
+    def create_schedule(self):
+        response = self.client.post(reverse('booking-schedule-list'), {
+            'dog_sitter': self.sitter.pk,
+            'animals': [self.dog.pk],
+            'services': [Service.objects.first().pk],
+            'frequency': 'weekly',
+            'weekdays': [4, 0, 1, 2, 3],
+            'start_date': str(self.today + timedelta(days=1)),
+        }, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 201)
+        return BookingSchedule.objects.get(pk=response.json()['id'])
+
+    def test_only_near_term_occurrences_are_materialized(self):
+        """Бронирования создаются только до горизонта, календарь показывает расписание целиком"""
+        schedule = self.create_schedule()
+        horizon = self.today + timedelta(days=14)
+        self.assertEqual(schedule.materialized_until, horizon)
+        self.assertEqual(
+            sorted(schedule.bookings.values_list('start_date', flat=True)),
+            self.weekdays(self.today + timedelta(days=1), horizon),
+        )
+
+        end = self.today + timedelta(days=60)
+        calendar = self.client.get(
+            reverse('booking-calendar'), {'start': str(self.today), 'end': str(end)}, **self.auth
+        ).json()
+        self.assertEqual(
+            [entry['start_date'] for entry in calendar],
+            [str(day) for day in self.weekdays(self.today + timedelta(days=1), end)],
+        )
+        self.assertEqual({entry['status'] for entry in calendar if entry['start_date'] > str(horizon)}, {'scheduled'})
+
+        # Ежедневный запуск сдвигает горизонт, повторный ничего не создаёт
+        later = self.today + timedelta(days=7)
+        created, skipped = schedules.materialize(today=later)
+        self.assertEqual((created, skipped), (len(self.weekdays(horizon + timedelta(days=1), later + timedelta(days=14))), 0))
+        self.assertEqual(schedules.materialize(today=later), (0, 0))
+        self.assertEqual(schedule.bookings.count(), len(self.weekdays(self.today + timedelta(days=1), later + timedelta(days=14))))
+
+    def test_overlapping_occurrence_is_skipped(self):
+        """Вхождение, пересекающееся с бронированием животного, пропускается; занятость догситтера видна без данных владельца"""
+        taken = self.weekdays(self.today + timedelta(days=1), self.today + timedelta(days=14))[0]
+        booking = Booking(user=self.owner, dog_sitter=self.sitter, start_date=taken, end_date=taken + timedelta(days=1))
+        booking.save()
+        booking.animals.add(self.dog)
+
+        with self.assertLogs('main.schedules', 'WARNING'):
+            schedule = self.create_schedule()
+        self.assertFalse(schedule.bookings.filter(start_date=taken).exists())
+        self.assertEqual(Booking.objects.filter(animals=self.dog, start_date=taken).count(), 1)
+
+        url = reverse('dogsitter-calendar', args=[self.sitter.pk])
+        busy = self.client.get(url, {'start': str(self.today), 'end': str(self.today + timedelta(days=30))}, **self.auth).json()
+        self.assertIn({'start_date': str(taken), 'end_date': str(taken + timedelta(days=1)), 'status': 'pending'}, busy)
+        self.assertIn('scheduled', {entry['status'] for entry in busy})
+        self.assertEqual(self.client.get(url, {'start': str(self.today), 'end': '2000-01-01'}, **self.auth).status_code, 400)
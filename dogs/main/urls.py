@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views_api
+from . import views_api, views_events
 from users.views import UserProfileView, UserPhotoListCreateView, UserPhotoDetailView, DeleteAccountView
 from . import views
 
@@ -9,6 +9,7 @@ router.register(r'dogsitters', views_api.DogSitterViewSet, basename='dogsitter')
 router.register(r'bookings', views_api.BookingViewSet, basename='booking')
 router.register(r'animals', views_api.AnimalViewSet, basename='animal')
 router.register(r'services', views_api.ServiceViewSet, basename='service')
+router.register(r'schedules', views_api.BookingScheduleViewSet, basename='booking-schedule')
 
 urlpatterns = [
     path('', views_api.index, name='index'),
@@ -21,7 +22,14 @@ urlpatterns = [
     path('bookings/<int:pk>/cancel/', views_api.cancel_booking, name='booking-cancel'),
     path('users/me/delete/', DeleteAccountView.as_view(), name='delete-account'),
     path('statistics/', views_api.get_statistics, name='api-statistics'),
+    path('sync/<str:resource>/', views_api.sync_changes, name='sync-changes'),
+    path('batch/', views_api.batch_requests, name='batch-requests'),
+    path('events/bookings/', views_events.booking_events, name='booking-events'),
+    path('events/bookings/token/', views_api.booking_events_token, name='booking-events-token'),
     path('sentry-debug/', views_api.sentry_debug, name='sentry-debug'),
+    path('profiling/slow-requests/', views_api.profiling_slow_requests, name='profiling-slow-requests'),
+    path('profiling/token/', views_api.profiling_token, name='profiling-token'),
+    path('metrics/', views_api.metrics, name='metrics'),
     
     # Маршруты для животных
     path('animals/<int:pk>/delete/', views.animal_delete, name='animal_delete'),
@@ -103,8 +103,11 @@ def generate_booking_pdf(booking):
     
     return response
 
-def generate_dogsitter_report_pdf(dogsitter, start_date=None, end_date=None):
-    """Генерирует PDF отчет о работе догситтера"""
+def generate_dogsitter_report_pdf(dogsitter, start_date=None, end_date=None, stats=None):
+    """
+    Генерирует PDF отчет о работе догситтера.
+    stats - заранее посчитанная SitterStatistics (см. sitter_stats.get_statistics_bulk)
+    """
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="dogsitter_report_{dogsitter.id}.pdf"'
     
@@ -125,54 +128,37 @@ def generate_dogsitter_report_pdf(dogsitter, start_date=None, end_date=None):
     p.drawString(50, y, f"Experience: {experience} years")
     
     # Статистика
-    stats = dogsitter.get_statistics() or {
-        'bookings_stats': {
-            'total_bookings': 0,
-            'completed_bookings': 0,
-            'cancelled_bookings': 0,
-            'total_earnings': 0,
-            'avg_booking_price': 0
-        },
-        'reviews_stats': {
-            'total_reviews': 0,
-            'avg_rating': 0,
-            'five_star_reviews': 0,
-            'four_star_reviews': 0,
-            'three_star_reviews': 0
-        }
-    }
+    if stats is None:
+        stats = dogsitter.get_statistics()
     
     y -= 40
     p.drawString(50, y, "Booking statistics:")
     y -= 20
     
-    bookings_stats = stats.get('bookings_stats', {})
-    p.drawString(70, y, f"Total bookings: {bookings_stats.get('total_bookings', 0)}")
+    p.drawString(70, y, f"Total bookings: {stats.total_bookings}")
     y -= 20
-    p.drawString(70, y, f"Completed: {bookings_stats.get('completed_bookings', 0)}")
+    p.drawString(70, y, f"Completed: {stats.completed_bookings}")
     y -= 20
-    p.drawString(70, y, f"Cancelled: {bookings_stats.get('cancelled_bookings', 0)}")
+    p.drawString(70, y, f"Cancelled: {stats.cancelled_bookings}")
     y -= 20
-    p.drawString(70, y, f"Total earnings: {bookings_stats.get('total_earnings', 0)} RUB")
+    p.drawString(70, y, f"Total earnings: {stats.total_earnings} RUB")
     y -= 20
-    p.drawString(70, y, f"Average booking price: {bookings_stats.get('avg_booking_price', 0)} RUB")
+    p.drawString(70, y, f"Average booking price: {stats.avg_booking_price} RUB")
     
     # Статистика по отзывам
     y -= 40
     p.drawString(50, y, "Review statistics:")
     y -= 20
     
-    reviews_stats = stats.get('reviews_stats', {})
-    p.drawString(70, y, f"Total reviews: {reviews_stats.get('total_reviews', 0)}")
+    p.drawString(70, y, f"Total reviews: {stats.total_reviews}")
     y -= 20
-    avg_rating = reviews_stats.get('avg_rating', 0)
-    p.drawString(70, y, f"Average rating: {avg_rating:.1f}")
+    p.drawString(70, y, f"Average rating: {stats.avg_rating:.1f}")
     y -= 20
-    p.drawString(70, y, f"5 stars: {reviews_stats.get('five_star_reviews', 0)}")
+    p.drawString(70, y, f"5 stars: {stats.five_star_reviews}")
     y -= 20
-    p.drawString(70, y, f"4 stars: {reviews_stats.get('four_star_reviews', 0)}")
+    p.drawString(70, y, f"4 stars: {stats.four_star_reviews}")
     y -= 20
-    p.drawString(70, y, f"3 stars: {reviews_stats.get('three_star_reviews', 0)}")
+    p.drawString(70, y, f"3 stars: {stats.three_star_reviews}")
     
     # Подпись
     p.setFont("Times-Roman", 8)
@@ -5,17 +5,25 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.urls import reverse
-from django.db.models import Q, Count, Avg, Sum, F, ExpressionWrapper, fields, QuerySet
+from django.db.models import Q, Count, Avg, Sum, F, ExpressionWrapper, fields, QuerySet, Prefetch
 from django.utils import timezone
 from datetime import timedelta
 from django.db.models.functions import TruncMonth, Concat
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from typing import Dict, List, Optional, Any
 
 from .models import User, Animal, Booking, DogSitter, Service, Review
+from .db_router import replica_reads
+from django.db import transaction
+from . import booking_cube, counters, outbox
+from .events import BOOKING_REFUND_REQUESTED
+from .streaming import EXPORT_RENDERERS, export_response, iterate
+from .projections import ANIMAL_EXPORT, BOOKING_DETAIL, BOOKING_EXPORT
+from .response_cache import cache_response
+from .conditional import conditional_get
 
 
 def index(request: HttpRequest) -> HttpResponse:
@@ -28,16 +36,14 @@ def index(request: HttpRequest) -> HttpResponse:
     Returns:
         HttpResponse: Отрендеренная главная страница с контекстными данными
     """
-    animals_count = Animal.objects.count()
-    bookings_count = Booking.objects.count()
-    dogsitters_count = DogSitter.objects.count()
+    counts = counters.get_counts()
     
     top_dogsitters = DogSitter.objects.order_by('-rating')[:5]
     
     context = {
-        'animals_count': animals_count,
-        'bookings_count': bookings_count,
-        'dogsitters_count': dogsitters_count,
+        'animals_count': counts['animals'],
+        'bookings_count': counts['bookings'],
+        'dogsitters_count': counts['dogsitters'],
         'top_dogsitters': top_dogsitters,
     }
     return render(request, 'main/index.html', context)
@@ -219,6 +225,7 @@ def booking_list(request: HttpRequest) -> HttpResponse:
     return render(request, 'main/booking_list.html', context)
 
 
+@cache_response('animals')
 def api_animal_search(request: HttpRequest) -> JsonResponse:
     """
     API-представление для поиска животных с фильтрацией.
@@ -718,6 +725,7 @@ def long_term_bookings(request: HttpRequest) -> HttpResponse:
     return render(request, 'main/booking_list.html', context)
 
 
+@replica_reads
 def aggregation_annotation_examples(request):
     """
     Представление для демонстрации примеров использования агрегирования и аннотирования в Django ORM
@@ -725,23 +733,25 @@ def aggregation_annotation_examples(request):
     context = {}
     
     # Пример 1: Базовое агрегирование - общая статистика системы
+    # (количества берутся из счётчиков main.counters)
+    counts = counters.get_counts()
     system_stats = {
-        'users_count': User.objects.count(),
-        'animals_count': Animal.objects.count(),
-        'dogsitters_count': DogSitter.objects.count(),
-        'bookings_count': Booking.objects.count(),
-        'reviews_count': Review.objects.count(),
+        'users_count': counts['users'],
+        'animals_count': counts['animals'],
+        'dogsitters_count': counts['dogsitters'],
+        'bookings_count': counts['bookings'],
+        'reviews_count': counts['reviews'],
         
         # Статистика по статусам бронирований
-        'pending_bookings': Booking.objects.filter(status=Booking.STATUS_PENDING).count(),
-        'confirmed_bookings': Booking.objects.filter(status=Booking.STATUS_CONFIRMED).count(),
-        'completed_bookings': Booking.objects.filter(status=Booking.STATUS_COMPLETED).count(),
-        'cancelled_bookings': Booking.objects.filter(status=Booking.STATUS_CANCELLED).count(),
+        'pending_bookings': counts[f'bookings.{Booking.STATUS_PENDING}'],
+        'confirmed_bookings': counts[f'bookings.{Booking.STATUS_CONFIRMED}'],
+        'completed_bookings': counts[f'bookings.{Booking.STATUS_COMPLETED}'],
+        'cancelled_bookings': counts[f'bookings.{Booking.STATUS_CANCELLED}'],
         
         # Статистика по типам животных
-        'dogs_count': Animal.objects.filter(type=Animal.DOG).count(),
-        'cats_count': Animal.objects.filter(type=Animal.CAT).count(),
-        'other_animals_count': Animal.objects.filter(type=Animal.OTHER).count(),
+        'dogs_count': counts[f'animals.{Animal.DOG}'],
+        'cats_count': counts[f'animals.{Animal.CAT}'],
+        'other_animals_count': counts[f'animals.{Animal.OTHER}'],
         
         # Агрегирование статистики бронирований
         'bookings_stats': Booking.objects.aggregate(
@@ -800,17 +810,11 @@ def aggregation_annotation_examples(request):
     context['top_dogsitters'] = top_dogsitters
     
     # Пример 3: Сложное аннотирование с группировкой - статистика по месяцам и размерам животных
-    bookings_by_month = Booking.objects.annotate(
-        month=TruncMonth('start_date')
-    ).values('month').annotate(
-        bookings_count=Count('id'),
-        total_revenue=Sum('total_price'),
-        avg_price=Avg('total_price'),
-        completed_count=Count('id', filter=Q(status=Booking.STATUS_COMPLETED)),
-        cancelled_count=Count('id', filter=Q(status=Booking.STATUS_CANCELLED)),
-        animals_count=Count('animals', distinct=True),
-        services_count=Count('services', distinct=True)
-    ).order_by('-month')
+    # Помесячные итоги читаются из куба (main.booking_cube), а не группировкой всех бронирований
+    bookings_by_month = [
+        dict(row, total_revenue=row['revenue'])
+        for row in booking_cube.monthly_series()
+    ]
     
     # Статистика по размерам животных
     animal_size_stats = Animal.objects.values('size').annotate(
@@ -983,22 +987,8 @@ def create_review(request: HttpRequest, booking_id: int) -> HttpResponse:
             messages.error(request, "Оценка должна быть от 1 до 5")
             return redirect('create_review', booking_id=booking_id)
         
-        review = Review.objects.create(
-            booking=booking,
-            user=request.user,
-            rating=rating,
-            comment=comment
-        )
-        
-        # Обновляем рейтинг догситтера
-        dogsitter = booking.dog_sitter
-        avg_rating = Review.objects.filter(
-            booking__dog_sitter=dogsitter,
-            booking__status=Booking.STATUS_COMPLETED
-        ).aggregate(Avg('rating'))['rating__avg']
-        
-        dogsitter.rating = round(avg_rating, 1) if avg_rating else 0.0
-        dogsitter.save()
+        # Рейтинг догситтера пересчитает обработчик события review.saved
+        Review(booking=booking, rating=rating, comment=comment).save()
         
         messages.success(request, "Спасибо за ваш отзыв!")
         return redirect('booking_detail', pk=booking_id)
@@ -1025,11 +1015,16 @@ def cancel_booking_with_refund(request, booking_id):
         return redirect('booking_detail', pk=booking_id)
     
     try:
-        # Отменяем бронирование
-        booking.status = Booking.STATUS_CANCELLED
-        booking.save()
+        # Отмена и заявка на возврат оплаты фиксируются вместе
+        with transaction.atomic():
+            booking.status = Booking.STATUS_CANCELLED
+            booking.save()
+            outbox.publish(BOOKING_REFUND_REQUESTED, {
+                'booking_id': booking.pk,
+                'user_id': booking.user_id,
+                'amount': str(booking.total_price),
+            })
         
-        # Возвращаем оплату (условно)
         messages.success(request, "Бронирование отменено. Средства будут возвращены в течение 3 рабочих дней")
         return redirect('booking_list')
         
@@ -1039,6 +1034,10 @@ def cancel_booking_with_refund(request, booking_id):
 
 @api_view(['GET', 'PATCH'])
 @permission_classes([IsAuthenticated])
+@conditional_get(
+    'updated_at', 'user__updated_at', 'dog_sitter__user__updated_at', 'animals__updated_at', 'services__id',
+    queryset=lambda request, pk: Booking.objects.filter(pk=pk),
+)
 def booking_detail_api(request: HttpRequest, pk: int) -> Response:
     """
     API-представление для получения и обновления информации о бронировании.
@@ -1054,43 +1053,14 @@ def booking_detail_api(request: HttpRequest, pk: int) -> Response:
     Raises:
         Http404: Если бронирование не найдено
     """
-    booking = get_object_or_404(Booking, pk=pk)
-
     if request.method == 'GET':
-        data = {
-            'id': booking.id,
-            'status': booking.get_status_display(),
-            'start_date': booking.start_date,
-            'end_date': booking.end_date,
-            'total_price': str(booking.total_price),
-            'user': {
-                'id': booking.user.id,
-                'name': f"{booking.user.first_name} {booking.user.last_name}"
-            },
-            'dog_sitter': {
-                'id': booking.dog_sitter.id,
-                'name': f"{booking.dog_sitter.user.first_name} {booking.dog_sitter.user.last_name}"
-            } if booking.dog_sitter else None,
-            'animals': [
-                {
-                    'id': animal.id,
-                    'name': animal.name,
-                    'type': animal.get_type_display()
-                }
-                for animal in booking.animals.all()
-            ],
-            'services': [
-                {
-                    'id': service.id,
-                    'name': service.name,
-                    'price': str(service.price)
-                }
-                for service in booking.services.all()
-            ]
-        }
+        data = BOOKING_DETAIL.one(Booking.objects.filter(pk=pk))
+        if data is None:
+            raise Http404("Бронирование не найдено")
         return Response(data)
 
-    elif request.method == 'PATCH':
+    booking = get_object_or_404(Booking, pk=pk)
+    if request.method == 'PATCH':
         if 'status' in request.data:
             booking.status = request.data['status']
             booking.save()
@@ -1099,7 +1069,8 @@ def booking_detail_api(request: HttpRequest, pk: int) -> Response:
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def admin_bookings_by_user(request: HttpRequest) -> Response:
+@renderer_classes(EXPORT_RENDERERS)
+def admin_bookings_by_user(request: HttpRequest) -> HttpResponse:
     """
     API-представление для получения списка бронирований пользователя (для администраторов).
     Требует аутентификации пользователя и прав администратора.
@@ -1112,7 +1083,7 @@ def admin_bookings_by_user(request: HttpRequest) -> Response:
             - end_date: конечная дата
 
     Returns:
-        Response: JSON-ответ со списком бронирований пользователя
+        StreamingJSONResponse: потоковый JSON-массив (или NDJSON) бронирований пользователя
 
     Raises:
         PermissionDenied: Если у пользователя нет прав администратора
@@ -1146,42 +1117,12 @@ def admin_bookings_by_user(request: HttpRequest) -> Response:
     if end_date:
         bookings = bookings.filter(end_date__lte=end_date)
 
-    data = [
-        {
-            'id': booking.id,
-            'status': booking.get_status_display(),
-            'start_date': booking.start_date,
-            'end_date': booking.end_date,
-            'total_price': str(booking.total_price),
-            'dog_sitter': {
-                'id': booking.dog_sitter.id,
-                'name': f"{booking.dog_sitter.user.first_name} {booking.dog_sitter.user.last_name}"
-            } if booking.dog_sitter else None,
-            'animals': [
-                {
-                    'id': animal.id,
-                    'name': animal.name,
-                    'type': animal.get_type_display()
-                }
-                for animal in booking.animals.all()
-            ],
-            'services': [
-                {
-                    'id': service.id,
-                    'name': service.name,
-                    'price': str(service.price)
-                }
-                for service in booking.services.all()
-            ]
-        }
-        for booking in bookings
-    ]
-
-    return Response(data)
+    return export_response(request, BOOKING_EXPORT.rows(bookings))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def admin_animals_by_user(request: HttpRequest) -> Response:
+@renderer_classes(EXPORT_RENDERERS)
+def admin_animals_by_user(request: HttpRequest) -> HttpResponse:
     """
     API-представление для получения списка животных пользователя (для администраторов).
     Требует аутентификации пользователя и прав администратора.
@@ -1193,7 +1134,7 @@ def admin_animals_by_user(request: HttpRequest) -> Response:
             - size: размер животного
 
     Returns:
-        Response: JSON-ответ со списком животных пользователя
+        StreamingJSONResponse: потоковый JSON-массив (или NDJSON) животных пользователя
 
     Raises:
         PermissionDenied: Если у пользователя нет прав администратора
@@ -1223,27 +1164,32 @@ def admin_animals_by_user(request: HttpRequest) -> Response:
     if size:
         animals = animals.filter(size=size)
 
-    data = [
-        {
-            'id': animal.id,
-            'name': animal.name,
-            'type': animal.get_type_display(),
-            'breed': animal.breed,
-            'age': animal.age,
-            'size': animal.get_size_display(),
-            'bookings_count': animal.bookings.count(),
-            'active_bookings': animal.bookings.filter(
-                status__in=[Booking.STATUS_PENDING, Booking.STATUS_CONFIRMED],
-                end_date__gte=timezone.now()
-            ).count()
-        }
-        for animal in animals
-    ]
+    animals = animals.annotate(
+        bookings_total=Count('bookings', distinct=True),
+        active_bookings_total=Count('bookings', distinct=True, filter=Q(
+            bookings__status__in=[Booking.STATUS_PENDING, Booking.STATUS_CONFIRMED],
+            bookings__end_date__gte=timezone.now()
+        )),
+    )
+
+    def rows():
+        for animal in iterate(animals):
+            yield {
+                'id': animal.id,
+                'name': animal.name,
+                'type': animal.get_type_display(),
+                'breed': animal.breed,
+                'age': animal.age,
+                'size': animal.get_size_display(),
+                'bookings_count': animal.bookings_total,
+                'active_bookings': animal.active_bookings_total
+            }
 
-    return Response(data)
+    return export_response(request, rows())
 
 @api_view(['GET'])
-def animal_list_api(request: HttpRequest) -> Response:
+@renderer_classes(EXPORT_RENDERERS)
+def animal_list_api(request: HttpRequest) -> HttpResponse:
     """
     API-представление для получения списка животных с возможностью фильтрации.
 
@@ -1256,7 +1202,7 @@ def animal_list_api(request: HttpRequest) -> Response:
             - age_max: максимальный возраст
 
     Returns:
-        Response: JSON-ответ со списком отфильтрованных животных
+        StreamingJSONResponse: потоковый JSON-массив (или NDJSON) отфильтрованных животных
     """
     animals: QuerySet[Animal] = Animal.objects.all()
 
@@ -1284,23 +1230,7 @@ def animal_list_api(request: HttpRequest) -> Response:
     if age_max:
         animals = animals.filter(age__lte=int(age_max))
 
-    data = [
-        {
-            'id': animal.id,
-            'name': animal.name,
-            'type': animal.get_type_display(),
-            'breed': animal.breed,
-            'age': animal.age,
-            'size': animal.get_size_display(),
-            'owner': {
-                'id': animal.user.id,
-                'name': f"{animal.user.first_name} {animal.user.last_name}"
-            }
-        }
-        for animal in animals
-    ]
-
-    return Response(data)
+    return export_response(request, ANIMAL_EXPORT.rows(animals))
 
 @api_view(['GET', 'PUT', 'DELETE'])
 def animal_detail_api(request, pk):
@@ -1352,39 +1282,44 @@ def animal_detail_api(request, pk):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(EXPORT_RENDERERS)
 def admin_animals_by_user(request):
-    """API endpoint для получения животных, сгруппированных по пользователям (только для администраторов)"""
+    """
+    API endpoint для получения животных, сгруппированных по пользователям (только для администраторов).
+    Выгрузка потоковая: животные догружаются на каждую пачку пользователей
+    """
     if not request.user.is_superuser:
         return Response({"error": "Доступ запрещен"}, status=403)
     
-    users_with_animals = User.objects.filter(animals__isnull=False).distinct()
-    result = []
-    
-    for user in users_with_animals:
-        user_animals = Animal.objects.filter(user=user).order_by('name')
-        animals_data = []
-        
-        for animal in user_animals:
-            animal_data = {
-                'id': animal.id,
-                'name': animal.name,
-                'type': animal.type,
-                'breed': animal.breed,
-                'age': animal.age,
-                'size': animal.size,
-                'special_needs': animal.special_needs,
-                'photo': animal.photo.url if animal.photo else None,
-                'bookings_count': animal.bookings.count()
+    users_with_animals = User.objects.filter(animals__isnull=False).distinct().prefetch_related(
+        Prefetch(
+            'animals',
+            queryset=Animal.objects.order_by('name').annotate(bookings_total=Count('bookings')),
+            to_attr='sorted_animals',
+        )
+    )
+
+    def rows():
+        for user in iterate(users_with_animals):
+            yield {
+                'id': user.id,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'email': user.email,
+                'animals': [
+                    {
+                        'id': animal.id,
+                        'name': animal.name,
+                        'type': animal.type,
+                        'breed': animal.breed,
+                        'age': animal.age,
+                        'size': animal.size,
+                        'special_needs': animal.special_needs,
+                        'photo': animal.photo.url if animal.photo else None,
+                        'bookings_count': animal.bookings_total
+                    }
+                    for animal in user.sorted_animals
+                ]
             }
-            animals_data.append(animal_data)
-        
-        user_data = {
-            'id': user.id,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'email': user.email,
-            'animals': animals_data
-        }
-        result.append(user_data)
     
-    return Response(result)
+    return export_response(request, rows())
@@ -9,9 +9,12 @@ from django.db.models.functions import (
 )
 from django.utils import timezone
 from datetime import timedelta
+from .db_router import replica_reads
+from .earnings import lifetime_earnings_subquery
 from .models import Animal, Booking, DogSitter, Review, Service
 from users.models import User
 
+@replica_reads
 def get_dogsitter_statistics():
     """
     Получение статистики по догситтерам
@@ -30,11 +33,9 @@ def get_dogsitter_statistics():
             output_field=FloatField()
         ),
         
-        # Общий заработок
+        # Общий заработок (из журнала заработка, main.earnings)
         total_earnings=Coalesce(
-            Sum('bookings__total_price', 
-                filter=Q(bookings__status='completed')
-            ),
+            lifetime_earnings_subquery(),
             Value(0.0),
             output_field=FloatField()
         ),
@@ -76,6 +77,7 @@ def get_dogsitter_statistics():
         )
     )
 
+@replica_reads
 def get_animal_statistics():
     """
     Получение статистики по животным с использованием аннотаций
@@ -115,6 +117,7 @@ def get_animal_statistics():
         )
     )
 
+@replica_reads
 def get_booking_analytics():
     """
     Аналитика по бронированиям с использованием аннотаций
@@ -161,6 +164,7 @@ def get_booking_analytics():
         booking_year=ExtractYear('start_date')
     )
 
+@replica_reads
 def get_user_statistics():
     """
     Статистика по пользователям с использованием аннотаций
@@ -213,42 +217,61 @@ def get_user_statistics():
         )
     )
 
-def get_dogsitter_with_ratings():
+def _only(annotations, names, dependencies=None):
     """
-    Получение догситтеров с детальной информацией о рейтингах
+    Аннотации из names вместе с теми, на которые они ссылаются;
+    names = None - все
     """
-    return DogSitter.objects.annotate(
+    if names is None:
+        return annotations
+    needed = set(names)
+    for name in list(needed):
+        needed.update((dependencies or {}).get(name, ()))
+    return {name: expression for name, expression in annotations.items() if name in needed}
+
+# Аннотации, которые ссылаются на другие аннотации
+DOGSITTER_RATING_DEPENDENCIES = {
+    'positive_reviews_percentage': ('total_reviews', 'five_star_reviews', 'four_star_reviews'),
+}
+
+# Без replica_reads: queryset представлений, в том числе для записи (get_object)
+def get_dogsitter_with_ratings(annotations=None):
+    """
+    Получение догситтеров с детальной информацией о рейтингах.
+    annotations - имена нужных аннотаций (None - все)
+    """
+    return DogSitter.objects.annotate(**_only({
         # Средний рейтинг из всех отзывов
-        average_rating=Coalesce(
+        'average_rating': Coalesce(
             Avg('bookings__review__rating'),
             Value(0.0),
             output_field=FloatField()
         ),
         # Общее количество отзывов
-        total_reviews=Count('bookings__review'),
+        'total_reviews': Count('bookings__review'),
         # Количество отзывов по каждой оценке
-        five_star_reviews=Count(
+        'five_star_reviews': Count(
             'bookings__review',
             filter=Q(bookings__review__rating=5)
         ),
-        four_star_reviews=Count(
+        'four_star_reviews': Count(
             'bookings__review',
             filter=Q(bookings__review__rating=4)
         ),
-        three_star_reviews=Count(
+        'three_star_reviews': Count(
             'bookings__review',
             filter=Q(bookings__review__rating=3)
         ),
-        two_star_reviews=Count(
+        'two_star_reviews': Count(
             'bookings__review',
             filter=Q(bookings__review__rating=2)
         ),
-        one_star_reviews=Count(
+        'one_star_reviews': Count(
             'bookings__review',
             filter=Q(bookings__review__rating=1)
         ),
         # Процент положительных отзывов (4 и 5 звезд)
-        positive_reviews_percentage=ExpressionWrapper(
+        'positive_reviews_percentage': ExpressionWrapper(
             Case(
                 When(total_reviews__gt=0,
                      then=(F('five_star_reviews') + F('four_star_reviews')) * 100.0 / F('total_reviews')),
@@ -257,38 +280,40 @@ def get_dogsitter_with_ratings():
             output_field=FloatField()
         ),
         # Количество отзывов за последний месяц
-        recent_reviews=Count(
+        'recent_reviews': Count(
             'bookings__review',
             filter=Q(bookings__review__date__gte=timezone.now() - timedelta(days=30))
         )
-    )
+    }, annotations, DOGSITTER_RATING_DEPENDENCIES))
 
-def get_bookings_with_ratings():
+# Без replica_reads: queryset представлений, синхронизации и ответа массового создания
+def get_bookings_with_ratings(annotations=None):
     """
-    Получение бронирований с информацией о рейтингах и отзывах
+    Получение бронирований с информацией о рейтингах и отзывах.
+    annotations - имена нужных аннотаций (None - все)
     """
-    return Booking.objects.annotate(
+    return Booking.objects.annotate(**_only({
         # Рейтинг этого бронирования
-        booking_rating=Coalesce(
+        'booking_rating': Coalesce(
             F('review__rating'),
             Value(0),
             output_field=IntegerField()
         ),
         # Наличие отзыва
-        has_review=Case(
+        'has_review': Case(
             When(review__isnull=False, then=Value(True)),
             default=Value(False),
             output_field=BooleanField()
         ),
         # Длина отзыва в символах
-        review_length=Length('review__comment'),
+        'review_length': Length('review__comment'),
         # Дата отзыва
-        review_date=F('review__date'),
+        'review_date': F('review__date'),
         # Статус верификации отзыва
-        is_review_verified=F('review__is_verified'),
+        'is_review_verified': F('review__is_verified'),
         # Разница между датой завершения бронирования и датой отзыва (в днях)
-        days_until_review=ExpressionWrapper(
+        'days_until_review': ExpressionWrapper(
             F('review__date') - F('end_date'),
             output_field=DurationField()
         )
-    ) 
\ No newline at end of file
+    }, annotations))
\ No newline at end of file
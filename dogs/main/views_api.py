@@ -1,15 +1,25 @@
-from django.shortcuts import render
+from datetime import date, timedelta
+
+from django.shortcuts import get_object_or_404, render
+from django.http import HttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework_simplejwt.tokens import RefreshToken
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import authenticate
+from django.conf import settings
 from django.db import IntegrityError
 from django.db.models import Q, Count, Avg
-from .models import DogSitter, Booking, User, Animal, Service, Review
-from .serializers import DogSitterSerializer, BookingSerializer, UserSerializer, AnimalSerializer, ServiceSerializer
+from django.utils import timezone
+from .models import DogSitter, Booking, BookingSchedule, User, Animal, Service, Review
+from .serializers import (
+    DogSitterSerializer, BookingSerializer, BookingHistorySerializer,
+    UserSerializer, AnimalSerializer, ServiceSerializer, BulkBookingSerializer,
+    BookingScheduleSerializer,
+)
 from rest_framework.parsers import MultiPartParser, FormParser
 from .permissions import IsSuperUser
 from .filters import DogSitterFilter
@@ -21,6 +31,15 @@ from .views_annotations import (
     get_dogsitter_with_ratings,
     get_bookings_with_ratings
 )
+from .profiling import recent_slow_requests, make_profile_token
+from .events import make_stream_token
+from .metrics import render_prometheus
+from .response_cache import cache_response
+from .conditional import conditional_get
+from . import batch, schedules, sync
+from .fieldsets import requested_fields
+from .projections import BOOKING_LIST, DOGSITTER_LIST
+from .bulk_bookings import create_bookings
 import sentry_sdk
 
 def index(request):
@@ -100,8 +119,32 @@ class DogSitterViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """
         Возвращает queryset с аннотированными полями рейтинга
+        (только нужными полям ответа и фильтрам при ?fields=)
         """
-        return get_dogsitter_with_ratings()
+        annotations, related = self.get_serializer_class().query_plan(self.request)
+        if annotations is not None:
+            annotations |= {
+                annotation
+                for param, names in DogSitterFilter.annotated_params.items() if param in self.request.query_params
+                for annotation in names
+            }
+        queryset = get_dogsitter_with_ratings(annotations)
+        return queryset.select_related(*related) if related else queryset
+
+    # Рейтинги в ответе считаются по отзывам, имена - по пользователям
+    @conditional_get('updated_at', 'user__updated_at', 'bookings__review__updated_at')
+    @cache_response('dogsitters')
+    def list(self, request, *args, **kwargs):
+        # Полный список строится из values_list, без сериализатора (main.projections)
+        if self.paginator is None and requested_fields(request) == (None, set()):
+            queryset = self.filter_queryset(self.get_queryset())
+            return Response(list(DOGSITTER_LIST.rows(queryset, request)))
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get('updated_at', 'user__updated_at', 'bookings__review__updated_at')
+    @cache_response('dogsitters')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def get_permissions(self):
         if self.action == 'destroy':
@@ -128,6 +171,25 @@ class DogSitterViewSet(viewsets.ModelViewSet):
         return Response({'status': 'dogsitter deleted'}, status=204)
 
     @action(detail=True, methods=['get'])
+    def calendar(self, request, pk=None):
+        """
+        Занятость догситтера в ?start=&end=: активные бронирования и
+        ещё не созданные вхождения расписаний (main.schedules)
+        """
+        start, end = _calendar_range(request)
+        dog_sitter = get_object_or_404(DogSitter, pk=pk)
+        entries = schedules.calendar(
+            dog_sitter.bookings.filter(status__in=[Booking.STATUS_PENDING, Booking.STATUS_CONFIRMED]),
+            dog_sitter.booking_schedules.all(),
+            start, end,
+        )
+        return Response([
+            {'start_date': entry['start_date'], 'end_date': entry['end_date'], 'status': entry['status']}
+            for entry in entries
+        ])
+
+    @action(detail=True, methods=['get'])
+    @cache_response('dogsitters')
     def ratings(self, request, pk=None):
         """
         Детальная информация о рейтингах догситтера
@@ -143,8 +205,23 @@ class BookingViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """
         Возвращает queryset с аннотированными полями отзывов
+        (только нужными полям ответа при ?fields=)
         """
-        return get_bookings_with_ratings()
+        annotations, related = self.get_serializer_class().query_plan(self.request)
+        queryset = get_bookings_with_ratings(annotations)
+        return queryset.select_related(*related) if related else queryset
+
+    @conditional_get('updated_at', 'review__updated_at')
+    def list(self, request, *args, **kwargs):
+        # Полный список строится из values_list, без сериализатора (main.projections)
+        if self.paginator is None and requested_fields(request) == (None, set()):
+            queryset = self.filter_queryset(self.get_queryset())
+            return Response(list(BOOKING_LIST.rows(queryset, request)))
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get('updated_at', 'review__updated_at')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -158,6 +235,77 @@ class BookingViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(booking)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Создание пачки бронирований одним запросом (main.bulk_bookings):
+        {"bookings": [{"dog_sitter", "start_date", "end_date", "animals", "services"}, ...]}
+        """
+        serializer = BulkBookingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        booking_ids = create_bookings(request.user, serializer.validated_data['bookings'])
+        bookings = get_bookings_with_ratings().filter(pk__in=booking_ids).order_by('id')
+        return Response(list(BOOKING_LIST.rows(bookings, request)), status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Календарь пользователя в ?start=&end=: бронирования и ещё не
+        созданные вхождения его расписаний (main.schedules)
+        """
+        start, end = _calendar_range(request)
+        entries = schedules.calendar(
+            Booking.objects.filter(user=request.user),
+            BookingSchedule.objects.filter(user=request.user),
+            start, end,
+        )
+        return Response(entries)
+
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        """
+        Все бронирования пользователя, включая перенесённые в архив
+        """
+        bookings = Booking.objects.with_history(user=request.user)
+        serializer = BookingHistorySerializer(bookings, many=True)
+        return Response(serializer.data)
+
+class BookingScheduleViewSet(viewsets.ModelViewSet):
+    """
+    Расписания повторяющихся бронирований пользователя (main.schedules).
+    Бронирования на ближайшие SCHEDULE_HORIZON_DAYS дней создаются сразу,
+    дальше - командой materialize_schedules; изменение правила действует
+    на ещё не созданные вхождения
+    """
+    serializer_class = BookingScheduleSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return BookingSchedule.objects.filter(user=self.request.user).prefetch_related('animals', 'services')
+
+    def _materialize(self, schedule):
+        schedules.materialize(BookingSchedule.objects.filter(pk=schedule.pk))
+        schedule.refresh_from_db(fields=['materialized_until'])
+
+    def perform_create(self, serializer):
+        self._materialize(serializer.save(user=self.request.user))
+
+    def perform_update(self, serializer):
+        self._materialize(serializer.save())
+
+
+def _calendar_range(request):
+    """(начало, конец) из ?start=&end= (ГГГГ-ММ-ДД); по умолчанию - 30 дней с сегодняшнего"""
+    try:
+        start = date.fromisoformat(request.query_params['start']) if 'start' in request.query_params else timezone.now().date()
+        end = date.fromisoformat(request.query_params['end']) if 'end' in request.query_params else start + timedelta(days=30)
+    except ValueError:
+        raise ValidationError({'detail': "Даты должны быть в формате ГГГГ-ММ-ДД"})
+    if end < start or (end - start).days > settings.SCHEDULE_CALENDAR_MAX_DAYS:
+        raise ValidationError({'detail': f"Диапазон - от 0 до {settings.SCHEDULE_CALENDAR_MAX_DAYS} дней"})
+    return start, end
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def cancel_booking(request, pk):
@@ -187,6 +335,15 @@ class AnimalViewSet(viewsets.ModelViewSet):
             return Animal.objects.all().select_related('user')
         return Animal.objects.filter(user=self.request.user)
 
+    # Число и даты бронирований животного тоже входят в ответ
+    @conditional_get('updated_at', 'bookings__updated_at')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get('updated_at', 'bookings__updated_at')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -198,7 +355,16 @@ class ServiceViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ServiceSerializer
     permission_classes = [IsAuthenticated]
 
+    @cache_response('services')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response('services')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 @api_view(['GET'])
+@cache_response('statistics')
 def get_statistics(request):
     """
     Получение общей статистики с использованием аннотаций
@@ -264,6 +430,47 @@ def get_statistics(request):
         'active_users': list(active_users)
     })
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request, resource):
+    """
+    Изменения бронирований, животных или отзывов после курсора ?cursor=.
+    Без курсора - первая загрузка; 410 - курсор устарел, нужна полная загрузка
+    """
+    if resource not in sync.RESOURCES:
+        return Response({'error': 'Неизвестный ресурс'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        limit = int(request.query_params.get('limit', 0)) or None
+        data = sync.changes(
+            resource, request.user,
+            cursor=request.query_params.get('cursor'),
+            limit=limit,
+            context={'request': request},
+        )
+    except (ValueError, sync.InvalidCursor) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except sync.CursorExpired as e:
+        return Response({'error': str(e)}, status=status.HTTP_410_GONE)
+    return Response(data)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def batch_requests(request):
+    """
+    Несколько GET-запросов API за один: {"requests": [{"id": ..., "path": ...}]}.
+    Права проверяет каждый подзапрос; ответ - список {id, status, headers, body}
+    """
+    try:
+        items = batch.parse_items(request.data)
+    except batch.BatchError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'responses': batch.execute(request, items)})
+
+
+batch_requests.batch_excluded = True
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsSuperUser])
 def block_dogsitter(request, pk):
@@ -321,4 +528,43 @@ def sentry_debug(request):
         return Response({"message": "Этот код не должен выполниться из-за ошибки выше"})
     except Exception as e:
         sentry_sdk.capture_exception(e)
-        raise 
\ No newline at end of file
+        raise 
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profiling_slow_requests(request):
+    """
+    Последние медленные и профилированные запросы этого процесса (только для администраторов)
+    """
+    return Response({
+        'results': list(reversed(recent_slow_requests))
+    })
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def profiling_token(request):
+    """
+    Выдаёт подписанное значение заголовка для принудительного профилирования запросов
+    """
+    return Response({
+        'header': settings.PROFILING_HEADER,
+        'token': make_profile_token(request.user),
+        'max_age': settings.PROFILING_TOKEN_MAX_AGE
+    })
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def booking_events_token(request):
+    """
+    Выдаёт короткоживущий токен потока событий для ?token= (EventSource
+    не передаёт заголовки, а токен доступа в адресе попал бы в журналы)
+    """
+    return Response({'token': make_stream_token(request.user), 'max_age': settings.SSE_TOKEN_MAX_AGE})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """
+    Метрики представлений всех процессов в формате Prometheus (только для администраторов)
+    """
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
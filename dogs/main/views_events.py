@@ -0,0 +1,91 @@
+"""
+Поток событий бронирований (Server-Sent Events).
+
+Асинхронное представление: соединение держит не поток, а корутину,
+поэтому обслуживать его нужно через ASGI (dogs.asgi). Токен доступа
+передаётся заголовком Authorization; EventSource в браузере заголовки
+задавать не умеет, поэтому передаёт в ?token= короткоживущий токен потока
+(main.events.make_stream_token), а не токен доступа к API. Подходит и сессия.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from users.authentication import CachedJWTAuthentication
+from users.models import User
+from .events import BOOKING_STATUS_CHANGED, broker, format_sse, read_stream_token, user_events_after
+
+
+def _authenticate_token(request):
+    stream_token = request.GET.get('token')
+    if stream_token:
+        user_id = read_stream_token(stream_token)
+        return User.objects.filter(pk=user_id, is_active=True).first() if user_id else None
+    auth = CachedJWTAuthentication()
+    try:
+        result = auth.authenticate(request)
+        return result[0] if result else None
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+async def _get_user(request):
+    user = await sync_to_async(_authenticate_token)(request)
+    if user is None:
+        # request.auser() есть только с Django 5.0
+        session_user = await sync_to_async(get_user)(request)
+        if session_user.is_authenticated:
+            user = session_user
+    return user
+
+
+async def booking_events(request):
+    """Смены статуса бронирований, где пользователь - владелец или догситтер"""
+    user = await _get_user(request)
+    if user is None:
+        return JsonResponse({'error': 'Требуется аутентификация'}, status=401)
+
+    # Без Last-Event-ID - только новые события, с ним - и пропущенные
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', request.GET.get('last_event_id')))
+    except (TypeError, ValueError):
+        last_event_id = None
+
+    async def stream():
+        queue = broker.subscribe(user.pk)
+        # Last-Event-ID - наибольший отправленный id: событие из пропуска
+        # приходит позже событий с большими id и не должно сдвигать курсор назад
+        last_sent = last_event_id or 0
+        replayed = set()
+        try:
+            yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+            if last_event_id is not None:
+                missed = await sync_to_async(user_events_after)(
+                    BOOKING_STATUS_CHANGED, user.pk, last_event_id, settings.SSE_BATCH_SIZE
+                )
+                for event in missed:
+                    last_sent = event.pk
+                    replayed.add(event.pk)
+                    yield format_sse(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event.pk not in replayed:
+                    last_sent = max(last_sent, event.pk)
+                    yield format_sse(event, last_sent)
+        finally:
+            broker.unsubscribe(user.pk, queue)
+
+    return StreamingHttpResponse(
+        stream(),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
@@ -0,0 +1,195 @@
+"""
+Кэш пользователей для JWT-аутентификации.
+
+Снимки пользователей хранятся в памяти процесса (UserSnapshotCache) по
+ключу (id, claim отзыва токена, версия пользователя). Версия лежит в общем
+для процессов кэше JWT_USER_VERSION_CACHE_ALIAS и меняется при каждом
+сохранении и удалении пользователя, а также через invalidate_cached_user
+после queryset.update: снимки во всех процессах перестают совпадать с
+ключом, и следующий запрос загружает пользователя из базы. Версия
+меняется ещё раз после фиксации транзакции, чтобы снимок, прочитанный
+другим процессом до фиксации, тоже устарел.
+
+Остаётся окно в JWT_USER_CACHE_TTL секунд, в течение которого процесс
+может отдать устаревший снимок: если общий кэш версий не настроен
+(DummyCache, LocMemCache - сброс тогда виден только текущему процессу),
+если запись о версии вытеснена из общего кэша, а снимок был сохранён
+до первой смены версии, или если пользователь изменён в обход модели
+без вызова invalidate_cached_user.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+
+class UserSnapshotCache:
+    """
+    Ограниченный LRU-кэш снимков пользователей с коротким временем жизни.
+
+    Ключ записи - кортеж, первый элемент которого - id пользователя. В кэше хранятся
+    не сами объекты User, а значения их полей, поэтому каждый запрос
+    получает собственный экземпляр модели.
+    """
+
+    def __init__(self, max_size=1024, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return snapshot
+
+    def set(self, key, snapshot):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        """Удаляет все записи пользователя независимо от версии токена"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = UserSnapshotCache(
+    max_size=getattr(settings, 'JWT_USER_CACHE_MAX_SIZE', 1024),
+    ttl=getattr(settings, 'JWT_USER_CACHE_TTL', 30),
+)
+
+
+def _version_cache():
+    """Общий для процессов кэш версий пользователей или None, если такого нет"""
+    alias = getattr(settings, 'JWT_USER_VERSION_CACHE_ALIAS', None)
+    if alias not in settings.CACHES:
+        return None
+    cache = caches[alias]
+    return None if isinstance(cache, (DummyCache, LocMemCache)) else cache
+
+
+def _version_key(user_id):
+    return f'jwt-user-version:{user_id}'
+
+
+def get_user_version(user_id):
+    """Текущая версия пользователя в общем кэше (None - ещё не менялась)"""
+    cache = _version_cache()
+    return cache.get(_version_key(user_id)) if cache is not None else None
+
+
+def make_snapshot(user):
+    """Снимок значений полей пользователя, пригодный для восстановления через from_db"""
+    return tuple(getattr(user, field.attname) for field in User._meta.concrete_fields)
+
+
+def restore_snapshot(snapshot):
+    field_names = [field.attname for field in User._meta.concrete_fields]
+    return User.from_db(DEFAULT_DB_ALIAS, field_names, snapshot)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация, которая берёт пользователя из кэша снимков
+    вместо запроса к базе на каждый API-вызов.
+
+    В ключ снимка входят claim отзыва токена (хэш пароля), если он
+    включён в настройках SIMPLE_JWT, и версия пользователя из общего кэша.
+    При любой ошибке кэша пользователь загружается из базы обычным способом.
+    """
+
+    def get_cache_key(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return None
+        return (
+            str(user_id),
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM),
+            get_user_version(user_id),
+        )
+
+    def get_user(self, validated_token):
+        try:
+            key = self.get_cache_key(validated_token)
+            snapshot = user_cache.get(key) if key else None
+        except Exception:
+            key, snapshot = None, None
+
+        if snapshot is not None:
+            try:
+                user = restore_snapshot(snapshot)
+            except Exception:
+                user_cache.invalidate_user(key[0])
+            else:
+                if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+                    raise AuthenticationFailed("User is inactive", code="user_inactive")
+                return user
+
+        user = super().get_user(validated_token)
+        if key:
+            user_cache.set(key, make_snapshot(user))
+        return user
+
+
+def _bump_user_version(user_id):
+    user_cache.invalidate_user(str(user_id))
+    cache = _version_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(_version_key(user_id), time.time_ns(), None)
+    except Exception:
+        logger.exception('Не удалось сменить версию пользователя %s в кэше', user_id)
+
+
+def invalidate_cached_user(user_id):
+    """
+    Сбрасывает кэшированные снимки пользователя во всех процессах
+    (например, после queryset.update): сразу и ещё раз после фиксации
+    транзакции.
+    """
+    _bump_user_version(user_id)
+    transaction.on_commit(lambda: _bump_user_version(user_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_on_save(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_user_on_delete(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
@@ -6,6 +6,7 @@ from django.urls import reverse
 from datetime import timedelta
 from django.db.models import F, ExpressionWrapper, fields, Avg, Count, Sum, Min, Max, Case, When, IntegerField, Q, Value, CharField
 from django.db.models.functions import TruncMonth, TruncYear, Concat
+from main.db_router import replica_reads
 
 def user_avatar_path(instance, filename):
     # Генерируем путь для сохранения аватарки: media/avatars/user_<id>/<filename>
@@ -41,6 +42,7 @@ class User(AbstractUser):
     address = models.TextField(blank=True, null=True, verbose_name="Адрес")
     registration_date = models.DateTimeField(default=timezone.now, verbose_name="Дата регистрации")
     is_active = models.BooleanField(default=True, verbose_name="Активен")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее обновление")
 
     def __str__(self):
         return f"{self.last_name} {self.first_name}"
@@ -108,6 +110,7 @@ class User(AbstractUser):
         """Получает самый последний отзыв пользователя"""
         return self.bookings.filter(review__isnull=False).order_by('-review__date').first()
         
+    @replica_reads
     def get_bookings_stats(self):
         return self.bookings.aggregate(
             total_bookings=Count('id'),
@@ -126,23 +129,20 @@ class User(AbstractUser):
         
     def get_bookings_by_month_annotated(self):
         """
-        Получает статистику бронирований по месяцам с использованием аннотирования
+        Получает статистику бронирований по месяцам из куба помесячной статистики
         """
-        return self.bookings.annotate(
-            month=TruncMonth('start_date'),
-            year=TruncYear('start_date'),
-            month_year=Concat(
-                TruncMonth('start_date', output_field=CharField()),
-                Value(' '),
-                TruncYear('start_date', output_field=CharField()),
-                output_field=CharField()
-            )
-        ).values('month_year', 'month').annotate(
-            bookings_count=Count('id'),
-            total_price=Sum('total_price'),
-            avg_price=Avg('total_price'),
-            animals_count=Count('animals', distinct=True)
-        ).order_by('-month')
+        from main.booking_cube import monthly_series
+        return [
+            {
+                'month': row['month'],
+                'month_year': row['month'].strftime('%m.%Y'),
+                'bookings_count': row['bookings_count'],
+                'total_price': row['revenue'],
+                'avg_price': row['avg_price'],
+                'animals_count': row['animals_count'],
+            }
+            for row in monthly_series(user=self)
+        ]
         
     def get_animals_with_bookings_stats(self):
         """
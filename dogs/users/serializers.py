@@ -1,10 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from main.fieldsets import SparseFieldsMixin
 from .models import UserPhoto
 
 User = get_user_model()
 
-class UserPhotoSerializer(serializers.ModelSerializer):
+class UserPhotoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     photo_url = serializers.SerializerMethodField()
 
     class Meta:
@@ -17,7 +18,7 @@ class UserPhotoSerializer(serializers.ModelSerializer):
             return self.context['request'].build_absolute_uri(obj.photo.url)
         return None
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     avatar_url = serializers.SerializerMethodField()
     photos = UserPhotoSerializer(many=True, read_only=True)
 
@@ -61,4 +61,20 @@ api.interceptors.response.use(
   }
 )
 
-export { api } 
\ No newline at end of file
+// Несколько GET-запросов за один: пути от корня API, ответы в том же порядке.
+// Ответ с ошибкой отклоняет промис, как и обычный api.get
+const batchGet = async (paths) => {
+  const response = await api.post('/batch/', {
+    requests: paths.map((path, index) => ({ id: index, path }))
+  })
+  return response.data.responses.map(item => {
+    if (item.status >= 400) {
+      const error = new Error(`Запрос ${paths[item.id]} завершился с кодом ${item.status}`)
+      error.response = { status: item.status, data: item.body }
+      throw error
+    }
+    return { status: item.status, data: item.body }
+  })
+}
+
+export { api, batchGet } 
\ No newline at end of file